@@ -0,0 +1,10 @@
+"""Helpers shared by the benchmark scripts. The scripts are run as
+``python benchmarks/<name>.py``, which puts this directory on sys.path.
+"""
+import timeit
+
+
+def report(label, stmt, number=10):
+    """Print the best time of number runs of stmt."""
+    best = min(timeit.repeat(stmt, number=1, repeat=number))
+    print(f'{label:40s} {best:10.4f} s')
@@ -0,0 +1,57 @@
+"""Benchmark of bottomup with and without the shared sub-expression memo.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_dag.py
+
+A sum of 2000 terms f(s, k) has s replaced by a single x**2 + 1
+expression, as a Substitute rule does, then a bottomup rule is applied
+with dag False and True. The equal case rebuilds every x**2 + 1 as a
+distinct but equal object.
+"""
+import timeit
+
+from truealgebra.core.expressions import Container, Symbol, Number
+from truealgebra.core.rules import Rule, Substitute
+
+
+class SquareToProduct(Rule):
+    """Rewrite x**2 as x*x."""
+    pure = True
+
+    def predicate(self, expr):
+        return (
+            isinstance(expr, Container)
+            and expr.name == '**'
+            and expr[1] == Number(2)
+        )
+
+    def body(self, expr):
+        return Container('*', (expr[0], expr[0]))
+
+
+def main():
+    s = Symbol('s')
+    poly = Container(
+        '+', (Container('**', (Symbol('x'), Number(2))), Number(1))
+    )
+    terms = tuple(Container('f', (s, Number(k))) for k in range(2000))
+    expr = Substitute(subdict={s: poly}, bottomup=True)(Container('+', terms))
+    equal = Container('+', tuple(
+        Container('f', (
+            Container('+', (
+                Container('**', (Symbol('x'), Number(2))), Number(1)
+            )),
+            Number(k),
+        ))
+        for k in range(2000)
+    ))
+    for label, ex in (('same object', expr), ('equal objects', equal)):
+        for dag in (False, True):
+            rule = SquareToProduct(bottomup=True, dag=dag)
+            best = min(timeit.repeat(lambda: rule(ex), number=10, repeat=5))
+            print(f'{label:15s} dag={dag!s:5s} {best:10.4f} s')
+
+
+if __name__ == '__main__':
+    main()
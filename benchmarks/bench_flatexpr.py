@@ -0,0 +1,49 @@
+"""Benchmark of bottomup on a FlatExpr instance and on the tree it
+encodes, using the std settings.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_flatexpr.py
+
+The rules of evalnumbu, without marks, are applied to a large sum. While
+the encoded expression is alive FlatExpr.bottomup uses the tree and then
+encodes the output. Once it is gone the expression is decoded as the
+rules are applied, and the pure rules are applied once to each distinct
+atom.
+"""
+import gc
+
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.builder import bulk_sum
+from truealgebra.core.flatexpr import FlatExpr
+from truealgebra.core.rules import RulesBU
+from truealgebra.std.evalnum import evalnumbu
+
+from _common import report
+
+
+def make_expr():
+    return bulk_sum([
+        settings.parse('f(x, 2*{0}, g(y + {0} + 1, 3**2))'.format(k))
+        for k in range(2000)
+    ])
+
+
+def main():
+    rule = RulesBU(*evalnumbu.rule_list)
+    expr = make_expr()
+    alive = FlatExpr.from_expr(expr)
+    gone = FlatExpr.from_expr(make_expr())
+    gc.collect()
+    assert gone.source() is None
+    assert gone.bottomup_expr(rule) == expr.bottomup(rule)
+    report('tree bottomup', lambda: expr.bottomup(rule))
+    report('FlatExpr bottomup, source alive', lambda: alive.bottomup(rule))
+    report('FlatExpr bottomup, source gone', lambda: gone.bottomup(rule))
+    report('FlatExpr bottomup_expr, source gone',
+           lambda: gone.bottomup_expr(rule))
+
+
+if __name__ == '__main__':
+    main()
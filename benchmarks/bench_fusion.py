@@ -0,0 +1,66 @@
+"""Benchmark of pipelines of bottomup rules run as separate passes and as
+one Fused traversal, using the std settings.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_fusion.py
+
+The first pipeline has three rules that each rewrite one symbol of a
+large expression, the fused rules walk it once instead of three times
+and are applied through their rewrite methods.
+The rules of simplify rewrite nearly every node, so most of the second
+rule is left to a walk of the output of the first one, and Fused costs
+about as much as the separate passes there.
+"""
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.builder import bulk_sum
+from truealgebra.core.expressions import Symbol
+from truealgebra.core.fusion import Fused
+from truealgebra.core.rules import Rule, Rules
+from truealgebra.common.simplify import simplify
+
+from _common import report
+
+
+class Rename(Rule):
+    pure = True
+
+    def __init__(self, old, new, **kwargs):
+        self.old = Symbol(old)
+        self.new = Symbol(new)
+        super().__init__(**kwargs)
+
+    def predicate(self, expr):
+        return expr == self.old
+
+    def body(self, expr):
+        return self.new
+
+
+def main():
+    expr = bulk_sum([
+        settings.parse('f(x, g(y, {0}), h(z, w**{0}))'.format(k))
+        for k in range(2000)
+    ])
+    pipeline = Rules(
+        Rename('x', 'a', bottomup=True),
+        Rename('y', 'b', bottomup=True),
+        Rename('z', 'c', bottomup=True),
+    )
+    fused = Fused(pipeline)
+    assert fused(expr) == pipeline(expr)
+    report('three renames, separate', lambda: pipeline(expr))
+    report('three renames, Fused', lambda: fused(expr))
+
+    expr = settings.parse(' + '.join([
+        '{0}*x*y**{0}*(z + {0})/w'.format(k) for k in range(40)
+    ]))
+    fused = Fused(simplify)
+    assert fused(expr) == simplify(expr)
+    report('simplify', lambda: simplify(expr))
+    report('Fused(simplify)', lambda: fused(expr))
+
+
+if __name__ == '__main__':
+    main()
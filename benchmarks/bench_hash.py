@@ -0,0 +1,133 @@
+"""Benchmark of expression hashing and equality on large expressions.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_hash.py
+
+The "before" timings use the uncached recursive hash, the equality test
+without identity or hash short-circuits and the quadratic CommAssoc item
+comparison, all reproduced below. The "after" timings use the memoized
+ExprBase.__hash__ and __eq__ methods.
+"""
+import timeit
+
+from truealgebra.core.expressions import Container, CommAssoc, Symbol
+from truealgebra.core.rules import Substitute
+
+
+def legacy_hash(expr):
+    if isinstance(expr, CommAssoc):
+        return hash((
+            type(expr),
+            expr.name,
+            tuple(sorted(map(legacy_hash, expr.items)))
+        ))
+    elif isinstance(expr, Container):
+        return hash((
+            expr.name,
+            type(expr),
+            len(expr),
+            tuple(map(legacy_hash, expr.items)),
+        ))
+    return hash(expr)
+
+
+def legacy_eq(expr, other):
+    if isinstance(expr, Container):
+        if (
+            type(expr) is not type(other)
+            or expr.name != other.name
+            or len(expr) != len(other)
+        ):
+            return False
+        for item, otem in zip(expr.items, other.items):
+            if not legacy_eq(item, otem):
+                return False
+        return True
+    return expr == other
+
+
+def legacy_inner_eq(selflist, otherlist):
+    for item in selflist:
+        ndx = -1
+        for nndex, otem in enumerate(otherlist):
+            if otem == item:
+                ndx = nndex
+                break
+        if ndx == -1:
+            return False
+        del otherlist[ndx]
+    return True
+
+
+def make_tree(depth, start=0):
+    """Balanced binary tree with 2**(depth + 1) - 1 nodes."""
+    if depth == 0:
+        return Symbol('x' + str(start % 97))
+    return Container('f', (
+        make_tree(depth - 1, 2 * start),
+        CommAssoc('+', (make_tree(depth - 2, 2 * start + 1), Symbol('y')))
+        if depth > 1 else make_tree(depth - 1, 2 * start + 1),
+    ))
+
+
+def count(expr):
+    if isinstance(expr, Container):
+        return 1 + sum(count(item) for item in expr.items)
+    return 1
+
+
+def best(stmt, number=1, repeat=5):
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+
+def main():
+    depth = 21
+    tree0 = make_tree(depth)
+    tree1 = make_tree(depth)
+    print('nodes per expression:', count(tree0))
+
+    print('\nhash of the whole expression, repeated')
+    print('  before: {:10.6f} s'.format(best(lambda: legacy_hash(tree0))))
+    hash(tree0)
+    print('  after:  {:10.6f} s'.format(best(lambda: hash(tree0))))
+
+    print('\nequality of two equal, distinct expressions')
+    print('  before: {:10.6f} s'.format(
+        best(lambda: legacy_eq(tree0, tree1))))
+    hash(tree1)
+    print('  after:  {:10.6f} s'.format(best(lambda: tree0 == tree1)))
+
+    print('\nequality of two expressions that differ in the last leaf')
+    tree2 = Container('f', (
+        tree1[0], CommAssoc('+', (tree1[1][0], Symbol('w')))
+    ))
+    hash(tree2)
+    print('  before: {:10.6f} s'.format(
+        best(lambda: legacy_eq(tree0, tree2))))
+    print('  after:  {:10.6f} s'.format(best(lambda: tree0 == tree2)))
+
+    print('\ndict lookup keyed on sub-expressions (Substitute predicate)')
+    keys = [tree0[0], tree0[1], tree0[0][0], tree0[1][0]]
+    sub = Substitute(subdict={key: Symbol('z') for key in keys})
+    legacy = {legacy_hash(key): key for key in keys}
+    print('  before: {:10.6f} s'.format(best(
+        lambda: [legacy_hash(key) in legacy for key in keys])))
+    print('  after:  {:10.6f} s'.format(best(
+        lambda: [sub.predicate(key) for key in keys])))
+
+    print('\nequality of two 1000 term sums with items in reverse order')
+    terms = [
+        Container('**', (Symbol('x' + str(ndx)), Symbol('n')))
+        for ndx in range(1000)
+    ]
+    sum0 = CommAssoc('+', terms)
+    sum1 = CommAssoc('+', list(reversed(terms)))
+    print('  before: {:10.6f} s'.format(best(
+        lambda: legacy_inner_eq(list(sum0.items), list(sum1.items)))))
+    print('  after:  {:10.6f} s'.format(best(
+        lambda: CommAssoc('+', terms) == CommAssoc('+', terms[::-1]))))
+
+
+if __name__ == '__main__':
+    main()
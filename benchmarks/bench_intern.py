@@ -0,0 +1,36 @@
+"""Benchmark of the creation of expressions, with interning off and on.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_intern.py
+
+With interning off, the default, ExprMeta.__call__ checks that no
+InternTable is active and calls type.__call__. With interning on, every
+new expression is looked up in intern_table.
+"""
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, CommAssoc, intern_table
+)
+
+from _common import report
+
+
+def create():
+    sx = Symbol('x')
+    for k in range(20000):
+        Container('f', (sx, Number(k)))
+        CommAssoc('+', (sx, Symbol('y')))
+
+
+def main():
+    report('create, interning off', create)
+    intern_table.enable()
+    try:
+        report('create, interning on', create)
+    finally:
+        intern_table.disable()
+        intern_table.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Benchmark of normal-form marks, using the std settings.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_marks.py
+
+A large expression is evaluated with evalnumbu, one term is edited and
+the expression is evaluated again. With marks the sub-expressions that
+were evaluated before are skipped, without marks every node is visited
+again. Simplifying an expression already simplified returns it as is.
+"""
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.builder import bulk_sum
+from truealgebra.core.expressions import CommAssoc
+from truealgebra.core.rules import JustOne, RulesBU
+from truealgebra.common.simplify import simplify
+from truealgebra.std.evalnum import evalnumbu
+
+from _common import report
+
+
+def main():
+    expr = bulk_sum([
+        settings.parse('f(x, 2*{0}, g(y + {0} + 1, 3**2))'.format(k))
+        for k in range(2000)
+    ])
+    plain = RulesBU(*evalnumbu.rule_list)
+    out = evalnumbu(expr)
+    edited = CommAssoc('+', out.items[:-1] + (settings.parse('f(1 + 2)'),))
+    assert evalnumbu(edited) == plain(edited)
+    report('evalnumbu after edit, no marks', lambda: plain(edited))
+    report('evalnumbu after edit, marks', lambda: evalnumbu(edited))
+
+    expr = settings.parse(' + '.join([
+        '{0}*x*y**{0}*(z + {0})/w'.format(k) for k in range(40)
+    ]))
+    out = simplify(expr)
+    report('simplify', lambda: simplify(expr))
+    report('simplify of its output', lambda: simplify(out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Benchmark of simplify with and without MemoRule, using the std
+settings.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_memo.py
+
+Each line simplifies 200 expressions, 20 of them distinct. The new exprs
+line parses them anew each time, so the memoized rule finds equal
+expressions, not the same objects.
+"""
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.rules import MemoRule
+from truealgebra.common.simplify import simplify
+
+from _common import report
+
+
+def main():
+    strings = [
+        '(x + {0})*(x + {0}) + 2*x*y**{0} - y**{0}*x'.format(k % 20)
+        for k in range(200)
+    ]
+    exprs = [settings.parse(string) for string in strings]
+    memo = MemoRule(simplify, maxsize=1000)
+    report('simplify', lambda: [simplify(expr) for expr in exprs])
+    report('MemoRule(simplify)', lambda: [memo(expr) for expr in exprs])
+    report('MemoRule(simplify), new exprs', lambda: [
+        memo(settings.parse(string)) for string in strings
+    ])
+    report('parse only', lambda: [
+        settings.parse(string) for string in strings
+    ])
+    print(memo.info())
+
+
+if __name__ == '__main__':
+    main()
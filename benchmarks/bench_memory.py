@@ -0,0 +1,54 @@
+"""Per-node memory of expressions, measured with tracemalloc.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_memory.py
+
+To compare with another revision, point PYTHONPATH at a checkout of that
+revision, for example one created with ``git worktree add``.
+"""
+import tracemalloc
+
+from truealgebra.core.expressions import Symbol, Number, Container, CommAssoc
+
+
+N = 100000
+
+
+def measure(factory):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    exprs = [factory(ndx) for ndx in range(N)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    total = sum(stat.size_diff for stat in stats)
+    # the list holding the expressions is not part of the expressions
+    total -= exprs.__sizeof__()
+    return total / N
+
+
+def main():
+    sx = Symbol('x')
+    n2 = Number(2)
+    print('bytes per node ({} nodes)'.format(N))
+    print('  Symbol:    {:8.1f}'.format(measure(lambda ndx: Symbol('x'))))
+    print('  Number:    {:8.1f}'.format(measure(lambda ndx: Number(ndx))))
+    # the items tuple is counted, the items themselves are shared
+    print('  Container: {:8.1f}'.format(
+        measure(lambda ndx: Container('f', (sx, n2))))
+    )
+    print('  CommAssoc: {:8.1f}'.format(
+        measure(lambda ndx: CommAssoc('+', (sx, n2))))
+    )
+
+    def hashed(ndx):
+        expr = Container('f', (sx, n2))
+        hash(expr)
+        return expr
+
+    print('  Container, hashed: {:8.1f}'.format(measure(hashed)))
+
+
+if __name__ == '__main__':
+    main()
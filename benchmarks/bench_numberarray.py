@@ -0,0 +1,39 @@
+"""Benchmark of evaluating an expression over sample points, one tree
+per point against one tree holding a NumberArray. Needs numpy.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_numberarray.py
+
+a*x**2 + b + sin(x) is evaluated with evalnumbu at 10**4 points one
+tree at a time and at 10**6 points with a single NumberArray.
+"""
+import numpy
+
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.expressions import Number, NumberArray, Symbol
+from truealgebra.core.rules import Substitute
+from truealgebra.std.evalnum import evalnumbu
+
+from _common import report
+
+
+def evaluate(expr, x):
+    subdict = {Symbol('x'): x, Symbol('a'): Number(2), Symbol('b'): Number(1)}
+    return evalnumbu(Substitute(subdict=subdict, bottomup=True)(expr))
+
+
+def main():
+    expr = settings.parse('a*x**2 + b + sin(x)')
+    points = numpy.linspace(0.0, 1.0, 10**6)
+    report('10**4 points, one tree each', lambda: [
+        evaluate(expr, Number(x)) for x in points[:10**4].tolist()
+    ], number=3)
+    report('10**6 points, one NumberArray', lambda: evaluate(
+        expr, NumberArray(points)
+    ), number=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark of the match and rewrite path of NaturalRule, HalfNaturalRule
+and JustOne instances, using the std settings.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_rewrite.py
+
+Each rule is applied bottomup to a large expression. Most nodes fail to
+match, some match and are rewritten.
+"""
+import truealgebra.std.setup
+from truealgebra.core.settings import settings
+from truealgebra.core.builder import bulk_sum
+from truealgebra.core.naturalrules import NaturalRule, HalfNaturalRule
+from truealgebra.core.rules import JustOneBU
+from truealgebra.std.predicate import predicate_rule
+
+from _common import report
+
+
+def main():
+    expr = bulk_sum([
+        settings.parse('f(x, g(y, {0}), h(z, w**{0}), k(y))'.format(k))
+        for k in range(2000)
+    ])
+    natural = NaturalRule(
+        vardict='forall(u, v)',
+        pattern=' g(u, v) ',
+        outcome=' G(v, u) ',
+        bottomup=True,
+    )
+    predicate = NaturalRule(
+        predicate_rule=predicate_rule,
+        vardict='forall(n : isint(n), u)',
+        pattern=' u ** n ',
+        outcome=' P(u, n) ',
+        bottomup=True,
+    )
+    half = HalfNaturalRule(
+        vardict='forall(u)',
+        pattern=' k(u) ',
+        bottomup=True,
+    )
+    justone = JustOneBU(
+        NaturalRule(vardict='forall(u)', pattern=' h(u, u) ', outcome=' 0 '),
+        NaturalRule(vardict='forall(u, v)', pattern=' g(u, v) ',
+                    outcome=' G(v, u) '),
+        NaturalRule(vardict='forall(u)', pattern=' k(u) ', outcome=' K '),
+    )
+    report('NaturalRule', lambda: natural(expr))
+    report('NaturalRule with predicate', lambda: predicate(expr))
+    report('HalfNaturalRule', lambda: half(expr))
+    report('JustOneBU of NaturalRules', lambda: justone(expr))
+
+
+if __name__ == '__main__':
+    main()
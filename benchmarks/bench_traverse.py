@@ -0,0 +1,62 @@
+"""Benchmark of the Container traversals on shallow and deep expressions.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_traverse.py
+
+Shallow expressions are balanced binary trees, deep expressions are
+nested powers. Each line reports the best time of several runs. The
+hash line includes building a new expression, the hash is memoized.
+"""
+from truealgebra.core.expressions import Container, Symbol, Number, true
+from truealgebra.core.rules import Rule, donothing_rule
+from truealgebra.core.unparse import unparse
+
+from _common import report
+
+
+class SymbolToX(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Symbol)
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+def balanced(depth, leaf):
+    if depth == 0:
+        return leaf
+    return Container('f', (balanced(depth - 1, leaf), balanced(depth - 1, leaf)))
+
+
+def nested_powers(depth, base):
+    expr = base
+    for ndx in range(depth):
+        expr = Container('**', (expr, Number(ndx)))
+    return expr
+
+
+def main():
+    rule = SymbolToX()
+    vardict = {Symbol('v'): true}
+    for label, make in (
+        ('balanced depth 15', lambda leaf: balanced(15, leaf)),
+        ('nested powers 900', lambda leaf: nested_powers(900, leaf)),
+    ):
+        print(label)
+        ex0 = make(Symbol('a'))
+        ex1 = make(Symbol('a'))
+        pattern = make(Symbol('v'))
+        report('  bottomup', lambda: ex0.bottomup(rule))
+        report('  bottomup no-op', lambda: ex0.bottomup(donothing_rule))
+        report('  match', lambda: pattern.match(
+            vardict, dict(), donothing_rule, ex0
+        ))
+        report('  hash', lambda: hash(make(Symbol('a'))), number=3)
+        report('  eq', lambda: ex0 == ex1)
+        report('  repr', lambda: repr(ex0))
+        report('  unparse', lambda: unparse(ex0))
+
+
+if __name__ == '__main__':
+    main()
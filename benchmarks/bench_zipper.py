@@ -0,0 +1,62 @@
+"""Benchmark of repeated local edits, apply2path against Cursor.
+
+Run from the repository root, with truealgebra importable::
+
+    PYTHONPATH=. python benchmarks/bench_zipper.py
+
+The expression is 30 levels deep with 50 items per level. Every item
+next to the deepest one is edited, once with one apply2path call per
+edit and once with a single Cursor moving right between edits.
+"""
+import timeit
+
+from truealgebra.core.expressions import Container, Symbol, Number
+from truealgebra.core.rules import Rule
+from truealgebra.core.zipper import Cursor
+
+
+class ToZero(Rule):
+    def predicate(self, expr):
+        return True
+
+    def body(self, expr):
+        return Number(0)
+
+
+def make(depth, arity):
+    expr = Symbol('a')
+    for _ in range(depth):
+        expr = Container(
+            'f', (expr,) + tuple(Number(ndx) for ndx in range(1, arity))
+        )
+    return expr
+
+
+def main():
+    expr = make(30, 50)
+    rule = ToZero()
+    path = (0,) * 29
+
+    def with_apply2path():
+        out = expr
+        for ndx in range(1, 50):
+            out = out.apply2path(path + (ndx,), rule)
+        return out
+
+    def with_cursor():
+        cursor = Cursor(expr, path + (1,)).apply(rule)
+        for ndx in range(2, 50):
+            cursor.right().apply(rule)
+        return cursor.root()
+
+    assert with_apply2path() == with_cursor()
+    for label, func in (
+        ('apply2path', with_apply2path),
+        ('Cursor', with_cursor),
+    ):
+        best = min(timeit.repeat(func, number=20, repeat=5))
+        print(f'{label:20s} {best:10.4f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from truealgebra.core.rules import RulesBU, donothing_rule
 from truealgebra.core.expressions import Number
+from truealgebra.core.marks import forget_marks
 
 class CommonSettingsSingleton():
     _instance = None
@@ -10,6 +11,11 @@ class CommonSettingsSingleton():
             cls._instance.reset()
         return cls._instance
 
+    def __setattr__(self, name, value):
+        # The normal-form marks depend on the settings.
+        forget_marks()
+        object.__setattr__(self, name, value)
+
     def reset(self):
         self.evalnum = donothing_rule
         self.evalnumbu = RulesBU(donothing_rule)
@@ -62,10 +62,12 @@ property.
 
 from truealgebra.core.expressions import (
     ExprBase, Number, Container, CommAssoc, isNumber, isContainer,
-    isCommAssoc, null
+    isCommAssoc, null, digest_parts, type_tag, order_key, _canonicalize,
+    _known_canonical
 )
 from truealgebra.core.rules import Rule, Rules, RulesBU, JustOneBU
 from truealgebra.core.err import ta_logger
+from truealgebra.core.budget import current_budget
 
 from truealgebra.common.commonsettings import commonsettings as comset
 from truealgebra.common.utility import (
@@ -73,6 +75,7 @@ from truealgebra.common.utility import (
 )
 
 from types import MappingProxyType
+from operator import eq, is_
 
 from IPython import embed
 
@@ -89,15 +92,62 @@ class StarPwr(ExprBase):
         The expdict values must be python Number objects
         they are the exponent of a power function.
     """
+    __slots__ = (
+        'coef', 'expdict', '_hash', '_digest', '_stats', '_canonical'
+    )
+
     def __init__(self, coef=comset.num1, expdict=None):
         object.__setattr__(self, "coef", coef)
-        if expdict is not None:
-            expdict = MappingProxyType(expdict)
-            object.__setattr__(self, "expdict", expdict)
+        if expdict is None:
+            expdict = dict()
+        expdict = MappingProxyType(expdict)
+        object.__setattr__(self, "expdict", expdict)
         # Above,a shallow copy is made of a dictionary
         # That is OK in this case since all dict values are unmutable
 
-    expdict = MappingProxyType(dict())
+    def __reduce__(self):
+        return (self.__class__, (self.coef, dict(self.expdict)))
+
+    def _subexprs(self):
+        return (
+            (self.coef,)
+            + tuple(self.expdict.keys())
+            + tuple(self.expdict.values())
+        )
+
+    def _order_key(self):
+        return (self._order_rank, type_tag(self))
+
+    def _order_items(self):
+        try:
+            return self._canonical
+        except AttributeError:
+            pass
+        _canonicalize(self)
+        return self._canonical
+
+    def _sort_items(self):
+        # The keys in canonical order, each followed by its value, then
+        # coef. Terms are ordered by their powers before their coefficients.
+        out = list()
+        for key, value in sorted(
+            self.expdict.items(), key=lambda pair: order_key(pair[0])
+        ):
+            out.append(key)
+            out.append(value)
+        out.append(self.coef)
+        return tuple(out)
+
+    def _compute_digest(self):
+        # The digest does not depend on the order of expdict.
+        return digest_parts(
+            type_tag(self),
+            self.coef.digest(),
+            *sorted([
+                key.digest() + value.digest()
+                for key, value in self.expdict.items()
+            ])
+        )
 
     def __repr__(self):
         out = 'StarPwr(' + repr(self.coef) + ', {'
@@ -116,26 +166,16 @@ class StarPwr(ExprBase):
         return out
 
     def bottomup(self, rule):
-        pseudo = PseudoSP(coef=self.coef)
-        for key in self.expdict:
-            newkey = rule(key)
-            value = self.expdict[key]
-            pseudo.mul_keyvalue(newkey, value)
-        return rule(
-            StarPwr(pseudo.coef, pseudo.expdict),
-            _pathinhibit=True,
-            _buinhibit=True
-        )
-
-        newdict = dict()
-        for key in self.expdict:
-            newkey = rule(key)
-            newdict[newkey] = self.expdict[key]
-        return rule(
-            self.__class__(coef=self.coef, expdict=newdict),
-            _pathinhibit=True,
-            _buinhibit=True
-        )
+        newkeys = [rule(key) for key in self.expdict]
+        if all(map(is_, newkeys, self.expdict)):
+            # No key changed, self is kept.
+            expr = self
+        else:
+            pseudo = PseudoSP(coef=self.coef)
+            for newkey, value in zip(newkeys, self.expdict.values()):
+                pseudo.mul_keyvalue(newkey, value)
+            expr = StarPwr(pseudo.coef, pseudo.expdict)
+        return rule(expr, _pathinhibit=True, _buinhibit=True)
 
     def apply2path(self, path, rule, _buinhibit=False):
         if path:
@@ -145,10 +185,13 @@ class StarPwr(ExprBase):
             return rule(self, _pathinhibit=True, _buinhibit=True)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if (
             type(self) is not type(other)
             or self.coef != other.coef
             or len(self.expdict) != len(other.expdict)
+            or hash(self) != hash(other)
         ):
             return False
 
@@ -164,12 +207,36 @@ class StarPwr(ExprBase):
         return self == expr
 
     def __hash__(self):
-        return hash((
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        value = hash((
             self.coef,
             type(self),
             # stackoverflow question 5884066, user Imran answer
             frozenset(self.expdict.items())
         ))
+        object.__setattr__(self, '_hash', value)
+        return value
+
+    def _intern_key(self):
+        return (
+            type(self),
+            id(self.coef),
+            frozenset([(id(key), id(value))
+                for key, value in self.expdict.items()]),
+        )
+
+    def _intern_parts(self):
+        # coef followed by the keys and values of expdict
+        parts = [self.coef]
+        for item in self.expdict.items():
+            parts.extend(item)
+        return tuple(parts)
+
+    def _from_parts(self, parts):
+        return self.__class__(parts[0], dict(zip(parts[1::2], parts[2::2])))
 
 
 class PseudoSP():
@@ -308,20 +375,33 @@ class Plus(CommAssoc):
         num (Number): python Number
         items (tuple): a tuple of StarPwr objects.
     """
+    __slots__ = ('num',)
+
     def __init__(self, num=comset.num0, items=tuple()):
         object.__setattr__(self, "num", num)
         object.__setattr__(self, "items", tuple(items))
 
+    def __reduce__(self):
+        return (self.__class__, (self.num, self.items))
+
+    def _subexprs(self):
+        return (self.num,) + self.items
+
+    def _order_items(self):
+        return (self.num,) + self.canonical_items()
+
+    def _compute_digest(self):
+        return digest_parts(
+            type_tag(self),
+            self.num.digest(),
+            *sorted([item.digest() for item in self.items])
+        )
+
     # All CommAssoc instances must have a name attribute.
     name = None
 
-    def bottomup(self, rule):
-        return rule(
-            self.__class__(
-                self.num,
-                tuple([item.bottomup(rule) for item in self.items])),
-            _pathinhibit=True,
-            _buinhibit=True)
+    def _rebuild(self, items):
+        return self.__class__(self.num, items)
 
     def __repr__(self):
         out = 'Plus(' + repr(self.num) + ', ('
@@ -333,26 +413,46 @@ class Plus(CommAssoc):
         return out
 
     def __hash__(self):
-        return hash((
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        value = hash((
             type(self),
             self.num,
             tuple(sorted(map(hash, self.items)))
         ))
+        object.__setattr__(self, '_hash', value)
+        return value
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if (
             type(self) is not type(other)
             or len(self) != len(other)
             or self.num != other.num
             or self.name != other.name
+            or hash(self) != hash(other)
         ):
             return False
+        elif _known_canonical(self) and _known_canonical(other):
+            return all(map(eq, self.items, other.items))
         else:
-            return self.inner_eq(list(self.items), list(other.items))
+            return self.multiset() == other.multiset()
 
     def match(self, vardict, subdict, pred_rule, expr):
         return self == expr
 
+    def _intern_key(self):
+        return (type(self), id(self.num), tuple(map(id, self.items)))
+
+    def _intern_parts(self):
+        return (self.num,) + self.items
+
+    def _from_parts(self, parts):
+        return self.__class__(parts[0], parts[1:])
+
 
 class PseudoP():
     """ Mutable Objects used to covert expressions to Plus objects. The data
@@ -370,6 +470,11 @@ class PseudoP():
             return StarPwr(comset.num1, {item: comset.num1})
 
     def append_itemSP(self, itemSP):
+        # With an exhausted budget, like terms are no longer combined.
+        budget = current_budget()
+        if budget is not None and budget.visit(len(self.items)):
+            self.items.append(itemSP)
+            return
         for ndx, pseudoitem in enumerate(self.items):
             if itemSP.expdict == pseudoitem.expdict:
                 new_coef = (addnums(pseudoitem.coef, itemSP.coef))
@@ -411,10 +516,15 @@ class PseudoP():
 # =====================
 # The converttoSPP rule
 # =====================
+# The rules below read commonsettings, through addnums and mulnums among
+# others. They are pure as RuleBase defines it, their outputs depend on
+# the input and the settings only.
 class StarToSPP(Rule):
     """
     Convert a CommAssoc expression with name '*' to a StarPwr expression. 
     """
+    pure = True
+
     def predicate(self, expr):
         return isCommAssoc(expr, name='*')
 
@@ -434,6 +544,8 @@ class DivToSPP(Rule):
     """
     Convert a Container expression with name '/' to a StarPwr expression. 
     """
+    pure = True
+
     def predicate(self, expr):
         return isContainer(expr, name='/', arity=2)
 
@@ -462,6 +574,8 @@ class PwrToSPP(Rule):
     """
     Convert a Container expression with name '**' to a StarPwr expression. 
     """
+    pure = True
+
     def predicate(self, expr):
         return isContainer(expr, name='**', arity=2)
 
@@ -490,6 +604,7 @@ class NegToSPP(Rule):
 
     -x is converted as though it were (-1) * x
     """
+    pure = True
     
     def predicate(self, expr):
         return isContainer(expr, name='-', arity=1)
@@ -511,6 +626,8 @@ class AddToSPP(Rule):
     """
     Convert a CommAssoc expression with name '+' to a Plus expression. 
     """
+    pure = True
+
     def predicate(self, expr):
         return isCommAssoc(expr, name='+')
 
@@ -535,6 +652,8 @@ class MinusToSPP(Rule):
 
     x-y is converted as though it were x + (-1) * y
     """
+    pure = True
+
     def predicate(self, expr):
         return isContainer(expr, name='-', arity=2)
 
@@ -577,6 +696,8 @@ class ConvertFromStarPwr(Rule):
     """
     Convert from a StqrPwr expression.
     """
+    pure = True
+
     def predicate(self, expr):
         return isinstance(expr, StarPwr)
 
@@ -599,6 +720,8 @@ convertfromstarpwr = ConvertFromStarPwr()
             
 
 class ConvertFromPlus(Rule):
+    pure = True
+
     def predicate(self, expr):
         return isinstance(expr, Plus)
 
@@ -625,6 +748,8 @@ simplify0 = Rules(
 
 
 class ConvertStarPwrToDiv(Rule):
+    pure = True
+
     def predicate(self, expr):
         return isinstance(expr, StarPwr)
 
@@ -678,9 +803,13 @@ class ConvertStarPwrToDiv(Rule):
         return complex_list, positive_list, negative_list
 
 
+# simplify is idempotent, its outputs are marked and returned as is when
+# simplified again.
 simplify = Rules(
     converttoSPP,
-    JustOneBU(ConvertStarPwrToDiv(), ConvertFromPlus())
+    JustOneBU(ConvertStarPwrToDiv(), ConvertFromPlus()),
+    marks=True,
+    idempotent=True,
 )
 
 
@@ -1,6 +1,8 @@
 from truealgebra.core.settings import SettingsSingleton
 from truealgebra.core.abbrv import Nu, Sy, CA, Co
-from truealgebra.core.rules import Rule, JustOneBU, Substitute
+from truealgebra.core.rules import (
+    Rule, JustOneBU, Substitute, Rules, MemoRule, donothing_rule
+)
 from truealgebra.common.commonsettings import commonsettings
 from truealgebra.common.commonsettings import commonsettings as comset
 from truealgebra.common.setup_func import common_setup_func
@@ -10,6 +12,7 @@ from truealgebra.common.simplify import (
     convertfromstarpwr
 )
 from truealgebra.common.utility import mulnums, addnums
+from truealgebra.core.expressions import compare
 from truealgebra.std.setup_func import std_setup_func
 
 from types import MappingProxyType
@@ -72,6 +75,64 @@ def test_starpwr_eq(settings, input_dict, starpwr):
     })
 
 
+def test_starpwr_plus_intern(settings):
+    from truealgebra.core.expressions import InternTable
+    table = InternTable()
+    sx, sy = Sy('x'), Sy('y')
+    sp0 = table.intern(SP(Nu(4), {sx: Nu(2), sy: Nu(6)}))
+    sp1 = table.intern(SP(Nu(4), {Sy('y'): Nu(6), Sy('x'): Nu(2)}))
+    pl0 = table.intern(Pl(Nu(1), (sp0,)))
+    pl1 = table.intern(Pl(Nu(1), (sp1,)))
+
+    assert sp0 is sp1
+    assert pl0 is pl1
+
+
+def test_deep_parse_intern(settings):
+    from truealgebra.core.expressions import intern_table
+    string = 'x**' * 3000 + 'y'
+    intern_table.enable()
+    try:
+        assert settings.parse(string) is settings.parse(string)
+    finally:
+        intern_table.disable()
+        intern_table.clear()
+
+
+def test_starpwr_plus_digest(settings):
+    sp0 = SP(Nu(4), {Sy('x'): Nu(2), Sy('y'): Nu(6)})
+    sp1 = SP(Nu(4), {Sy('y'): Nu(6), Sy('x'): Nu(2)})
+    sp2 = SP(Nu(4), {Sy('y'): Nu(2), Sy('x'): Nu(6)})
+
+    assert sp0.digest() == sp1.digest()
+    assert sp0.digest() != sp2.digest()
+    assert Pl(Nu(1), (sp0, sp2)).digest() == Pl(Nu(1), (sp2, sp1)).digest()
+    assert Pl(Nu(1), (sp0,)).digest() != Pl(Nu(2), (sp0,)).digest()
+
+
+def test_starpwr_plus_compare(settings):
+    sp0 = SP(Nu(4), {Sy('x'): Nu(2), Sy('y'): Nu(6)})
+    sp1 = SP(Nu(4), {Sy('y'): Nu(6), Sy('x'): Nu(2)})
+    sp2 = SP(Nu(4), {Sy('x'): Nu(3)})
+
+    assert compare(sp0, sp1) == 0
+    assert compare(sp2, sp0) == -1
+    assert compare(Pl(Nu(1), (sp0, sp2)), Pl(Nu(1), (sp2, sp1))) == 0
+    assert compare(Pl(Nu(1), (sp0,)), Pl(Nu(2), (sp0,))) == -1
+
+
+def test_plus_canonical(settings):
+    sp0 = SP(Nu(4), {Sy('x'): Nu(2)})
+    sp1 = SP(Nu(2), {Sy('y'): Nu(1)})
+    plus = Pl(Nu(1), (sp1, sp0)).canonical()
+
+    assert isPl(plus)
+    assert plus.num == Nu(1)
+    assert plus.items == (sp0, sp1)
+    assert plus.is_canonical()
+    assert plus == Pl(Nu(1), (sp0, sp1)).canonical()
+
+
 @pytest.fixture
 def sp_bottomup_rule(settings):
     subber = Substitute(subdict={Sy('x'): Sy('w'), Sy('y'): Sy('z')},)
@@ -93,6 +154,14 @@ def test_starpwr_bottomup(settings, starpwr, sp_bottomup_rule):
     assert out == other
 
 
+def test_starpwr_plus_bottomup_unchanged(settings, starpwr):
+    rule = Substitute(subdict={Sy('q'): Sy('r')}, bottomup=True)
+    plus = Pl(Nu(1), (starpwr,))
+
+    assert rule(starpwr) is starpwr
+    assert rule(plus) is plus
+
+
 @pytest.fixture
 def sp_bottomup_rule2(settings):
     subber = Substitute(subdict={Sy('x'): Sy('y')},)
@@ -768,3 +837,12 @@ def test_real_number_simlify(settings):
 #   xxx = 105; embed()
 
     assert output.value == pytest.approx(correct)
+
+
+def test_memorule_simplify_settings(settings):
+    ex = settings.parse('2 + 3 + x + x')
+    memo = MemoRule(simplify)
+
+    assert memo(ex) == simplify(ex)
+    commonsettings.evalnum = donothing_rule
+    assert memo(ex) == Rules(*simplify.rule_list)(ex)
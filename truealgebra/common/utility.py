@@ -1,10 +1,11 @@
 from truealgebra.common.commonsettings import commonsettings as comset
 
 from truealgebra.core.expressions import (
-    Container, CommAssoc, Number, 
+    Container, CommAssoc, Number, NumberArray, number, null,
     isCommAssoc, isContainer, isNumber,
 )
 from truealgebra.core.rules import Rule, JustOneBU, donothing_rule
+from truealgebra.core.err import ta_logger
 from IPython import embed
 from truealgebra.core.frontend import (
     FrontEnd, HistoryRuleAction, AssignRuleAction, NaturalUpdateAction,
@@ -12,6 +13,16 @@ from truealgebra.core.frontend import (
     AssignUpdateAction, HistoryUpdateAction, PrintAction,
 )
 
+try:
+    import numpy
+except ImportError:
+    # NumberArray instances need numpy, without it there are none.
+    numpy = None
+
+
+def eval_logger(msg):
+    ta_logger.log('Numerical Evaluation Error\n' + msg)
+
 
 def addnums(num0, num1):
     return comset.evalnum(CommAssoc('+', (num0, num1)))
@@ -38,6 +49,8 @@ def negnum(num0):
 
 
 class EvalCommAssocBase(Rule):
+    pure = True
+
     def __init__(self, *args, **kwargs):
         self.name = kwargs['name']
         self.ident = kwargs['ident']
@@ -69,6 +82,15 @@ class EvalCommAssocBase(Rule):
             return CommAssoc(self.name, outlist)
 
 
+def _differs(value, ident):
+    """Is value not equal to ident? An array value always differs, even
+    one with a single element equal to ident.
+    """
+    if getattr(value, 'ndim', 0) > 0:
+        return True
+    return bool(value != ident)
+
+
 class CalcCommAssoc(EvalCommAssocBase):
     def __init__(self, *args, **kwargs):
         self.func = kwargs['func']
@@ -82,8 +104,8 @@ class CalcCommAssoc(EvalCommAssocBase):
                 num = self.func(num, item.value)
             else:
                 outlist.append(item)
-        if num != self.ident.value:
-            outlist.insert(0, Number(num))
+        if _differs(num, self.ident.value):
+            outlist.insert(0, number(num))
         return self.prep_output(outlist)
 
 
@@ -123,10 +145,18 @@ def create_plusCA(alist):
 # EvalMathDict
 # ============
 class EvalMathDictSingle(Rule):
+    pure = True
+
     arity = 1
 
     def __init__(self, *args, **kwargs):
         self.namedict = kwargs['namedict']
+        # Functions used instead of the namedict functions when an item
+        # is a NumberArray instance.
+        if 'arraydict' in kwargs:
+            self.arraydict = kwargs['arraydict']
+        else:
+            self.arraydict = dict()
         super().__init__(*args, **kwargs)
 
     def predicate(self, expr):
@@ -138,11 +168,24 @@ class EvalMathDictSingle(Rule):
 
     def body(self, expr):
         func = self.namedict[expr.name]
+        if not any(isinstance(item, NumberArray) for item in expr):
+            return self.evaluate(func, expr)
+        func = self.arraydict.get(expr.name, func)
+        # A division by zero or an invalid value raises FloatingPointError,
+        # instead of giving inf or nan and a warning, so that arrays give
+        # null as numbers do.
+        with numpy.errstate(divide='raise', invalid='raise'):
+            return self.evaluate(func, expr)
+
+    def evaluate(self, func, expr):
         try:
-            return Number(self.calculation(func, expr))
+            return number(self.calculation(func, expr))
         except ZeroDivisionError:
             eval_logger('Division by zero.')
             return null
+        except FloatingPointError as error:  # NumberArray
+            eval_logger(str(error).capitalize() + '.')
+            return null
         except TypeError:  # complex number
             eval_logger('Complex number cannot be handled.')
             return null
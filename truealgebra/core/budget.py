@@ -0,0 +1,203 @@
+""" budget module
+
+A Budget instance caps the work done by rules while it is active::
+
+    with Budget(visits=100000, seconds=0.5) as budget:
+        out = simplify(expr)
+    if budget.exhausted:
+        ...
+
+Work is counted in
+
+visits
+    Applications of a rule to an expression, one for every node of a
+    bottomup pass, and the items compared by the simplify conversions.
+firings
+    Applications whose tpredicate is true, so that tbody is run.
+matches
+    Attempts to match a pattern item to a target item of a CommAssoc
+    expression, where the backtracking can take exponential time.
+seconds
+    Wall clock time since the budget became active.
+
+Each limit is None by default, no limit. When a limit is reached, the
+exhausted attribute is set to its name. Then, by default, rules stop
+changing expressions: a rule call returns its input, a CommAssoc match
+fails and the simplify conversions stop combining terms. The traversals
+under way finish quickly and the output is a partial result, an
+expression that is equal in value to the input but not fully rewritten.
+MemoRule does not keep outputs made while a budget was exhausted, even
+by a budget that became active and was exited during the call, see
+exhaustions.
+
+With strict=True, a BudgetExhausted exception is raised instead, at the
+first charge past the limit.
+
+Budgets nest. Work is charged to the active budget and to the budgets
+that were active when it became active.
+
+The active budget is held in a context variable, see current_budget. A
+budget is active in the thread, or the asyncio task, that entered it.
+"""
+
+from collections import namedtuple
+from contextvars import ContextVar
+from time import monotonic
+
+from IPython import embed
+
+
+# The clock is read every _CLOCK_MASK + 1 charges.
+_CLOCK_MASK = 31
+
+
+class BudgetExhausted(Exception):
+    """Raised when a strict Budget instance is exhausted."""
+
+
+BudgetInfo = namedtuple(
+    'BudgetInfo', ['visits', 'firings', 'matches', 'seconds', 'exhausted']
+)
+BudgetInfo.__doc__ = """The work charged to a Budget instance.
+
+visits, firings, matches : int
+    The counts so far.
+seconds : float
+    The time since the budget became active.
+exhausted : str or None
+    The name of the limit reached, None when no limit is reached.
+"""
+
+
+_current = ContextVar('budget', default=None)
+
+# Return the active budget, None when there is none.
+current_budget = _current.get
+
+
+class _Exhaustions:
+    """Holds the number of times a budget was exhausted."""
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+_exhaustions = _Exhaustions()
+
+
+class Budget:
+    """Limits on the work done by rules.
+
+    Parameters
+    ----------
+    visits, firings, matches : int, optional
+        The largest counts.
+    seconds : float, optional
+        The largest wall clock time.
+    strict : bool, optional
+        Raise BudgetExhausted instead of returning a partial result.
+
+    Attributes
+    ----------
+    exhausted : str or None
+        The name of the limit reached, None before.
+    """
+    def __init__(
+        self, visits=None, firings=None, matches=None, seconds=None,
+        strict=False
+    ):
+        self.limits = (visits, firings, matches)
+        self.seconds = seconds
+        self.strict = strict
+        self.counts = [0, 0, 0]
+        self.exhausted = None
+        self.start = None
+        self.deadline = None
+        self.parent = None
+        self.ticks = 0
+        self._token = None
+
+    def __enter__(self):
+        self.start = monotonic()
+        if self.seconds is not None:
+            self.deadline = self.start + self.seconds
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self._token)
+        self._token = None
+        self.parent = None
+        return False
+
+    def info(self):
+        """Return a BudgetInfo of the work charged so far."""
+        return BudgetInfo(
+            self.counts[0],
+            self.counts[1],
+            self.counts[2],
+            0.0 if self.start is None else monotonic() - self.start,
+            self.exhausted,
+        )
+
+    def _charge(self, kind, amount):
+        """Charge amount to the count kind, 0 to 2, and check the limits.
+        Return True when the budget is exhausted.
+        """
+        if self.exhausted is not None:
+            return True
+        count = self.counts[kind] + amount
+        self.counts[kind] = count
+        limit = self.limits[kind]
+        if limit is not None and count > limit:
+            return self._exhaust(('visits', 'firings', 'matches')[kind])
+        if self.deadline is not None:
+            self.ticks += 1
+            if not self.ticks & _CLOCK_MASK and monotonic() > self.deadline:
+                return self._exhaust('seconds')
+        if self.parent is not None:
+            return self.parent._charge(kind, amount)
+        return False
+
+    def _exhaust(self, name):
+        self.exhausted = name
+        _exhaustions.count += 1
+        if self.strict:
+            raise BudgetExhausted(
+                'budget exhausted: {} limit reached'.format(name)
+            )
+        return True
+
+    def visit(self, amount=1):
+        """Charge visits, return True when the budget is exhausted."""
+        return self._charge(0, amount)
+
+    def fire(self):
+        """Charge a firing, return True when the budget is exhausted."""
+        return self._charge(1, 1)
+
+    def match(self):
+        """Charge a match attempt, return True when the budget is
+        exhausted.
+        """
+        return self._charge(2, 1)
+
+
+def exhausted():
+    """Is a budget active and exhausted?"""
+    budget = _current.get()
+    while budget is not None:
+        if budget.exhausted is not None:
+            return True
+        budget = budget.parent
+    return False
+
+
+def exhaustions():
+    """Return the number of times a budget was exhausted so far. An
+    output is partial when the number changed while it was computed, or
+    exhausted() is true.
+    """
+    return _exhaustions.count
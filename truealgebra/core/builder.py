@@ -0,0 +1,214 @@
+""" builder module
+
+Build truealgebra expressions in Python, without formatting a string and
+calling settings.parse. A Builder instance wraps an expression and has
+the operators ``+ - * / **``, its expr attribute is the expression::
+
+    x, y = symbols('x y')
+    f = function('f')
+    expr = (f(x, 2) + y**2 / 3).expr
+
+expr above is the same tree as ``settings.parse('f(x, 2) + y**2 / 3')``.
+Python int, float and str operands are converted to Number and Symbol
+instances, like the parser converts numbers and names.
+
+Every new node is made the way the parser makes it: the name is replaced
+by its settings.complement, the class comes from
+settings.container_subclass, so ``+`` gives a CommAssoc instance and
+``:=`` an Assign instance, and the postrule of settings.parse, when there
+is one, is applied to the node. With the std settings, 2/3 gives a
+Fraction and the symbol j gives 1j, as in parsed strings.
+
+Python groups ``a * b * c`` as ``(a * b) * c``, which is the tree of the
+string "(a*b)*c". The parser makes ``*(a, *(b, c))`` from "a*b*c", write
+``a * (b * c)`` to get that tree.
+
+bulk_sum and bulk_product build a single CommAssoc instance from a
+sequence, such as a list or a NumPy array, in one step.
+"""
+
+import numbers
+
+from truealgebra.core.expressions import (
+    ExprBase, Number, Symbol, Container, null
+)
+from truealgebra.core.settings import settings
+from truealgebra.core.err import ta_logger
+
+from IPython import embed
+
+
+def to_expr(obj):
+    """Convert obj to an expression, None when it cannot be converted.
+
+    Builder instances give their expression and expressions are kept.
+    Integers and floats become Number instances of settings.integer_class
+    and settings.float_class, other numbers are kept as the value of a
+    Number. A str is the name of a Symbol.
+    """
+    if isinstance(obj, Builder):
+        return obj.expr
+    elif isinstance(obj, ExprBase):
+        return obj
+    elif isinstance(obj, numbers.Integral):
+        return _post(Number(settings.integer_class(int(obj))))
+    elif isinstance(obj, numbers.Real) and not isinstance(
+        obj, numbers.Rational
+    ):
+        return _post(Number(settings.float_class(float(obj))))
+    elif isinstance(obj, numbers.Number):
+        return _post(Number(obj))
+    elif isinstance(obj, str):
+        return _post(Symbol(obj))
+    else:
+        return None
+
+
+def _post(expr):
+    """Apply the postrule of settings.parse to the new node expr. Its
+    items are already done, so the rule is applied to expr alone.
+    """
+    postrule = getattr(settings.parse, 'postrule', None)
+    if postrule is None:
+        return expr
+    return postrule(expr, _pathinhibit=True, _buinhibit=True)
+
+
+def node(name, items=()):
+    """Return the expression name(items...), made as the parser makes it.
+
+    items are converted with to_expr. An item that cannot be converted is
+    logged and the output is null.
+    """
+    exprs = list()
+    for item in items:
+        expr = to_expr(item)
+        if expr is None:
+            ta_logger.log(
+                'builder cannot convert {} to an expression'.format(
+                    type(item).__qualname__
+                )
+            )
+            return null
+        exprs.append(expr)
+    name = settings.complement.get(name, name)
+    cls = settings.container_subclass.get(name, Container)
+    return _post(cls(name, exprs))
+
+
+def _binary(name, left, right):
+    left = to_expr(left)
+    right = to_expr(right)
+    if left is None or right is None:
+        return NotImplemented
+    return Builder(node(name, (left, right)))
+
+
+class Builder:
+    """Wrapper of an expression with Python operators.
+
+    Attributes
+    ----------
+    expr : ExprBase
+        The expression built so far.
+    """
+    __slots__ = ('expr',)
+
+    def __init__(self, expr):
+        out = to_expr(expr)
+        if out is None:
+            ta_logger.log(
+                'builder cannot convert {} to an expression'.format(
+                    type(expr).__qualname__
+                )
+            )
+            out = null
+        self.expr = out
+
+    def __repr__(self):
+        return 'Builder(' + repr(self.expr) + ')'
+
+    def __str__(self):
+        return str(self.expr)
+
+    def __add__(self, other):
+        return _binary('+', self, other)
+
+    def __radd__(self, other):
+        return _binary('+', other, self)
+
+    def __sub__(self, other):
+        return _binary('-', self, other)
+
+    def __rsub__(self, other):
+        return _binary('-', other, self)
+
+    def __mul__(self, other):
+        return _binary('*', self, other)
+
+    def __rmul__(self, other):
+        return _binary('*', other, self)
+
+    def __truediv__(self, other):
+        return _binary('/', self, other)
+
+    def __rtruediv__(self, other):
+        return _binary('/', other, self)
+
+    def __pow__(self, other):
+        return _binary('**', self, other)
+
+    def __rpow__(self, other):
+        return _binary('**', other, self)
+
+    def __neg__(self):
+        # The parser reads -2 as a negative number and -x as -(x).
+        if isinstance(self.expr, Number):
+            return Builder(_post(Number(-self.expr.value)))
+        return Builder(node('-', (self,)))
+
+    def __pos__(self):
+        return self
+
+
+def symbols(names):
+    """Return a tuple of Builder instances of the Symbols named in names,
+    a str of names separated by white space.
+    """
+    return tuple([Builder(name) for name in names.split()])
+
+
+def function(name):
+    """Return a function that builds name(items...) as a Builder
+    instance.
+    """
+    def build(*items):
+        return Builder(node(name, items))
+    build.__name__ = name
+    return build
+
+
+def assign(lhs, rhs):
+    """Return lhs := rhs as a Builder instance."""
+    return Builder(node(':=', (lhs, rhs)))
+
+
+def restrict(expr, unit):
+    """Return expr`unit as a Builder instance, such as a number with its
+    unit.
+    """
+    return Builder(node('`', (expr, unit)))
+
+
+def bulk_sum(items):
+    """Return the sum of the items of a sequence as a single '+'
+    expression. items can be a NumPy array.
+    """
+    return node('+', items)
+
+
+def bulk_product(items):
+    """Return the product of the items of a sequence as a single '*'
+    expression. items can be a NumPy array.
+    """
+    return node('*', items)
@@ -35,15 +35,449 @@ will modify the subdict dictionary.
 
 """
 
-from abc import ABC, abstractmethod
-from truealgebra.core.rules import Substitute, TrueThing
+from abc import ABCMeta, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cmp_to_key
+import hashlib
+import numbers
+from operator import eq, index, is_, is_not
+import weakref
+
+from truealgebra.core.budget import current_budget, exhausted, exhaustions
+from truealgebra.core.itemvector import ItemVector
+from truealgebra.core.marks import is_marked, mark
+from truealgebra.core.rules import Rule, TrueThing, no_rewrite, substitute
 from truealgebra.core.settings import settings
 from truealgebra.core.err import ta_logger
 
 from IPython import embed
 
-class ExprBase(ABC):
-    
+
+class InternTable:
+    """Weak-value table used to hash-cons (intern) expressions.
+
+    Interning is off by default. When a table is active, every expression
+    instance created by calling its class is replaced by an existing
+    structurally equal instance of the table whenever there is one, so
+    identical expressions are the same object.
+
+    The active table is held in a context variable, see
+    current_intern_table. A table is active in the thread, or the asyncio
+    task, that enabled it.
+
+    The table key of an expression is provided by its _intern_key method.
+    Container keys use the identities of the items, therefore a Container
+    is shared only when its items are shared. Expressions with an
+    _intern_key of None are never interned.
+
+    Attributes
+    ----------
+    table : weakref.WeakValueDictionary
+        Interned expressions. An entry disappears when its expression is
+        no longer referenced anywhere else.
+    active : bool
+        True when self is the active table, newly created expressions
+        are interned in it.
+    hits : int
+        Number of times an existing expression was returned.
+    misses : int
+        Number of times a new expression was added to the table.
+    """
+    def __init__(self):
+        self.table = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def active(self):
+        return _active_table.get() is self
+
+    def enable(self):
+        _active_table.set(self)
+
+    def disable(self):
+        if self.active:
+            _active_table.set(None)
+
+    def clear(self):
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def suspended(self):
+        """Temporarily turn off interning, used while parsing because
+        the parser mutates its tokens.
+        """
+        token = _active_table.set(None)
+        try:
+            yield self
+        finally:
+            _active_table.reset(token)
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.table),
+        }
+
+    def lookup(self, expr):
+        """Return the interned expression structurally equal to expr.
+
+        expr is added to the table when there is no such expression.
+        """
+        key = expr._intern_key()
+        if key is None:
+            return expr
+        try:
+            found = self.table.get(key)
+        except TypeError:  # unhashable content
+            return expr
+        if found is not None:
+            self.hits += 1
+            return found
+        self.misses += 1
+        self.table[key] = expr
+        return expr
+
+    def intern(self, expr):
+        """Intern expr and all of its sub-expressions, deepest first.
+
+        An expression is rebuilt from its interned parts when any of them
+        is a different object. An explicit stack is used, deep
+        expressions do not hit the recursion limit.
+        """
+        # Interned sub-expressions by id, for shared sub-expressions.
+        # The ids stay valid, expr holds all of its sub-expressions.
+        done = dict()
+        parts = expr._intern_parts()
+        # A frame is (expr, its parts, iterator over them, interned parts).
+        stack = [(expr, parts, iter(parts), list())]
+        while True:
+            node, parts, remaining, interned = stack[-1]
+            for part in remaining:
+                try:
+                    interned.append(done[id(part)])
+                    continue
+                except KeyError:
+                    pass
+                subparts = part._intern_parts()
+                if subparts:
+                    stack.append((part, subparts, iter(subparts), list()))
+                    break
+                value = done[id(part)] = self.lookup(part)
+                interned.append(value)
+            else:
+                stack.pop()
+                if any(map(is_not, interned, parts)):
+                    value = self.lookup(node._from_parts(tuple(interned)))
+                else:
+                    value = self.lookup(node)
+                if not stack:
+                    return value
+                done[id(node)] = value
+                stack[-1][3].append(value)
+
+
+_active_table = ContextVar('intern_table', default=None)
+
+# Return the active InternTable, None when interning is off.
+current_intern_table = _active_table.get
+
+intern_table = InternTable()
+
+
+# Binding powers are only used for tokens while parsing. Rather than
+# occupying space in every expression, they are kept in the table below,
+# keyed on the identity of the token. An entry is removed when its
+# expression is garbage collected, the parser releases the entries of its
+# tokens at the end of each parse.
+_binding_powers = dict()
+
+
+def _binding_power(expr, ndx):
+    entry = _binding_powers.get(id(expr))
+    if entry is None:
+        return 0
+    return entry[ndx]
+
+
+def _set_binding_power(expr, ndx, value):
+    key = id(expr)
+    entry = _binding_powers.get(key)
+    if entry is None:
+        if not value:
+            return
+        ref = weakref.ref(
+            expr, lambda ref, key=key: _binding_powers.pop(key, None)
+        )
+        entry = _binding_powers[key] = [ref, 0, 0]
+    entry[ndx] = value
+
+
+def release_binding_powers(exprs):
+    """Forget the binding powers of exprs, called after parsing."""
+    for expr in exprs:
+        _binding_powers.pop(id(expr), None)
+
+
+# Stable digests
+# --------------
+# A digest is a Merkle hash, computed from the digests of the
+# sub-expressions. Unlike hash(), it does not depend on PYTHONHASHSEED
+# and can be used as a key across processes and on disk.
+DIGEST_SIZE = 20
+
+
+def digest_parts(*parts):
+    """Digest of a sequence of bytes objects.
+
+    Every part is prefixed with its length, so that different sequences
+    of parts cannot produce the same input to the hash function.
+    """
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        hasher.update(len(part).to_bytes(8, 'little'))
+        hasher.update(part)
+    return hasher.digest()
+
+
+def type_tag(obj):
+    """bytes that identify the class of obj"""
+    cls = type(obj)
+    return (cls.__module__ + '.' + cls.__qualname__).encode('utf-8')
+
+
+def name_tag(name):
+    if name is None:
+        return b'n'
+    return b's' + str(name).encode('utf-8')
+
+
+# Expression statistics
+# ---------------------
+ExprStats = namedtuple('ExprStats', ['symbols', 'heads', 'size', 'depth'])
+ExprStats.__doc__ = """Statistics of an expression, output of exprstats.
+
+symbols : frozenset
+    The Symbol instances in the expression.
+heads : frozenset
+    The names of the Container instances in the expression.
+size : int
+    The number of sub-expressions, including the expression itself.
+depth : int
+    1 for an atom, 1 more than the deepest item for a container.
+"""
+
+_nothing = frozenset()
+
+
+def _union(sets):
+    """Union of frozensets. A set that holds all of the others is
+    returned as is, which saves memory when statistics are memoized.
+    """
+    largest = max(sets, key=len, default=_nothing)
+    for other in sets:
+        if other is not largest and not other <= largest:
+            return largest.union(*sets)
+    return largest
+
+
+def _own_stats(expr, stats):
+    """Combine the stats of the sub-expressions of expr with expr."""
+    if None in stats:
+        return None
+    symbols = _union([stat.symbols for stat in stats])
+    heads = _union([stat.heads for stat in stats])
+    if isinstance(expr, Symbol) and expr not in symbols:
+        symbols = symbols | {expr}
+    if isinstance(expr, Container) and expr.name not in heads:
+        heads = heads | {expr.name}
+    return ExprStats(
+        symbols,
+        heads,
+        1 + sum([stat.size for stat in stats]),
+        1 + max([stat.depth for stat in stats], default=0),
+    )
+
+
+def exprstats(expr):
+    """Return the ExprStats of expr.
+
+    The statistics are computed once for a Container or StarPwr instance
+    and memoized, so later calls and rules that prune with them do not
+    walk the expression again. There is no recursion.
+
+    The output is None when expr holds an expression of a class that does
+    not define its sub-expressions, its statistics cannot be known.
+    """
+    try:
+        return expr._stats
+    except AttributeError:
+        pass
+    # A frame is (expr, iterator over its sub-expressions, their stats).
+    subs = expr._subexprs()
+    if subs is None:
+        return None
+    stack = [(expr, iter(subs), list())]
+    while True:
+        node, subexprs, stats = stack[-1]
+        for sub in subexprs:
+            try:
+                stats.append(sub._stats)
+                continue
+            except AttributeError:
+                pass
+            subs = sub._subexprs()
+            if subs is None:
+                stats.append(None)
+            else:
+                stack.append((sub, iter(subs), list()))
+                break
+        else:
+            stack.pop()
+            result = _own_stats(node, stats)
+            try:
+                object.__setattr__(node, '_stats', result)
+            except AttributeError:
+                # no _stats attribute, atoms are not memoized
+                pass
+            if not stack:
+                return result
+            stack[-1][2].append(result)
+
+
+def _pruning(rule):
+    """Return the (heads, symbols) declared by rule, or None when the rule
+    does not declare both or symbols holds anything but Symbols.
+    """
+    heads = getattr(rule, 'heads', None)
+    symbols = getattr(rule, 'symbols', None)
+    if heads is None or symbols is None:
+        return None
+    for symbol in symbols:
+        if not isinstance(symbol, Symbol):
+            return None
+    return frozenset(heads), frozenset(symbols)
+
+
+def _prunes(heads, symbols, expr):
+    """Can a rule that only changes Containers named in heads and Symbols
+    in symbols leave expr and all of its sub-expressions alone?
+    """
+    stats = exprstats(expr)
+    return (
+        stats is not None
+        and stats.heads.isdisjoint(heads)
+        and stats.symbols.isdisjoint(symbols)
+    )
+
+
+# Canonical ordering
+# ------------------
+def compare(expr0, expr1):
+    """Compare two expressions in the canonical order.
+
+    The output is -1 when expr0 comes first, 1 when expr1 comes first and
+    0 when the expressions are equal. Numbers come first, ordered by
+    value, then Symbol instances ordered by name, then the other
+    expressions ordered by class, name and then items. The items of
+    CommAssoc instances are compared in canonical order. The order is
+    total and does not depend on hash values or ids, it is the same in
+    every session. There is no recursion.
+    """
+    # The stack holds pairs of expressions still to compare, in order.
+    stack = [(expr0, expr1)]
+    while stack:
+        expr0, expr1 = stack.pop()
+        if expr0 is expr1:
+            continue
+        key0 = expr0._order_key()
+        key1 = expr1._order_key()
+        if key0 != key1:
+            return -1 if key0 < key1 else 1
+        items0 = expr0._order_items()
+        items1 = expr1._order_items()
+        if len(items0) != len(items1):
+            return -1 if len(items0) < len(items1) else 1
+        stack.extend(reversed(list(zip(items0, items1))))
+    return 0
+
+
+# Key for sorted and list.sort, puts expressions in canonical order.
+order_key = cmp_to_key(compare)
+
+
+def _number_key(value):
+    """Part of the order key of a Number instance. Real and complex
+    values are ordered by value, anything else by type name and repr.
+    """
+    if isinstance(value, numbers.Number):
+        if value != value:
+            # nan
+            return (1, 0, 0)
+        if isinstance(value, numbers.Real):
+            return (0, value, 0)
+        if isinstance(value, numbers.Complex):
+            return (0, value.real, value.imag)
+    return (2, type(value).__qualname__, repr(value))
+
+
+def _canonicalize(expr):
+    """Memoize the canonical order of expr and all of its sub-expressions
+    that have one, innermost first. Sorting the items of an expression
+    then never needs to sort the items of another one.
+    """
+    stack = [(expr, iter(expr._subexprs() or ()))]
+    while stack:
+        node, subs = stack[-1]
+        for sub in subs:
+            # A memoized order means the order inside is memoized too.
+            if not hasattr(sub, '_canonical'):
+                stack.append((sub, iter(sub._subexprs() or ())))
+                break
+        else:
+            stack.pop()
+            if (
+                hasattr(type(node), '_canonical')
+                and not hasattr(node, '_canonical')
+            ):
+                object.__setattr__(node, '_canonical', node._sort_items())
+
+
+def _known_canonical(expr):
+    """Is expr a CommAssoc instance already known to be in canonical
+    order? Nothing is computed.
+    """
+    try:
+        return expr._canonical is expr.items
+    except AttributeError:
+        return False
+
+
+class ExprMeta(ABCMeta):
+    """Metaclass of all truealgebra expressions.
+
+    Newly created expressions are passed through the active InternTable,
+    when there is one.
+    """
+    def __call__(cls, *args, **kwargs):
+        table = _active_table.get()
+        if table is None:
+            return type.__call__(cls, *args, **kwargs)
+        return table.lookup(type.__call__(cls, *args, **kwargs))
+
+
+class ExprBase(metaclass=ExprMeta):
+    # Expressions do not have an instance __dict__. Subclasses list their
+    # attributes in __slots__. Container memoizes its hash in the _hash
+    # slot and the other memoized values in a _Memo object.
+    __slots__ = ('__weakref__',)
+
     def __setattr__(self, name, value):
         if name in ('lbp', 'rbp'):
             object.__setattr__(self, name, value)
@@ -61,12 +495,31 @@ class ExprBase(ABC):
 
     @abstractmethod
     def bottomup(self, rule):
+        """Apply rule to every sub-expression, deepest first.
+
+        A sub-expression is not rebuilt when the rule changes none of its
+        items, the original object is kept. When nothing changes at all
+        the output is self, so ``expr.bottomup(rule) is expr`` tells
+        cheaply that the rule had no effect.
+        """
         pass
 
     @abstractmethod
     def apply2path(self, path, rule, _buinhibit=False):
         pass
 
+    def apply2paths(self, paths, rule, _buinhibit=False):
+        """Apply rule at every path in paths, in a single traversal.
+
+        The paths are put in a trie, a container above several targets
+        is rebuilt once. When a target is inside another target, the rule
+        is applied to the inner one first. Repeated paths, including a
+        negative and a positive index of the same item, are applied once.
+        Paths that cannot be followed are logged and give null, the same
+        as with apply2path.
+        """
+        return _apply2paths(self, path_trie(paths), rule, _buinhibit)
+
     @abstractmethod
     def match(self, vardict, subdict, pred_rule, expr):
         pass
@@ -79,12 +532,82 @@ class ExprBase(ABC):
     def __hash__(self):
         pass
 
-    lbp = 0     # left binding power
-    rbp = 0     # right binding power
+    @property
+    def lbp(self):
+        """left binding power, only used during parsing"""
+        return _binding_power(self, 1)
+
+    @lbp.setter
+    def lbp(self, value):
+        _set_binding_power(self, 1, value)
+
+    @property
+    def rbp(self):
+        """right binding power, only used during parsing"""
+        return _binding_power(self, 2)
+
+    @rbp.setter
+    def rbp(self, value):
+        _set_binding_power(self, 2, value)
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def _intern_key(self):
+        """Key used by intern_table, None means never interned."""
+        return None
+
+    def digest(self):
+        """Return a stable digest of self as a bytes object.
+
+        Equal digests identify equal expressions. Expressions that are
+        equal but hold numbers of a different type, such as 1 and 1.0,
+        have different digests. The digest is memoized.
+        """
+        try:
+            return self._digest
+        except AttributeError:
+            pass
+        return _fill_digests(self)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+    def _compute_digest(self):
+        raise TypeError(
+            'no digest defined for {}'.format(type(self).__qualname__)
+        )
+
+    def _intern_parts(self):
+        """The sub-expressions interned before self, see
+        InternTable.intern.
+        """
+        return ()
+
+    def _from_parts(self, parts):
+        """Return a copy of self made of parts, the interned
+        _intern_parts of self.
+        """
+        return self
+
+    def _subexprs(self):
+        """The sub-expressions counted by exprstats, None when they are
+        not known.
+        """
+        return None
+
+    # Rank of the class in the canonical order, see compare.
+    _order_rank = 2
+
+    def _order_key(self):
+        """compare compares the order keys of two expressions first and
+        then their order items.
+        """
+        return (self._order_rank, type_tag(self), repr(self))
+
+    def _order_items(self):
+        return ()
+
     # settings.unparse must be a function with one argument that converts
     # an expression to a mathematically readable string.
     # As per stackoverflow question 1436703, users Martelli and moshez
@@ -94,9 +617,20 @@ class ExprBase(ABC):
 
 # NOT Unit Tested
 class MultiExprs(ExprBase):
+    __slots__ = ('exprs', '_hash', '_digest')
+
     def __init__(self, exprs=()):
         object.__setattr__(self, "exprs", tuple(exprs))
 
+    def _subexprs(self):
+        return self.exprs
+
+    def _order_key(self):
+        return (self._order_rank, type_tag(self))
+
+    def _order_items(self):
+        return self.exprs
+
     def __getitem__(self, ndex):
         return self.exprs[ndex]
 
@@ -105,9 +639,12 @@ class MultiExprs(ExprBase):
             yield expr
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if (
             type(self) is not type(other)
             or len(self.exprs) != len(other.exprs)
+            or hash(self) != hash(other)
         ):
             return False
         else:
@@ -117,11 +654,25 @@ class MultiExprs(ExprBase):
         return True
 
     def __hash__(self):
-        return hash((
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        value = hash((
             type(self),
             len(self.exprs),
             tuple(map(hash, self.exprs)),
         ))
+        object.__setattr__(self, '_hash', value)
+        return value
+
+    def __reduce__(self):
+        return (self.__class__, (self.exprs,))
+
+    def _compute_digest(self):
+        return digest_parts(
+            type_tag(self), *[expr.digest() for expr in self.exprs]
+        )
 
     def __repr__(self):
         out = 'MultiExprs[['
@@ -146,8 +697,15 @@ class MultiExprs(ExprBase):
 
 
 class NullSingleton(ExprBase):
+    __slots__ = ()
     _instance = None
 
+    def __reduce__(self):
+        return (self.__class__, ())
+
+    def digest(self):
+        return digest_parts(type_tag(self))
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(NullSingleton, cls).__new__(cls)
@@ -159,6 +717,12 @@ class NullSingleton(ExprBase):
     def apply2path(self, path, rule, _buinhibit=False):
         return null
 
+    def _subexprs(self):
+        return ()
+
+    def _order_key(self):
+        return (self._order_rank, type_tag(self))
+
     def match(self, vardict, subdict, pred_rule, expr):
         return expr is self
 
@@ -174,6 +738,11 @@ class NullSingleton(ExprBase):
 null = NullSingleton()
 
 class Atom(ExprBase):
+    __slots__ = ()
+
+    def _subexprs(self):
+        return ()
+
     def bottomup(self, rule):
         return rule(self, _pathinhibit=True, _buinhibit=True)
 
@@ -189,9 +758,17 @@ class Atom(ExprBase):
 
             
 class Symbol(Atom):
+    __slots__ = ('name', '_digest')
+
     def __init__(self, name=""):
         object.__setattr__(self, "name", name)
 
+    def __reduce__(self):
+        return (self.__class__, (self.name,))
+
+    def _compute_digest(self):
+        return digest_parts(type_tag(self), name_tag(self.name))
+
     @classmethod
     def isspecialsymbol(cls, expr):
         return (
@@ -221,8 +798,7 @@ class Symbol(Atom):
             return True
         else:
             pred_subdict = {self: expr, any__: expr}
-            sub_rule = Substitute(subdict=pred_subdict, bottomup=True)
-            pred_eval = pred_rule(sub_rule(vardict[self]))
+            pred_eval = pred_rule(substitute(vardict[self], pred_subdict))
             if pred_eval == true:
                 subdict[self] = expr
                 return True
@@ -232,6 +808,14 @@ class Symbol(Atom):
     def __eq__(self, other):
         return(type(self) == type(other) and self.name == other.name)
 
+    def _intern_key(self):
+        return (type(self), self.name)
+
+    _order_rank = 1
+
+    def _order_key(self):
+        return (self._order_rank, self.name, type_tag(self))
+
     def __hash__(self):
         return hash((type(self), self.name))
 
@@ -246,9 +830,21 @@ any__ = Symbol('__any')
 
 
 class Number(Atom):
+    __slots__ = ('value', '_digest')
+
     def __init__(self, value):
         object.__setattr__(self, "value", value)
 
+    def __reduce__(self):
+        return (self.__class__, (self.value,))
+
+    def _compute_digest(self):
+        return digest_parts(
+            type_tag(self),
+            type_tag(self.value),
+            repr(self.value).encode('utf-8'),
+        )
+
     def __hash__(self):
         return hash((type(self), self.value))
 
@@ -264,15 +860,180 @@ class Number(Atom):
     def __repr__(self):
         return repr(self.value)
 
+    def _intern_key(self):
+        value = self.value
+        # nan is not equal to itself and 0.0 == -0.0, do not merge them.
+        if value != value or (not value and not isinstance(value, int)):
+            return None
+        # The type of value is part of the key, Number(1) == Number(1.0)
+        # but they must remain different objects.
+        return (type(self), type(value), value)
+
+    _order_rank = 0
+
+    def _order_key(self):
+        return (self._order_rank,) + _number_key(self.value) + (
+            type_tag(self),
+        )
+
+
+class NumberArray(Number):
+    """A Number whose value is a NumPy array of numbers.
+
+    A single expression can then stand for a number at every point of a
+    dataset, and evaluating the expression evaluates it at all points at
+    once. The numerical rules of truealgebra.std.evalnum broadcast over
+    the arrays. Use the number function to get a NumberArray instance
+    for array values and a Number instance for other values.
+
+    The value is a read only view of the array, the array itself must
+    not be modified afterwards. numpy is not imported by this module, the
+    value only needs the methods of a numpy.ndarray.
+
+    Two instances are equal when their arrays have the same shape and
+    equal elements, like Number instances the dtype does not matter. The
+    hash only depends on the shape, it is cheap but arrays of the same
+    shape collide. Instances are never interned.
+    """
+    __slots__ = ()
+
+    def __init__(self, value):
+        if value.flags.writeable:
+            value = value.view()
+            value.flags.writeable = False
+        object.__setattr__(self, "value", value)
+
+    def _compute_digest(self):
+        value = self.value
+        return digest_parts(
+            type_tag(self),
+            value.dtype.str.encode('utf-8'),
+            repr(value.shape).encode('utf-8'),
+            value.tobytes(),
+        )
+
+    def __hash__(self):
+        return hash((type(self), self.value.shape))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return False
+        value = self.value
+        other_value = other.value
+        return value is other_value or (
+            value.shape == other_value.shape
+            and bool((value == other_value).all())
+        )
+
+    def summary(self, edgeitems=3):
+        """Return a short str of the array, at most edgeitems elements
+        at each end of the flattened array are shown.
+        """
+        flat = self.value.ravel()
+        if flat.size <= 2 * edgeitems:
+            elements = [repr(item) for item in flat.tolist()]
+        else:
+            elements = (
+                [repr(item) for item in flat[:edgeitems].tolist()]
+                + ['...']
+                + [repr(item) for item in flat[-edgeitems:].tolist()]
+            )
+        out = '[' + ', '.join(elements) + ']'
+        if self.value.ndim > 1:
+            out += ' shape ' + repr(self.value.shape)
+        return out
+
+    def __repr__(self):
+        return 'NumberArray(' + self.summary() + ')'
+
+    def _intern_key(self):
+        return None
+
+    def _order_key(self):
+        # After all scalar Numbers, then by shape and elements.
+        return (
+            self._order_rank,
+            3,
+            self.value.shape,
+            tuple(map(_number_key, self.value.ravel().tolist())),
+        )
+
+
+def number(value):
+    """Return a NumberArray instance when value is an array, otherwise a
+    Number instance.
+    """
+    if getattr(value, 'ndim', 0):
+        return NumberArray(value)
+    return Number(value)
+
+
+class _Memo:
+    """The values memoized by a Container instance, other than its hash,
+    which has its own _hash slot. Hashing never creates a _Memo object.
+
+    Few expressions need them, so they are kept in one object, created
+    when the first of them is set, rather than in slots of every
+    Container instance.
+    """
+    __slots__ = ('_digest', '_stats', '_marks', '_multiset', '_canonical')
+
+
+class _MemoField:
+    """Attribute of a Container instance kept in its _Memo object. Like
+    an empty slot, it raises AttributeError when it is not set.
+    """
+    __slots__ = ('field',)
+
+    def __init__(self, field):
+        # the member descriptor of the _Memo slot
+        self.field = field
+
+    def __get__(self, expr, owner=None):
+        if expr is None:
+            return self
+        return self.field.__get__(_memo_get(expr))
+
+    def __set__(self, expr, value):
+        try:
+            memo = _memo_get(expr)
+        except AttributeError:
+            memo = _Memo()
+            _memo_set(expr, memo)
+        self.field.__set__(memo, value)
+
+    def __delete__(self, expr):
+        self.field.__delete__(_memo_get(expr))
+
 
 class Container(ExprBase):
+    __slots__ = ('name', 'items', '_hash', '_memo')
+    _digest = _MemoField(_Memo._digest)
+    _stats = _MemoField(_Memo._stats)
+    _marks = _MemoField(_Memo._marks)
+
+    # The number of leading items that bottomup and apply2path leave alone.
+    _closed_items = 0
+
     def __init__(self, name, items=(), lbp=None, rbp=None):
         object.__setattr__(self, "name", name)
-        object.__setattr__(self, "items", tuple(items))
+        object.__setattr__(self, "items", _stored_items(items))
         if lbp is not None:
-            object.__setattr__(self, "lbp", lbp)
+            self.lbp = lbp
         if rbp is not None:
-            object.__setattr__(self, "rbp", rbp)
+            self.rbp = rbp
+
+    def __reduce__(self):
+        return (self.__class__, (self.name, self.items))
+
+    def _compute_digest(self):
+        return digest_parts(
+            type_tag(self),
+            name_tag(self.name),
+            *[item.digest() for item in self.items]
+        )
 
     def __len__(self):
         return len(self.items)
@@ -285,125 +1046,119 @@ class Container(ExprBase):
             yield item
 
     def __repr__(self):
-        out = self.name + "("
-        if self.items:
-            out = out + repr(self.items[0])
-            for item in self.items[1:]:
-                out += ', ' + repr(item)
-        return out + ")"
+        return _repr(self)
+
+    def _rebuild(self, items):
+        """Return a new instance like self but with different items."""
+        return self.__class__(self.name, items)
+
+    def _subexprs(self):
+        return self.items
 
     def bottomup(self, rule):
-        return rule(
-            self.__class__(
-                self.name,
-                tuple([item.bottomup(rule) for item in self.items])),
-            _pathinhibit=True,
-            _buinhibit=True)
+        return _bottomup(self, rule)
 
     def apply2path(self, path, rule, _buinhibit=False):
-        if not path:
-            return rule(self, _pathinhibit=True, _buinhibit=_buinhibit)
-        try:
-            nxt = path[0]
-            path = path[1:]
-            result = self[nxt].apply2path(path, rule, _buinhibit=_buinhibit)
-            newitems = (self[:nxt] + (result,) + self[nxt:][1:])
-            return self.__class__(self.name, newitems)
-        except IndexError:
-            ta_logger.log("index error in path")
-            return null
-        except TypeError:
-            ta_logger.log("type error in path")
-            return null
+        return _apply2path(self, path, rule, _buinhibit)
 
     def __eq__(self, other):
-        if (
-            type(self) is not type(other)
-            or self.name != other.name
-            or len(self) != len(other)
-        ):
-            return False
-        else:
-            for ndx, item in enumerate(self):
-                if item != other[ndx]:
-                    return False
-        return True
+        if self is other:
+            return True
+        return _eq(self, other)
 
     def __hash__(self):
-        return hash((
-            self.name,
-            type(self),
-            len(self),
-            tuple(map(hash, self.items)),
-        ))
+        # The hash is computed once and then memoized, an expression
+        # cannot be changed after it is created.
+        try:
+            return self._hash
+        except AttributeError:
+            return _hash(self)
+
+    @classmethod
+    def _combine_hash(cls, name, hashes):
+        """Return the hash of a cls instance from its name and the tuple
+        of the hashes of its items.
+        """
+        return hash((name, cls, len(hashes), hashes))
 
     def match(self, vardict, subdict, pred_rule, expr):
-        if (
-            type(expr) is not type(self)
-            or expr.name != self.name
-            or len(expr) != len(self)
-        ):
-            return False
+        return _match(self, vardict, subdict, pred_rule, expr)
 
-        iterexpr = iter(expr)
-        for item in self:
-            if not item.match(vardict, subdict, pred_rule, next(iterexpr)):
-                return False
-        return True
+    def _intern_key(self):
+        return (type(self), self.name, tuple(map(id, self.items)))
+
+    def _order_key(self):
+        return (self._order_rank, type_tag(self), name_tag(self.name))
+
+    def _order_items(self):
+        return self.items
+
+    def _intern_parts(self):
+        return self.items
+
+    def _from_parts(self, parts):
+        return self._rebuild(parts)
+
+    def _clear_hash(self):
+        """ Used only in parsing, tokens are mutated"""
+        for name in ("_hash", "_memo"):
+            try:
+                object.__delattr__(self, name)
+            except AttributeError:
+                pass
 
     def _append_item(self, item):
         """ Used only in parsing"""
-        object.__setattr__(self, "items", self.items + (item,))
+        self._clear_hash()
+        object.__setattr__(
+            self, "items", _stored_items(self.items + (item,)))
 
     def _bind_left(self, token):
         """ Used only in parsing"""
+        self._clear_hash()
         self.lbp = 0
-        object.__setattr__(self, "items", (token,) + self.items)
+        object.__setattr__(
+            self, "items", _stored_items((token,) + self.items))
 
     def _bind_right(self, token):
         """ Used only in parsing"""
+        self._clear_hash()
         self.rbp = 0
-        object.__setattr__(self, "items", self.items + (token,))
+        object.__setattr__(
+            self, "items", _stored_items(self.items + (token,)))
+
+
+_memo_get = Container._memo.__get__
+_memo_set = Container._memo.__set__
+
+
+def _stored_items(items):
+    """Return items as stored in a Container: a tuple, or an ItemVector
+    when items is one or when there are at least settings.vector_min
+    items.
+    """
+    if type(items) is ItemVector:
+        return items
+    items = tuple(items)
+    if settings.vector_min is not None and len(items) >= settings.vector_min:
+        return ItemVector(items)
+    return items
 
 # this has not been completely unit tested
 class Assign(Container):
     """Assign class instance and used to modify the Assign_Rule instances
     inside instanes fo FrontEnd.
     """
+    __slots__ = ()
 
-    def bottomup(self, rule):
-        newitems = list(self.items[:1])
-        for item in self.items[1:]:
-            newitems.append(item.bottomup(rule))
-        return rule(
-            self.__class__(self.name, newitems),
-            _pathinhibit=True,
-            _buinhibit=True
-        )
-
-    def apply2path(self, path, rule, _buinhibit=False):
-        if not path:
-            return rule(self, _pathinhibit=True, _buinhibit=_buinhibit)
-        try:
-            nxt = path[0]
-            path = path[1:]
-            if nxt == 0 or nxt == -len(self.items):
-                ta_logger.log("Assign 0 item closed to path")
-                return null
-            else:
-                result = self[nxt].apply2path(path, rule, _buinhibit=_buinhibit)
-                newitems = (self[:nxt] + (result,) + self[nxt:][1:])
-                return self.__class__(self.name, newitems)
-        except IndexError:
-            ta_logger.log("index error in path")
-            return null
-        except TypeError:
-            ta_logger.log("type error in path")
-            return null
+    # Item 0 is closed to bottomup and to paths.
+    _closed_items = 1
 
 
 # used with units and complete_natural/-rule
 class Restricted(Container):
+    __slots__ = ()
+
 
     def bottomup(self, rule):
         return rule(self, _pathinhibit=True, _buinhibit=True)
@@ -417,39 +1172,116 @@ class Restricted(Container):
 
 
 class CommAssoc(Container):
-    def __hash__(self):
-        # another way to hash the self.items is to use the xor function ^
+    __slots__ = ()
+    _multiset = _MemoField(_Memo._multiset)
+    _canonical = _MemoField(_Memo._canonical)
+
+    # Defining __eq__ would otherwise unset __hash__.
+    __hash__ = Container.__hash__
+
+    @classmethod
+    def _combine_hash(cls, name, hashes):
+        # another way to hash the items is to use the xor function ^
         # xor is both associative and communative
-        return hash((
-            type(self),
-            self.name,
-            tuple(sorted(map(hash, self.items)))
-        ))
+        return hash((cls, name, tuple(sorted(hashes))))
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if (
                 self.name != other.name
                 or type(self) is not type(other)
                 or len(self) != len(other)
+                or hash(self) != hash(other)
             ):
             return False
+        elif _known_canonical(self) and _known_canonical(other):
+            # Both are in canonical order, equal items are lined up.
+            return all(map(eq, self.items, other.items))
         else:
-            return self.inner_eq(list(self.items), list(other.items))
+            return self.multiset() == other.multiset()
+
+    def _compute_digest(self):
+        # The digest does not depend on the order of the items.
+        return digest_parts(
+            type_tag(self),
+            name_tag(self.name),
+            *sorted([item.digest() for item in self.items])
+        )
+
+    def multiset(self):
+        """Return the items of self as a multiset.
+
+        The output is a dict, the keys are the distinct items and the
+        values are the number of times they occur. It is computed once and
+        memoized, it must not be modified. Two CommAssoc instances
+        have equal items, regardless of order, when their multisets are
+        equal. Items that collide on hash are told apart by the dict.
+        """
+        try:
+            return self._multiset
+        except AttributeError:
+            pass
+        counts = dict()
+        for item in self.items:
+            counts[item] = counts.get(item, 0) + 1
+        object.__setattr__(self, '_multiset', counts)
+        return counts
+
+    def canonical_items(self):
+        """Return the items of self in canonical order, a tuple. It is
+        computed once and memoized.
+        """
+        try:
+            return self._canonical
+        except AttributeError:
+            pass
+        _canonicalize(self)
+        return self._canonical
+
+    def _sort_items(self):
+        ordered = tuple(sorted(self.items, key=order_key))
+        if all(map(is_, ordered, self.items)):
+            # Already in order, self is a normal form.
+            return self.items
+        return ordered
+
+    def is_canonical(self):
+        """Are the items of self in canonical order?"""
+        return self.canonical_items() is self.items
+
+    def canonical(self):
+        """Return the normal form of self, with its items in canonical
+        order. The output is self when it is already in normal form.
+
+        The normal form is not applied to the items, use sort_commassoc
+        to put every CommAssoc instance in an expression in normal form.
+        Two CommAssoc instances in normal form are compared item by item
+        and matched faster.
+        """
+        ordered = self.canonical_items()
+        if ordered is self.items:
+            return self
+        out = self._rebuild(ordered)
+        if isinstance(out, CommAssoc) and all(map(is_, out.items, ordered)):
+            object.__setattr__(out, '_canonical', out.items)
+        return out
+
+    def _order_items(self):
+        return self.canonical_items()
 
-# this is perhaps not the most clear or effecient method
-# This will work quickly if self.items and other.items are ordered the same
     def inner_eq(self, selflist, otherlist):
-        if not selflist:
-            return True
+        """Is every item in selflist matched by a different equal item
+        in otherlist?
+        """
+        counts = dict()
+        for otem in otherlist:
+            counts[otem] = counts.get(otem, 0) + 1
         for item in selflist:
-            ndx = -1
-            for nndex, otem in enumerate(otherlist):
-                if otem == item:
-                    ndx = nndex
-                    break
-            if ndx == -1:
+            count = counts.get(item, 0)
+            if not count:
                 return False
-            del otherlist[ndx]
+            counts[item] = count - 1
         return True
 
     def match(self, vardict, subdict, pred_rule, expr):
@@ -463,21 +1295,793 @@ class CommAssoc(Container):
         return cam.find_matches()
 
 
+class SortCommAssoc(Rule):
+    """Put CommAssoc instances in normal form, their items in canonical
+    order.
+    """
+    def predicate(self, expr):
+        return isinstance(expr, CommAssoc) and not expr.is_canonical()
+
+    def body(self, expr):
+        return expr.canonical()
+
+
+sort_commassoc = SortCommAssoc(bottomup=True)
+
+
+# Explicit stack traversal
+# ------------------------
+# The Container methods bottomup, apply2path, match, __eq__, __hash__ and
+# __repr__ call the functions below, which walk an expression with an
+# explicit stack instead of recursion. There is no limit on the depth of
+# an expression. A sub-expression is handled inline when its class uses
+# the Container method, otherwise its own method is called.
+
+def _bottomup(expr, rule):
+    if getattr(rule, 'dag', False) and rule.pure:
+        return _dag_bottomup(expr, rule)
+    # Rules that declare heads and symbols skip sub-expressions where
+    # they cannot change anything.
+    prune = _pruning(rule)
+    if prune is not None:
+        heads, symbols = prune
+        if _prunes(heads, symbols, expr):
+            return expr
+    # Rules with marks skip the sub-expressions marked as left unchanged
+    # by a previous pass, and mark the ones this pass leaves unchanged.
+    token = None
+    if getattr(rule, 'marks', False) and rule.pure:
+        token = rule.token
+        idempotent = rule.idempotent
+        if is_marked(expr, token):
+            return expr
+        count = exhaustions()
+    engine = Container.bottomup
+    leaf = Atom.bottomup
+    # A frame is (container, iterator over its open items, new items).
+    stack = [_bottomup_frame(expr)]
+    while True:
+        node, items, newitems = stack[-1]
+        for item in items:
+            method = type(item).bottomup
+            if method is leaf:
+                if prune is not None and item not in symbols:
+                    newitems.append(item)
+                else:
+                    newitems.append(
+                        rule(item, _pathinhibit=True, _buinhibit=True))
+            elif prune is not None and _prunes(heads, symbols, item):
+                newitems.append(item)
+            elif token is not None and is_marked(item, token):
+                newitems.append(item)
+            elif method is engine:
+                if item._closed_items:
+                    stack.append(_bottomup_frame(item))
+                else:
+                    stack.append((item, iter(item.items), list()))
+                break
+            else:
+                newitems.append(item.bottomup(rule))
+        else:
+            stack.pop()
+            # Keep node when no item changed.
+            kept = all(map(is_, newitems, node.items))
+            if not kept:
+                node = node._rebuild(tuple(newitems))
+            result = rule(node, _pathinhibit=True, _buinhibit=True)
+            if token is not None and (
+                idempotent or kept and result is node
+            ) and not exhausted() and exhaustions() == count:
+                mark(result, token)
+            if not stack:
+                return result
+            stack[-1][2].append(result)
+
+
+def _bottomup_frame(expr):
+    closed = expr._closed_items
+    if closed:
+        return (expr, iter(expr.items[closed:]), list(expr.items[:closed]))
+    return (expr, iter(expr.items), list())
+
+
+def _dag_bottomup(expr, rule):
+    """bottomup that applies rule once to each distinct sub-expression.
+
+    Every sub-expression gets an int code, equal codes mean the same
+    structure: atoms are compared with their interning key and containers
+    with their type, name and item codes. An object seen before is found
+    by id and not walked again. Only containers that use the Container
+    constructor and atoms are compared by structure, any other expression
+    is only shared with itself.
+    """
+    engine = Container.bottomup
+    leaf = Atom.bottomup
+    rebuild = Container._rebuild
+    prune = _pruning(rule)
+    if prune is not None:
+        heads, symbols = prune
+        if _prunes(heads, symbols, expr):
+            return expr
+    codes = dict()
+    # code -> (output of rule, the first input with that code)
+    results = dict()
+    # id of input -> (code, output)
+    done = dict()
+
+    def code_of(key):
+        return codes.setdefault(key, len(codes))
+
+    def frame(node):
+        closed = node.items[:node._closed_items]
+        return (
+            node,
+            iter(node.items[len(closed):]),
+            list(closed),
+            [code_of(('id', id(item))) for item in closed],
+        )
+
+    stack = [frame(expr)]
+    while True:
+        node, items, newitems, itemcodes = stack[-1]
+        for item in items:
+            seen = done.get(id(item))
+            if seen is not None:
+                itemcodes.append(seen[0])
+                newitems.append(seen[1])
+                continue
+            method = type(item).bottomup
+            if prune is not None and (
+                item not in symbols if method is leaf
+                else _prunes(heads, symbols, item)
+            ):
+                itemcodes.append(code_of(('id', id(item))))
+                newitems.append(item)
+                continue
+            if method is engine:
+                stack.append(frame(item))
+                break
+            code = None
+            if method is leaf:
+                key = item._intern_key()
+                try:
+                    code = None if key is None else code_of(key)
+                except TypeError:
+                    # unhashable key
+                    pass
+            if code is None:
+                code = code_of(('id', id(item)))
+            found = results.get(code)
+            if found is None:
+                if method is leaf:
+                    result = rule(item, _pathinhibit=True, _buinhibit=True)
+                else:
+                    result = item.bottomup(rule)
+                results[code] = (result, item)
+            else:
+                result = item if found[0] is found[1] else found[0]
+            done[id(item)] = (code, result)
+            itemcodes.append(code)
+            newitems.append(result)
+        else:
+            stack.pop()
+            if type(node)._rebuild is rebuild:
+                code = code_of((type(node), node.name, tuple(itemcodes)))
+            else:
+                code = code_of(('id', id(node)))
+            found = results.get(code)
+            if found is None:
+                new = node
+                if not all(map(is_, newitems, node.items)):
+                    new = node._rebuild(tuple(newitems))
+                result = rule(new, _pathinhibit=True, _buinhibit=True)
+                results[code] = (result, node)
+            else:
+                result = node if found[0] is found[1] else found[0]
+            if not stack:
+                return result
+            done[id(node)] = (code, result)
+            parent = stack[-1]
+            parent[2].append(result)
+            parent[3].append(code)
+
+
+def _rewriter(rule):
+    """Return a function that gives the output of rule for an expression
+    alone, or no_rewrite when the rule keeps it.
+
+    Without an active budget it is the rewrite method of rule, which
+    gives the output of tbody(tpredicate(expr)) without the checks of
+    __call__. With a budget, the work is charged through __call__.
+    """
+    if current_budget() is None:
+        return rule.rewrite
+
+    def rewrite(expr):
+        return rule(expr, _pathinhibit=True, _buinhibit=True)
+    return rewrite
+
+
+class _FusedPass:
+    """One rule of fused_bottomup, with the outputs of the rule for the
+    sub-expressions it has been applied to, keyed by id. The entries hold
+    the input, so an id cannot be reused while the pass exists.
+
+    An instance stands in for the rule when an expression with its own
+    bottomup method is met: a bottomup request on an item is answered
+    from the outputs already known.
+    """
+    __slots__ = ('rule', 'rewrite', 'memo', 'prune')
+
+    def __init__(self, rule, rewrite):
+        self.rule = rule
+        self.rewrite = rewrite
+        self.memo = dict()
+        self.prune = _pruning(rule)
+
+    def __call__(self, expr, _pathinhibit=False, _buinhibit=False):
+        if _buinhibit:
+            return self.rule(expr, _pathinhibit=True, _buinhibit=True)
+        return self.walk(expr)
+
+    def walk(self, expr):
+        """Return the output of bottomup of the rule on expr."""
+        memo = self.memo
+        seen = memo.get(id(expr))
+        if seen is not None:
+            return seen[1]
+        prune = self.prune
+        if prune is not None:
+            heads, symbols = prune
+            if _prunes(heads, symbols, expr):
+                return expr
+        engine = Container.bottomup
+        if type(expr).bottomup is not engine:
+            out = expr.bottomup(self)
+            memo[id(expr)] = (expr, out)
+            return out
+        leaf = Atom.bottomup
+        rewrite = self.rewrite
+        # As in _bottomup, with the outputs already known looked up.
+        stack = [_bottomup_frame(expr)]
+        while True:
+            node, items, newitems = stack[-1]
+            for item in items:
+                seen = memo.get(id(item))
+                if seen is not None:
+                    newitems.append(seen[1])
+                    continue
+                method = type(item).bottomup
+                if method is leaf:
+                    out = item
+                    if prune is None or item in symbols:
+                        out = rewrite(item)
+                        if out is no_rewrite:
+                            out = item
+                elif prune is not None and _prunes(heads, symbols, item):
+                    out = item
+                elif method is engine:
+                    stack.append(_bottomup_frame(item))
+                    break
+                else:
+                    out = item.bottomup(self)
+                memo[id(item)] = (item, out)
+                newitems.append(out)
+            else:
+                stack.pop()
+                new = node
+                if not all(map(is_, newitems, node.items)):
+                    new = node._rebuild(tuple(newitems))
+                out = rewrite(new)
+                if out is no_rewrite:
+                    out = new
+                memo[id(node)] = (node, out)
+                if not stack:
+                    return out
+                stack[-1][2].append(out)
+
+
+def fused_bottomup(expr, rules):
+    """Apply each rule of rules bottom up, one after the other, in one
+    traversal of expr.
+
+    The output is the output of expr.bottomup(rule) for every rule in
+    turn, when the rules are pure. A sub-expression hands up its chain,
+    the list of itself and its outputs of the rules so far, or itself
+    alone when every rule keeps it, the common case. A container goes
+    through the rules in order, each applied to the container rebuilt
+    from the outputs of the rule for the items, as long as the rules keep
+    the container they are given. Without an active budget the rules are
+    applied through their rewrite methods, see _rewriter.
+
+    A rule that gives a new expression ends the chain there, the
+    container it is in often takes the expression apart, as a rule that
+    merges nested products does, and the outputs of the next rules would
+    be wasted. The next outputs are found when they are needed, by
+    walking the new expression with the next rule, so that a pipeline of
+    such rules costs about as much as separate passes. There is no
+    recursion.
+    """
+    stages = [(rule, _rewriter(rule), _pruning(rule)) for rule in rules]
+    count = len(stages)
+    engine = Container.bottomup
+    leaf = Atom.bottomup
+    # Only when every rule declares heads and symbols can a subtree be
+    # left alone by all of them.
+    prunes = [prune for rule, rewrite, prune in stages]
+    if None in prunes:
+        prunes = None
+    passes = [None] * count
+    if type(expr).bottomup is not engine:
+        return _fused_output([expr], count, stages, passes)
+    # A frame is (container, iterator over its open items, chains).
+    stack = [_fused_frame(expr)]
+    while True:
+        node, items, chains = stack[-1]
+        for item in items:
+            method = type(item).bottomup
+            if method is leaf:
+                chain = item
+                out = item
+                for ndx, (rule, rewrite, prune) in enumerate(stages, 1):
+                    if prune is None or out in prune[1]:
+                        new = rewrite(out)
+                        if new is not no_rewrite and new is not out:
+                            if chain is item:
+                                chain = [item] * ndx
+                            out = new
+                    if chain is not item:
+                        chain.append(out)
+                        if type(out).bottomup is not leaf:
+                            break
+                chains.append(chain)
+            elif method is engine and (prunes is None or not all([
+                _prunes(*prune, item) for prune in prunes
+            ])):
+                stack.append(_fused_frame(item))
+                break
+            else:
+                chains.append(item)
+        else:
+            stack.pop()
+            chain = _fused_node(node, chains, stages, passes)
+            if not stack:
+                return _fused_output(chain, count, stages, passes)
+            stack[-1][2].append(chain)
+
+
+def _fused_frame(expr):
+    closed = expr._closed_items
+    # Items closed to bottomup are kept by every rule.
+    return (
+        expr,
+        iter(expr.items[closed:]) if closed else iter(expr.items),
+        list(expr.items[:closed]),
+    )
+
+
+def _fused_output(chain, ndx, stages, passes):
+    """Return the output of rule ndx - 1 of chain, rule 0 is the input.
+    The missing outputs are found and added to chain. A chain that is not
+    a list is an expression kept by every rule.
+    """
+    if type(chain) is not list:
+        return chain
+    while len(chain) <= ndx:
+        expr = chain[-1]
+        rule, rewrite, prune = stages[len(chain) - 1]
+        fused = passes[len(chain) - 1]
+        if fused is not None:
+            expr = fused.walk(expr)
+        elif prune is None or not _prunes(*prune, expr):
+            expr = expr.bottomup(rule)
+        chain.append(expr)
+    return chain[ndx]
+
+
+def _fused_node(node, chains, stages, passes):
+    """Return the chain of node, chains are the chains of its items."""
+    chain = [node]
+    expr = node
+    # Only chains that are lists change the items.
+    varies = list in map(type, chains)
+    for ndx, (rule, rewrite, prune) in enumerate(stages, 1):
+        if prune is not None and _prunes(*prune, expr):
+            chain.append(expr)
+            continue
+        new = expr
+        if varies:
+            newitems = tuple([
+                item_chain if type(item_chain) is not list
+                else item_chain[ndx] if len(item_chain) > ndx
+                else _fused_output(item_chain, ndx, stages, passes)
+                for item_chain in chains
+            ])
+            if not all(map(is_, newitems, expr.items)):
+                new = expr._rebuild(newitems)
+        expr = rewrite(new)
+        if expr is no_rewrite:
+            expr = new
+        chain.append(expr)
+        if expr is not new:
+            # The next rule can look up the outputs it has for the items
+            # when it walks expr.
+            if ndx < len(stages):
+                fused = passes[ndx]
+                if fused is None:
+                    fused = passes[ndx] = _FusedPass(*stages[ndx][:2])
+                for item_chain in chains:
+                    if type(item_chain) is not list:
+                        fused.memo[id(item_chain)] = (item_chain, item_chain)
+                    elif len(item_chain) > ndx + 1:
+                        fused.memo[id(item_chain[ndx])] = (
+                            item_chain[ndx], item_chain[ndx + 1]
+                        )
+            break
+    if not varies and expr is node:
+        return node
+    return chain
+
+
+def _closed_to_path(expr, nxt):
+    closed = expr._closed_items
+    return nxt in range(closed) or nxt in range(-len(expr), closed - len(expr))
+
+
+def _apply2path(expr, path, rule, _buinhibit):
+    engine = Container.apply2path
+    # chain holds the (container, index) pairs along the path.
+    chain = list()
+    node = expr
+    depth = 0
+    while True:
+        if type(node).apply2path is not engine:
+            try:
+                result = node.apply2path(
+                    path[depth:], rule, _buinhibit=_buinhibit)
+            except (IndexError, TypeError) as error:
+                if not chain:
+                    raise
+                result = _path_error(error)
+            break
+        if depth == len(path):
+            try:
+                result = rule(node, _pathinhibit=True, _buinhibit=_buinhibit)
+            except (IndexError, TypeError) as error:
+                if not chain:
+                    raise
+                result = _path_error(error)
+            break
+        nxt = path[depth]
+        if _closed_to_path(node, nxt):
+            ta_logger.log("Assign 0 item closed to path")
+            result = null
+            break
+        try:
+            item = node[nxt]
+        except (IndexError, TypeError) as error:
+            result = _path_error(error)
+            break
+        chain.append((node, nxt))
+        node = item
+        depth += 1
+
+    for node, nxt in reversed(chain):
+        if result is node[nxt]:
+            result = node
+            continue
+        try:
+            if type(node.items) is ItemVector:
+                newitems = node.items.set(nxt, result)
+            else:
+                newitems = node[:nxt] + (result,) + node[nxt:][1:]
+            result = node._rebuild(newitems)
+        except (IndexError, TypeError) as error:
+            result = _path_error(error)
+    return result
+
+
+def path_trie(paths):
+    """Return the trie of paths as nested dicts. The keys of a dict are
+    the next indices, the key None marks the end of a path.
+    """
+    trie = dict()
+    for path in paths:
+        node = trie
+        for ndx in path:
+            node = node.setdefault(ndx, dict())
+        node[None] = True
+    return trie
+
+
+def _merge_tries(trie0, trie1):
+    """Return the union of two tries, trie0 is changed."""
+    stack = [(trie0, trie1)]
+    while stack:
+        into, other = stack.pop()
+        for key, sub in other.items():
+            if key is None or key not in into:
+                into[key] = sub
+            else:
+                stack.append((into[key], sub))
+    return trie0
+
+
+def _trie_paths(trie):
+    """Return the paths of trie, except the empty path."""
+    out = list()
+    stack = [((), trie)]
+    while stack:
+        path, node = stack.pop()
+        for key, sub in node.items():
+            if key is None:
+                if path:
+                    out.append(path)
+            else:
+                stack.append((path + (key,), sub))
+    return out
+
+
+def _trie_items(node, trie):
+    """Return the sorted (index, sub trie) pairs of trie for the items of
+    the Container node, or None after logging a path that cannot be
+    followed. Negative indices are made positive.
+    """
+    length = len(node.items)
+    closed = node._closed_items
+    children = dict()
+    for key, sub in trie.items():
+        if key is None:
+            continue
+        if _closed_to_path(node, key):
+            ta_logger.log("Assign 0 item closed to path")
+            return None
+        try:
+            ndx = index(key)
+            if ndx < 0:
+                ndx += length
+            if not 0 <= ndx < length:
+                raise IndexError
+        except (IndexError, TypeError) as error:
+            _path_error(error)
+            return None
+        if ndx in children:
+            # sub is not copied, do not change the trie of the caller
+            children[ndx] = _merge_tries(
+                _merge_tries(dict(), children[ndx]), sub
+            )
+        else:
+            children[ndx] = sub
+    return sorted(children.items())
+
+
+def _apply2paths(expr, trie, rule, _buinhibit):
+    engine = Container.apply2path
+    # A frame is [container, iterator over (index, sub trie) pairs,
+    # new items, its trie, index of the item being done].
+    stack = list()
+    node, sub = expr, trie
+    while True:
+        result = None
+        if type(node).apply2path is engine and len(sub) > (None in sub):
+            children = _trie_items(node, sub)
+            if children is None:
+                result = null
+            else:
+                stack.append(
+                    [node, iter(children), list(node.items), sub, None]
+                )
+        else:
+            # Not walked here, apply the paths below node one at a time.
+            try:
+                result = node
+                for path in _trie_paths(sub):
+                    result = result.apply2path(
+                        path, rule, _buinhibit=_buinhibit)
+                if None in sub:
+                    result = rule(
+                        result, _pathinhibit=True, _buinhibit=_buinhibit)
+            except (IndexError, TypeError) as error:
+                if not stack:
+                    raise
+                result = _path_error(error)
+        while stack:
+            frame = stack[-1]
+            if result is not None:
+                frame[2][frame[4]] = result
+            nxt = next(frame[1], None)
+            if nxt is not None:
+                frame[4], sub = nxt
+                node = frame[2][frame[4]]
+                break
+            stack.pop()
+            node, _, newitems, sub, _ = frame
+            try:
+                # Keep node when no item changed, rebuild it once otherwise.
+                if not all(map(is_, newitems, node.items)):
+                    node = node._rebuild(tuple(newitems))
+                if None in sub:
+                    node = rule(
+                        node, _pathinhibit=True, _buinhibit=_buinhibit)
+            except (IndexError, TypeError) as error:
+                if not stack:
+                    raise
+                node = _path_error(error)
+            result = node
+        else:
+            return result
+
+
+def _path_error(error):
+    if isinstance(error, IndexError):
+        ta_logger.log("index error in path")
+    else:
+        ta_logger.log("type error in path")
+    return null
+
+
+def _match(pattern, vardict, subdict, pred_rule, expr):
+    engine = Container.match
+    if (
+        type(expr) is not type(pattern)
+        or expr.name != pattern.name
+        or len(expr) != len(pattern)
+    ):
+        return False
+    # The items are matched in the same order as a recursive, depth first,
+    # left to right match. The order matters, subdict is updated as
+    # variables are matched.
+    stack = [zip(pattern.items, expr.items)]
+    while stack:
+        for pattern, expr in stack[-1]:
+            if type(pattern).match is not engine:
+                if not pattern.match(vardict, subdict, pred_rule, expr):
+                    return False
+            elif (
+                type(expr) is not type(pattern)
+                or expr.name != pattern.name
+                or len(expr) != len(pattern)
+            ):
+                return False
+            else:
+                stack.append(zip(pattern.items, expr.items))
+                break
+        else:
+            stack.pop()
+    return True
+
+
+def _eq(expr, other):
+    engine = Container.__eq__
+    if (
+        type(expr) is not type(other)
+        or expr.name != other.name
+        or len(expr) != len(other)
+        or hash(expr) != hash(other)
+    ):
+        return False
+    stack = [zip(expr.items, other.items)]
+    while stack:
+        for expr, other in stack[-1]:
+            if expr is other:
+                continue
+            if type(expr).__eq__ is not engine:
+                if expr != other:
+                    return False
+            elif (
+                type(expr) is not type(other)
+                or expr.name != other.name
+                or len(expr) != len(other)
+                or hash(expr) != hash(other)
+            ):
+                return False
+            else:
+                stack.append(zip(expr.items, other.items))
+                break
+        else:
+            stack.pop()
+    return True
+
+
+def _hash(expr):
+    engine = Container.__hash__
+    # A frame is (container, iterator over its items, item hashes).
+    stack = [(expr, iter(expr.items), list())]
+    while True:
+        node, items, hashes = stack[-1]
+        for item in items:
+            if type(item).__hash__ is not engine:
+                hashes.append(hash(item))
+                continue
+            try:
+                hashes.append(item._hash)
+            except AttributeError:
+                stack.append((item, iter(item.items), list()))
+                break
+        else:
+            stack.pop()
+            value = node._combine_hash(node.name, tuple(hashes))
+            object.__setattr__(node, '_hash', value)
+            if not stack:
+                return value
+            stack[-1][2].append(value)
+
+
+def _fill_digests(expr):
+    """Compute and memoize the digest of expr and of its sub-expressions
+    without a digest, deepest first. _compute_digest is called once the
+    digests of the sub-expressions are memoized, so it does not recurse.
+    """
+    # A frame is (expr, iterator over its sub-expressions).
+    stack = [(expr, iter(expr._subexprs() or ()))]
+    while True:
+        node, subexprs = stack[-1]
+        for sub in subexprs:
+            try:
+                sub._digest
+                continue
+            except AttributeError:
+                pass
+            subs = sub._subexprs()
+            if subs:
+                stack.append((sub, iter(subs)))
+                break
+            # An atom, or an expression that computes its own digest.
+            sub.digest()
+        else:
+            stack.pop()
+            value = node._compute_digest()
+            object.__setattr__(node, '_digest', value)
+            if not stack:
+                return value
+
+
+def _repr(expr):
+    engine = Container.__repr__
+    out = [expr.name, "("]
+    # The stack holds an iterator over the items of each open container.
+    stack = [iter(expr.items)]
+    separate = False
+    while stack:
+        for item in stack[-1]:
+            if separate:
+                out.append(", ")
+            if type(item).__repr__ is engine:
+                out.append(item.name)
+                out.append("(")
+                stack.append(iter(item.items))
+                separate = False
+                break
+            out.append(repr(item))
+            separate = True
+        else:
+            stack.pop()
+            out.append(")")
+            separate = True
+    return "".join(out)
+
+
 class TrueThingCAM(TrueThing):
     """Used with CommAssocMatch instances.
     """
+    __slots__ = ('subdict', 'target_list')
+
     def __init__(self, subdict, target_list):
         self.subdict = subdict
         self.target_list = target_list
 
 
 class CommAssocMatch:
+    # True when pattern and target are both in normal form.
+    ordered = False
+
     def __init__(self, pattern, vardict, subdict, pred_rule, target):
         self.pattern = pattern
         self.vardict = vardict
         self.subdict = subdict
         self.pred_rule = pred_rule
         self.target_list = list(target.items)
+        self.ordered = _known_canonical(pattern) and _known_canonical(target)
 
     def find_matches(self):
         """Find matches for all items in pattern.items where pattern is a
@@ -527,11 +2131,34 @@ class CommAssocMatch:
         """ process matches of plain expressions that contain no variables
         in plain_expr_list
         """
+        if self.ordered:
+            return self.merge_plain_expr_list(plain_expr_list)
         for expr in plain_expr_list:
             if not self.plain_expr_match(expr):
                 return False
         return True
 
+    def merge_plain_expr_list(self, plain_expr_list):
+        """ process matches of plain expressions when plain_expr_list and
+        self.target_list are both in canonical order, in a single pass.
+        """
+        remaining = list()
+        targets = iter(self.target_list)
+        for expr in plain_expr_list:
+            for target in targets:
+                order = compare(target, expr)
+                if order == 0:
+                    break
+                elif order > 0:
+                    # every remaining target comes after expr
+                    return False
+                remaining.append(target)
+            else:
+                return False
+        remaining.extend(targets)
+        self.target_list = remaining
+        return True
+
     def plain_expr_match(self, expr):
         """ finds match for expression that conatins no variables
         """
@@ -587,8 +2214,11 @@ class CommAssocMatch:
         local_subdict = subdict.copy()
         pattern = pattern_list[0]
         pattern_list = pattern_list[1:]
+        budget = current_budget()
 
         for ndx, target in enumerate(target_list):
+            if budget is not None and budget.match():
+                return False
             match = pattern.match(
                 self.vardict, local_subdict, self.pred_rule, target
             )
@@ -627,11 +2257,10 @@ class CommAssocMatch:
             new_target_list = list()
             instance_items = list()
             for item in self.target_list:
-                sub_rule = Substitute(
-                    subdict={symbol: item, any__: item},
-                    bottomup=True
-                )
-                if self.pred_rule(sub_rule(self.vardict[symbol])) == true:
+                pred_subdict = {symbol: item, any__: item}
+                if self.pred_rule(
+                    substitute(self.vardict[symbol], pred_subdict)
+                ) == true:
                     instance_items.append(item)
                 else:
                     new_target_list.append(item)
@@ -661,15 +2290,20 @@ class CommAssocMatch:
     def does_contain_variable(self, expr):
         """ determines if expr contains a variable
         """
-        if expr in self.vardict:
-            return True
-        elif isinstance(expr, Container):
-            for item in expr:
-                if self.does_contain_variable(item):
-                    return True
-            return False
-        else:
-            return False
+        stats = exprstats(expr)
+        if stats is not None and all(
+            isinstance(var, Symbol) for var in self.vardict
+        ):
+            # The statistics of pattern items are memoized.
+            return not stats.symbols.isdisjoint(self.vardict)
+        stack = [expr]
+        while stack:
+            expr = stack.pop()
+            if expr in self.vardict:
+                return True
+            elif isinstance(expr, Container):
+                stack.extend(expr.items)
+        return False
 
 
 def isNumber(expr):
@@ -0,0 +1,359 @@
+""" flatexpr module
+
+A FlatExpr instance holds a truealgebra expression as a postorder encoding
+in typed arrays instead of a tree of Python objects. It is a compact form
+to keep, hash and compare very large expressions, and to walk them with
+children and parents, with no Python object at every node.
+
+Rules need the expressions themselves, the predicate of a rule is called
+with an ExprBase instance, so bottomup still makes an object at every
+node. It uses the bottomup method of ExprBase while the encoded
+expression is alive. Otherwise it decodes the expression as it applies
+the rule, and a pure rule is applied once to each distinct atom instead
+of once to each occurrence.
+
+Encoding
+--------
+Every node of the expression has one entry in each of the four arrays
+below. The entries are in postorder, the items of a container come before
+the container, and the last entry is the whole expression.
+
+kinds : array
+    ATOM or NODE.
+refs : array
+    For an ATOM entry, an index into the atoms table. For a NODE entry,
+    an index into the heads table.
+arities : array
+    The number of items of a NODE entry, 0 for an ATOM entry.
+sizes : array
+    The number of entries in the subtree of an entry, including itself.
+    The subtree of entry ndx starts at ``ndx - sizes[ndx] + 1``.
+
+heads : list
+    Distinct ``(class, name)`` pairs of the containers.
+atoms : list
+    Distinct leaf expressions. Symbol and Number instances are shared
+    when they are equal and of the same type, so Number(1) and
+    Number(1.0) get different entries.
+
+Only instances of Container and its subclasses that keep the Container
+constructor are encoded as NODE entries. Any other expression, including
+Atom instances, null and containers with their own constructor, is an
+ATOM entry and is kept whole in the atoms table.
+
+A FlatExpr instance keeps a weak reference to the expression it encodes.
+While the expression is alive, to_expr and bottomup_expr use it.
+"""
+
+from array import array
+import weakref
+
+from truealgebra.core.expressions import Atom, Container
+
+from IPython import embed
+
+
+ATOM = 0
+NODE = 1
+
+# bottomup mode of a head whose class has its own bottomup method,
+# the method is called on the whole subtree.
+_BU_SELF = -1
+
+
+def isnode(expr):
+    """Is expr encoded as a NODE entry?"""
+    return (
+        isinstance(expr, Container)
+        and type(expr).__init__ is Container.__init__
+    )
+
+
+def _atom_key(expr):
+    """Key used to share equal atoms in the atoms table.
+
+    The key used for interning is used when it exists, otherwise the
+    atom is only shared with itself.
+    """
+    try:
+        key = expr._intern_key()
+    except (AttributeError, TypeError):
+        key = None
+    if key is None:
+        return ('id', id(expr))
+    return key
+
+
+def _bottomup_mode(cls):
+    """Return the number of leading items that bottomup leaves alone,
+    or _BU_SELF.
+    """
+    if cls.bottomup is Container.bottomup:
+        return cls._closed_items
+    else:
+        return _BU_SELF
+
+
+class FlatExpr:
+    """Postorder array encoding of a truealgebra expression.
+
+    Use FlatExpr.from_expr to create an instance and the to_expr method
+    to get the expression back. Instances are not to be modified.
+    """
+    __slots__ = (
+        'kinds', 'refs', 'arities', 'sizes', 'heads', 'atoms', '_hash',
+        '_source'
+    )
+
+    def __init__(self, kinds, refs, arities, sizes, heads, atoms):
+        self.kinds = kinds
+        self.refs = refs
+        self.arities = arities
+        self.sizes = sizes
+        self.heads = heads
+        self.atoms = atoms
+        # weak reference to the encoded expression
+        self._source = None
+
+    @classmethod
+    def from_expr(cls, expr):
+        """Encode expr. Deep expressions do not recurse."""
+        kinds = array('b')
+        refs = array('q')
+        arities = array('q')
+        sizes = array('q')
+        heads = list()
+        head_ndx = dict()
+        atoms = list()
+        atom_ndx = dict()
+
+        # The stack holds (expr, visited) pairs. A node is written once
+        # all of its items have been written.
+        stack = [(expr, False)]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                head = (type(node), node.name)
+                ref = head_ndx.get(head)
+                if ref is None:
+                    ref = head_ndx[head] = len(heads)
+                    heads.append(head)
+                size = 1
+                end = len(sizes)
+                for _ in range(len(node.items)):
+                    child_size = sizes[end - 1]
+                    size += child_size
+                    end -= child_size
+                kinds.append(NODE)
+                refs.append(ref)
+                arities.append(len(node.items))
+                sizes.append(size)
+            elif isnode(node):
+                stack.append((node, True))
+                for item in reversed(node.items):
+                    stack.append((item, False))
+            else:
+                key = _atom_key(node)
+                ref = atom_ndx.get(key)
+                if ref is None:
+                    ref = atom_ndx[key] = len(atoms)
+                    atoms.append(node)
+                kinds.append(ATOM)
+                refs.append(ref)
+                arities.append(0)
+                sizes.append(1)
+        out = cls(kinds, refs, arities, sizes, heads, atoms)
+        try:
+            out._source = weakref.ref(expr)
+        except TypeError:
+            # not weakly referenceable, to_expr rebuilds it
+            pass
+        return out
+
+    def source(self):
+        """Return the encoded expression when it is still alive, else
+        None.
+        """
+        if self._source is None:
+            return None
+        return self._source()
+
+    def to_expr(self):
+        """Rebuild the expression as a tree of ExprBase instances."""
+        source = self.source()
+        if source is not None:
+            return source
+        heads = self.heads
+        atoms = self.atoms
+        arities = self.arities
+        stack = list()
+        for ndx, kind in enumerate(self.kinds):
+            ref = self.refs[ndx]
+            if kind == ATOM:
+                stack.append(atoms[ref])
+            else:
+                arity = arities[ndx]
+                start = len(stack) - arity
+                items = tuple(stack[start:])
+                del stack[start:]
+                cls, name = heads[ref]
+                stack.append(cls(name, items))
+        return stack[0]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __repr__(self):
+        return 'FlatExpr(' + repr(self.to_expr()) + ')'
+
+    def children(self, ndx):
+        """Return the list of entry indices of the items of entry ndx,
+        in item order.
+        """
+        out = list()
+        child = ndx - 1
+        for _ in range(self.arities[ndx]):
+            out.append(child)
+            child -= self.sizes[child]
+        out.reverse()
+        return out
+
+    def parents(self):
+        """Return an array, the parent entry index of every entry.
+        The root entry has parent -1.
+        """
+        parent = array('q', [-1]) * len(self.kinds)
+        for ndx, kind in enumerate(self.kinds):
+            if kind == NODE:
+                for child in self.children(ndx):
+                    parent[child] = ndx
+        return parent
+
+    def __hash__(self):
+        # Equal to the hash of the encoded expression.
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        heads = self.heads
+        atoms = self.atoms
+        arities = self.arities
+        refs = self.refs
+        stack = list()
+        for ndx, kind in enumerate(self.kinds):
+            if kind == ATOM:
+                stack.append(hash(atoms[refs[ndx]]))
+            else:
+                start = len(stack) - arities[ndx]
+                hashes = tuple(stack[start:])
+                del stack[start:]
+                cls, name = heads[refs[ndx]]
+                stack.append(cls._combine_hash(name, hashes))
+        self._hash = stack[0]
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, FlatExpr):
+            return NotImplemented
+        if (
+            self.kinds == other.kinds
+            and self.refs == other.refs
+            and self.arities == other.arities
+            and self.heads == other.heads
+            and len(self.atoms) == len(other.atoms)
+            and all(
+                type(atom) is type(otom) and atom == otom
+                for atom, otom in zip(self.atoms, other.atoms)
+            )
+        ):
+            return True
+        if hash(self) != hash(other):
+            return False
+        # Same hash but different encodings. For instance the items of
+        # CommAssoc instances can be in a different order.
+        return self.to_expr() == other.to_expr()
+
+    def _inhibited(self, modes):
+        """Return a bytearray, nonzero for the entries that bottomup
+        must not apply the rule to.
+        """
+        kinds = self.kinds
+        refs = self.refs
+        inhibit = bytearray(len(kinds))
+        for ndx in range(len(kinds) - 1, -1, -1):
+            if kinds[ndx] != NODE:
+                continue
+            mode = modes[refs[ndx]]
+            if inhibit[ndx] or mode == _BU_SELF:
+                first, last = ndx - self.sizes[ndx] + 1, ndx
+                inhibit[first:last] = b'\x01' * (last - first)
+            elif mode:
+                for child in self.children(ndx)[:mode]:
+                    first = child - self.sizes[child] + 1
+                    inhibit[first:child + 1] = b'\x01' * (child + 1 - first)
+        return inhibit
+
+    def bottomup(self, rule):
+        """Apply rule bottom up, like the bottomup method of ExprBase.
+
+        The output is a FlatExpr instance.
+        """
+        source = self.source()
+        out = self.bottomup_expr(rule)
+        if source is not None and out is source:
+            return self
+        return FlatExpr.from_expr(out)
+
+    def bottomup_expr(self, rule):
+        """Apply rule bottom up, the output is an ExprBase expression.
+
+        While the encoded expression is alive, this is its bottomup
+        method. Otherwise the expression is decoded as the rule is
+        applied, and a pure rule is applied once to each distinct atom.
+        """
+        source = self.source()
+        if source is not None:
+            return source.bottomup(rule)
+        heads = self.heads
+        atoms = self.atoms
+        arities = self.arities
+        refs = self.refs
+        modes = [_bottomup_mode(cls) for cls, name in heads]
+        inhibit = self._inhibited(modes)
+        leaf = Atom.bottomup
+        # outputs of the rule for the atoms, by atoms index
+        done = dict() if rule.pure else None
+        stack = list()
+        for ndx, kind in enumerate(self.kinds):
+            ref = refs[ndx]
+            if kind == ATOM:
+                expr = atoms[ref]
+                if inhibit[ndx]:
+                    pass
+                elif type(expr).bottomup is not leaf:
+                    expr = expr.bottomup(rule)
+                elif done is None:
+                    expr = rule(expr, _pathinhibit=True, _buinhibit=True)
+                else:
+                    try:
+                        expr = done[ref]
+                    except KeyError:
+                        expr = done[ref] = rule(
+                            expr, _pathinhibit=True, _buinhibit=True
+                        )
+                stack.append(expr)
+                continue
+            start = len(stack) - arities[ndx]
+            items = tuple(stack[start:])
+            del stack[start:]
+            cls, name = heads[ref]
+            expr = cls(name, items)
+            if not inhibit[ndx]:
+                if modes[ref] == _BU_SELF:
+                    expr = expr.bottomup(rule)
+                else:
+                    expr = rule(expr, _pathinhibit=True, _buinhibit=True)
+            stack.append(expr)
+        return stack[0]
@@ -1,4 +1,6 @@
-from truealgebra.core.rules import Rule, Rules, donothing_rule
+from truealgebra.core.rules import (
+    Rule, Rules, donothing_rule, keys_declaration
+)
 from truealgebra.core.naturalrules import NaturalRule
 from truealgebra.core.expressions import (
     Assign, Container, isContainer, MultiExprs
@@ -100,12 +102,20 @@ class FrontEnd:
 
 class HistoryRule(Rule):
     bottomup = True
+    # The output changes as the history grows.
+    pure = False
 
     def __init__(self, *args, **kwargs):
         self.frontend = kwargs['frontend']
 
         super().__init__(*args, **kwargs)
 
+    @property
+    def heads(self):
+        return frozenset([self.frontend.history_name])
+
+    symbols = frozenset()
+
     def predicate(self, expr):
         if (
             isinstance(expr, Container)
@@ -138,6 +148,8 @@ class HistoryRule(Rule):
 
 class AssignRule(Rule):
     bottomup = True
+    # The output changes as assignments are made.
+    pure = False
 
     def __init__(self, *args, **kwargs):
         self.frontend = kwargs['frontend']
@@ -148,6 +160,14 @@ class AssignRule(Rule):
     def predicate(self, expr):
         return expr in self.frontend.assigndict
 
+    @property
+    def heads(self):
+        return keys_declaration(self.frontend.assigndict)[0]
+
+    @property
+    def symbols(self):
+        return keys_declaration(self.frontend.assigndict)[1]
+
     def body(self, expr):
         return self.frontend.assigndict[expr]
 
@@ -0,0 +1,134 @@
+""" fusion module
+
+A pipeline of bottomup rules, such as::
+
+    simplify = Rules(converttoSPP, JustOneBU(...))
+
+walks the expression once for every rule. A Fused instance compiles the
+list of rules into stages and runs consecutive bottomup rules as one
+stage, in a single traversal::
+
+    fused_simplify = Fused(simplify)
+
+The output is the output of the rules applied one after the other. In the
+traversal, a node goes through the rules of a stage before its container
+does, as long as the rules keep the node. A rule whose output is a new
+expression leaves the next rules to a walk of that expression, made when
+the container needs it, which only goes down to the sub-expressions that
+they have not met yet. Without an active budget, the rules are applied
+through their rewrite methods, which skips the checks of __call__ for
+every node. See fused_bottomup in the expressions module.
+
+A rule is fused with its neighbours when it is a bottomup rule, has no
+path or paths, is pure and uses the RuleBase __call__ method. Any other
+rule, for instance a rule that is not pure or a MemoRule instance, is a
+barrier and is applied alone, as Rules would. Rules instances in the list
+are flattened into it.
+"""
+
+from truealgebra.core.expressions import fused_bottomup
+from truealgebra.core.rules import (
+    RuleBase, Rules, TrueThing, _union_declarations
+)
+
+from IPython import embed
+
+
+def _fusable(rule):
+    return (
+        rule.bottomup
+        and not rule.path
+        and not rule.paths
+        and rule.pure
+        and type(rule).__call__ is RuleBase.__call__
+    )
+
+
+def _flatten(rules):
+    """Return the list of rules with Rules instances replaced by their
+    rule lists.
+    """
+    out = list()
+    # A frame is an iterator over a rule list.
+    stack = [iter(rules)]
+    while stack:
+        for rule in stack[-1]:
+            if (
+                isinstance(rule, Rules)
+                and type(rule).tbody is Rules.tbody
+                and type(rule).__call__ is RuleBase.__call__
+                and not (rule.bottomup or rule.path or rule.paths)
+            ):
+                stack.append(iter(rule.rule_list))
+                break
+            out.append(rule)
+        else:
+            stack.pop()
+    return out
+
+
+def compile_stages(rules):
+    """Return the stages of rules, a list of tuples of rules. A tuple of
+    more than one rule is applied in one traversal.
+    """
+    stages = list()
+    group = list()
+    for rule in _flatten(rules):
+        if _fusable(rule):
+            group.append(rule)
+            continue
+        if group:
+            stages.append(tuple(group))
+            group = list()
+        stages.append((rule,))
+    if group:
+        stages.append(tuple(group))
+    return stages
+
+
+class Fused(RuleBase):
+    """Apply a list of rules one after the other, with consecutive
+    bottomup rules applied in one traversal.
+
+    The stages are compiled when the instance is created, the rules must
+    not be changed afterwards, or recompile must be called.
+
+    Attributes
+    ----------
+    rule_list : list
+        A list of rules which are the *args arguments of self.__init__.
+    stages : list
+        The compiled stages, tuples of rules.
+    """
+    def __init__(self, *rules, **kwargs):
+        self.rule_list = list(rules)
+        self.stages = compile_stages(self.rule_list)
+        super().__init__(*rules, **kwargs)
+
+    def recompile(self):
+        """Compile the stages again from rule_list."""
+        self.stages = compile_stages(self.rule_list)
+
+    @property
+    def pure(self):
+        return all(rule.pure for rule in self.rule_list)
+
+    @property
+    def heads(self):
+        return _union_declarations([rule.heads for rule in self.rule_list])
+
+    @property
+    def symbols(self):
+        return _union_declarations([rule.symbols for rule in self.rule_list])
+
+    def tpredicate(self, expr):
+        return TrueThing(expr)
+
+    def tbody(self, truething):
+        expr = truething.expr
+        for stage in self.stages:
+            if len(stage) == 1:
+                expr = stage[0](expr)
+            else:
+                expr = fused_bottomup(expr, stage)
+        return expr
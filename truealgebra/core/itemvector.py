@@ -0,0 +1,208 @@
+""" itemvector module
+
+An ItemVector instance is an immutable sequence, a persistent vector that
+can hold the items of a Container with a very large number of items.
+
+A tuple is copied whole to replace or append one item, so building or
+editing a container with n items one item at a time costs O(n**2). An
+ItemVector is a tree of tuples of up to 32 entries, the leaves hold the
+items and the last items are in a separate tail tuple. Getting, replacing
+and appending an item cost O(log n), the new vector shares all of the
+tree with the old vector except the tuples along one path.
+
+ItemVector has the read interface of a tuple: len, indexing with negative
+indices, slicing, iteration, in, index, count, comparison with == to a
+tuple and concatenation with +. A slice is a tuple.
+
+Container instances keep an ItemVector given as items. When
+settings.vector_min is an int, the items of a Container are stored in an
+ItemVector when there are at least vector_min of them, see the
+expressions module.
+"""
+
+from collections.abc import Sequence
+from operator import eq, index
+
+from IPython import embed
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+
+def _leaves(node, level):
+    """Yield the leaves below node in order, level is the shift of
+    node.
+    """
+    if level == _BITS:
+        yield from node
+    else:
+        for child in node:
+            yield from _leaves(child, level - _BITS)
+
+
+def _new_path(level, node):
+    """Return node under a chain of new single entry nodes, down from
+    level.
+    """
+    while level > 0:
+        node = (node,)
+        level -= _BITS
+    return node
+
+
+def _assoc(level, node, ndx, item):
+    """Return a copy of node with entry ndx below it replaced by item."""
+    sub = (ndx >> level) & _MASK
+    if level == 0:
+        return node[:sub] + (item,) + node[sub + 1:]
+    child = _assoc(level - _BITS, node[sub], ndx, item)
+    return node[:sub] + (child,) + node[sub + 1:]
+
+
+class ItemVector(Sequence):
+    """Persistent vector of items.
+
+    Parameters
+    ----------
+    items : iterable, optional
+        The items of the vector.
+    """
+    __slots__ = ('_count', '_shift', '_root', '_tail')
+
+    def __init__(self, items=()):
+        items = tuple(items)
+        count = len(items)
+        # The tail holds the last 1 to 32 items.
+        tailoff = ((count - 1) >> _BITS) << _BITS if count else 0
+        nodes = [items[ndx:ndx + _WIDTH] for ndx in range(0, tailoff, _WIDTH)]
+        shift = _BITS
+        while len(nodes) > _WIDTH:
+            nodes = [
+                tuple(nodes[ndx:ndx + _WIDTH])
+                for ndx in range(0, len(nodes), _WIDTH)
+            ]
+            shift += _BITS
+        self._count = count
+        self._shift = shift
+        self._root = tuple(nodes)
+        self._tail = items[tailoff:]
+
+    @classmethod
+    def _make(cls, count, shift, root, tail):
+        out = object.__new__(cls)
+        out._count = count
+        out._shift = shift
+        out._root = root
+        out._tail = tail
+        return out
+
+    def _tailoff(self):
+        return self._count - len(self._tail)
+
+    def _position(self, ndx):
+        ndx = index(ndx)
+        if ndx < 0:
+            ndx += self._count
+        if not 0 <= ndx < self._count:
+            raise IndexError('ItemVector index out of range')
+        return ndx
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple([self._get(ndx) for ndx in range(*key.indices(
+                self._count
+            ))])
+        return self._get(self._position(key))
+
+    def _get(self, ndx):
+        tailoff = self._tailoff()
+        if ndx >= tailoff:
+            return self._tail[ndx - tailoff]
+        node = self._root
+        level = self._shift
+        while level > 0:
+            node = node[(ndx >> level) & _MASK]
+            level -= _BITS
+        return node[ndx & _MASK]
+
+    def __iter__(self):
+        if self._root:
+            for leaf in _leaves(self._root, self._shift):
+                yield from leaf
+        yield from self._tail
+
+    def set(self, ndx, item):
+        """Return a new ItemVector with item at index ndx."""
+        ndx = self._position(ndx)
+        tailoff = self._tailoff()
+        if ndx >= tailoff:
+            sub = ndx - tailoff
+            tail = self._tail[:sub] + (item,) + self._tail[sub + 1:]
+            return self._make(self._count, self._shift, self._root, tail)
+        root = _assoc(self._shift, self._root, ndx, item)
+        return self._make(self._count, self._shift, root, self._tail)
+
+    def append(self, item):
+        """Return a new ItemVector with item added at the end."""
+        count = self._count
+        if len(self._tail) < _WIDTH:
+            return self._make(
+                count + 1, self._shift, self._root, self._tail + (item,)
+            )
+        # The tail is full, it goes into the tree.
+        shift = self._shift
+        if (count >> _BITS) > (1 << shift):
+            root = (self._root, _new_path(shift, self._tail))
+            shift += _BITS
+        else:
+            root = self._push_tail(shift, self._root, self._tail)
+        return self._make(count + 1, shift, root, (item,))
+
+    def _push_tail(self, level, parent, tail):
+        sub = ((self._count - 1) >> level) & _MASK
+        if level == _BITS:
+            child = tail
+        elif sub < len(parent):
+            child = self._push_tail(level - _BITS, parent[sub], tail)
+        else:
+            child = _new_path(level - _BITS, tail)
+        return parent[:sub] + (child,) + parent[sub + 1:]
+
+    def extend(self, items):
+        """Return a new ItemVector with items added at the end."""
+        out = self
+        for item in items:
+            out = out.append(item)
+        return out
+
+    def __add__(self, other):
+        if isinstance(other, (tuple, ItemVector)):
+            return self.extend(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, tuple):
+            return ItemVector(other + tuple(self))
+        return NotImplemented
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, (tuple, ItemVector)):
+            return NotImplemented
+        return len(self) == len(other) and all(map(eq, self, other))
+
+    def __hash__(self):
+        # Equal to the hash of the equal tuple.
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return 'ItemVector(' + repr(tuple(self)) + ')'
+
+    def __reduce__(self):
+        return (self.__class__, (tuple(self),))
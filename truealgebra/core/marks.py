@@ -0,0 +1,77 @@
+""" marks module
+
+Normal-form marks. A rule with marks=True has a token, an int, and marks
+with it the expressions that are known to be a fixpoint of the rule, its
+output for them is the expression itself. A marked expression is
+returned as is when the rule is applied to it again::
+
+    evalnumbu = RulesBU(..., marks=True, idempotent=True)
+    out = evalnumbu(expr)
+    evalnumbu(edited)     # the sub-expressions of out are skipped
+
+For a bottomup rule the mark of a sub-expression means that a bottomup
+pass does not change it, and the pass skips marked sub-expressions
+entirely. An expression is marked when the rule leaves it unchanged and,
+for an idempotent rule, whose output is a fixpoint of the rule, every
+output as well.
+
+Marks are kept in the _marks attribute of Container instances, atoms are
+not marked. An expression keeps the _MAXMARKS most recent marks.
+
+The marks depend on the rules and on the settings. The renew_token method
+of a rule forgets the marks of the rule, after its rules are changed,
+and forget_marks forgets all of them. Assigning an attribute of settings
+or commonsettings, as their reset methods and the setup functions do,
+calls forget_marks. A setting changed in place, such as a dict entry,
+does not, call forget_marks after it.
+"""
+
+from itertools import count
+
+from IPython import embed
+
+
+# The largest number of marks kept by an expression.
+_MAXMARKS = 8
+
+_tokens = count(1)
+
+
+class _Generation:
+    """Holds the generation of the marks, the tokens of an older
+    generation are renewed.
+    """
+    __slots__ = ('current',)
+
+    def __init__(self):
+        self.current = 0
+
+
+generation = _Generation()
+
+
+def new_token():
+    """Return a token not used before."""
+    return next(_tokens)
+
+
+def forget_marks():
+    """Forget the marks of all rules."""
+    generation.current += 1
+
+
+def is_marked(expr, token):
+    """Is expr marked with token?"""
+    return token in getattr(expr, '_marks', ())
+
+
+def mark(expr, token):
+    """Mark expr with token, when expr can hold marks."""
+    marks = getattr(expr, '_marks', ())
+    if token in marks:
+        return
+    try:
+        object.__setattr__(expr, '_marks', (marks + (token,))[-_MAXMARKS:])
+    except AttributeError:
+        # no _marks attribute, atoms are not marked
+        pass
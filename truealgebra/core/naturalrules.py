@@ -1,10 +1,11 @@
 from truealgebra.core.rules import (
-    RuleBase, donothing_rule, TrueThing, Substitute
+    RuleBase, donothing_rule, TrueThing, Signature, substitute, no_rewrite
 )
 from truealgebra.core.settings import settings
 from truealgebra.core.parse import meta_parser
 from truealgebra.core.expressions import (
-    null, Symbol, true, isContainer, isSymbol, ExprBase
+    null, Symbol, Number, Container, CommAssoc, true, isContainer, isSymbol,
+    ExprBase
 )
 from truealgebra.core.err import ta_logger
 import types
@@ -15,6 +16,8 @@ from IPython import embed
 class TrueThingNR(TrueThing):
     """Used with NaturalRule instances.
     """
+    __slots__ = ('subdict',)
+
     def __init__(self, expr, subdict=types.MappingProxyType(dict())):
         self.expr = expr
         self.subdict = subdict
@@ -22,6 +25,8 @@ class TrueThingNR(TrueThing):
 
 class TrueThingHNR(TrueThing):
     """Thruething used with HalfNaturalRule instances. """
+    __slots__ = ('var',)
+
     def __init__(self, expr, var=None):
         self.expr = expr
         self.var = var
@@ -35,6 +40,10 @@ class NaturalRuleBase(RuleBase):
     # the default vardict below is a immutable dictioary
     vardict = types.MappingProxyType(dict())
     varstring = ''
+    # The output depends on the pattern, the vardict and the rules of the
+    # instance. A subclass with a body or rules that are not pure sets
+    # pure to False.
+    pure = True
 
     # vardict is not changed after it is created
     def __init__(self, *args, **kwargs):
@@ -63,6 +72,32 @@ class NaturalRuleBase(RuleBase):
 
         super().__init__(*args, **kwargs)
 
+    def _match(self, expr):
+        """Match the pattern to expr, return the substitution dictionary
+        or None when there is no match.
+        """
+        subdict = dict()
+        if self.pattern.match(
+            self.vardict,
+            subdict,
+            self.predicate_rule,
+            expr
+        ):
+            return subdict
+        return None
+
+    @property
+    def signature(self):
+        """The Signature of the expressions that the pattern can match,
+        None when any expression can.
+        """
+        if (
+            type(self).tpredicate is NaturalRule.tpredicate
+            or type(self).tpredicate is HalfNaturalRule.tpredicate
+        ):
+            return pattern_signature(self.pattern, self.vardict)
+        return None
+
     @classmethod
     def process_forall(cls, vardict, expr):
         if (
@@ -130,51 +165,48 @@ class NaturalRule(NaturalRuleBase):
         super().__init__(*args, **kwargs)
 
     def tpredicate(self, expr):
-        subdict = dict()
-        predresult = self.pattern.match(
-            self.vardict,
-            subdict,
-            self.predicate_rule,
-            expr
-        )
-        if predresult:
+        subdict = self._match(expr)
+        if subdict is not None:
             return TrueThingNR(expr, subdict=subdict)
         else:
             return False
 
     def tbody(self, truething):
-        subdict = truething.subdict
-        out = Substitute(subdict=subdict, bottomup=True)(self.outcome)
+        out = substitute(self.outcome, truething.subdict)
         return self.outcome_rule(out)
 
+    def rewrite(self, expr):
+        subdict = self._match(expr)
+        if subdict is None:
+            return no_rewrite
+        return self.outcome_rule(substitute(self.outcome, subdict))
+
 
 class HalfNaturalRule(NaturalRuleBase):
     class VarNames:
         def __init__(self, subdict):
-            for key in subdict:
-                name = key.name
-                exec('self.' + name + ' = subdict[key]')
+            for key, value in subdict.items():
+                setattr(self, key.name, value)
 
     def tpredicate(self, expr):
-        subdict = dict()
-        predresult = self.pattern.match(
-            self.vardict,
-            subdict,
-            self.predicate_rule,
-            expr
-        )
-        if predresult:
-            var = self.VarNames(subdict)
-            return TrueThingHNR(expr, var=var)
+        subdict = self._match(expr)
+        if subdict is not None:
+            return TrueThingHNR(expr, var=self.VarNames(subdict))
         else:
             return False
 
     def tbody(self, truething):
+        return self._body(truething.expr, truething.var)
+
+    def rewrite(self, expr):
+        subdict = self._match(expr)
+        if subdict is None:
+            return no_rewrite
+        return self._body(expr, self.VarNames(subdict))
+
+    def _body(self, expr, var):
         try:
-            return self.body(
-                truething.expr,
-                truething.var,
-            )
+            return self.body(expr, var)
         except TypeError:
             ta_logger.log(
                 'HalfNaturalRule body method requires three arguments'
@@ -187,3 +219,28 @@ class HalfNaturalRule(NaturalRuleBase):
 # Is this something worth pursuing? Providing names for rules?
 #   def __str__(self):
 #       return "HalfNaturalRule " + self.name + " instance"
+
+
+def pattern_signature(pattern, vardict):
+    """Return the Signature of the expressions that pattern can match,
+    None when any expression can, as when pattern is a variable.
+
+    A Container pattern matches expressions of its class and name, and
+    of its number of items unless it is a CommAssoc instance. Symbol and
+    Number patterns match expressions of their class.
+    """
+    match = getattr(type(pattern), 'match', None)
+    if match is Container.match:
+        return Signature(
+            types=(type(pattern),),
+            names=(pattern.name,),
+            arities=(len(pattern),),
+        )
+    elif match is CommAssoc.match:
+        return Signature(types=(type(pattern),), names=(pattern.name,))
+    elif match is Symbol.match and pattern not in vardict:
+        return Signature(types=(type(pattern),), names=(pattern.name,))
+    elif match is Number.match:
+        return Signature(types=(type(pattern),))
+    return None
+
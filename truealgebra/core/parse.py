@@ -1,6 +1,7 @@
 from truealgebra.core.err import ta_logger
 from truealgebra.core.expressions import (
-    Container, Number, Symbol, Restricted, Assign, null, end, MultiExprs
+    Container, Number, Symbol, Restricted, Assign, null, end, MultiExprs,
+    intern_table, current_intern_table, release_binding_powers
 )
 from truealgebra.core.settings import settings
 from truealgebra.core.constants import (
@@ -79,6 +80,7 @@ class Parse:
         self.string = ''
         self.string_iterator = None
         self.postrule = postrule  # UNTESTED CHANGE
+        self.tokens = list()
 
     def next_char(self):
         self.char = next(self.string_iterator, 'end')
@@ -112,7 +114,17 @@ class Parse:
         self.string = strn
         self.string_iterator = iter(self.string)
         self.next_char()
-        out = self.init_parse()
+        # tokens are mutated while parsing, they cannot be interned
+        # until the parse is complete.
+        try:
+            with intern_table.suspended():
+                out = self.init_parse()
+        finally:
+            release_binding_powers(self.tokens)
+            self.tokens.clear()
+        table = current_intern_table()
+        if table is not None:
+            out = table.intern(out)
         if self.postrule is not None:
             out = self.postrule(out)  # UNTESTED CHANGE
         self.buf = ""
@@ -459,7 +471,9 @@ class Parse:
     def make_container_instance(self):
         name = settings.complement.get(self.buf, self.buf)
         cls_ = settings.container_subclass.get(name, Container)
-        return cls_(name)
+        token = cls_(name)
+        self.tokens.append(token)
+        return token
 
     def function_form_factory(self):
         token = self.make_container_instance()
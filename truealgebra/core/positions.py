@@ -0,0 +1,222 @@
+""" positions module
+
+A PositionIndex instance records where the sub-expressions of an
+expression are. It is built once, with one walk of the expression, and
+maps
+
+    * the names of Container instances,
+    * Symbol instances,
+    * the hashes of all sub-expressions
+
+to the paths where they occur. Queries then look the paths up instead of
+walking the expression with a custom rule each time::
+
+    index = PositionIndex(expr)
+    index.head_paths('D')
+    index.symbol_paths(Symbol('x'))
+    index.find(settings.parse('sin(x)'))
+    index.match_paths(natural_rule)
+
+Paths are tuples of item indices, the same paths apply2path and
+apply2paths take, so the output of a query can be given to apply2paths
+to apply a rule at all of the positions in one traversal.
+
+Only positions that a path can reach are indexed. The items of atoms, of
+Restricted instances and of other expressions that have their own
+apply2path method are not indexed, neither are items closed to paths,
+such as item 0 of an Assign instance. Paths are in preorder, a container
+comes before its items.
+
+The index is of one expression. A rule applied with the paths gives a new
+expression, which needs a new index.
+"""
+
+from array import array
+
+from truealgebra.core.expressions import (
+    Container, Symbol, exprstats, _closed_to_path
+)
+
+from IPython import embed
+
+
+class PositionIndex:
+    """Index of the positions of the sub-expressions of an expression.
+
+    Parameters
+    ----------
+    expr : ExprBase
+        The expression to index.
+
+    Attributes
+    ----------
+    expr : ExprBase
+        The indexed expression.
+    exprs : list
+        The sub-expressions at every position, in preorder. A position is
+        an index into this list, position 0 is expr.
+    heads : dict
+        Maps a Container name to the positions of the Containers with that
+        name.
+    symbols : dict
+        Maps a Symbol instance to its positions.
+    hashes : dict
+        Maps a hash value to the positions of the sub-expressions with
+        that hash.
+    """
+    __slots__ = (
+        'expr', 'exprs', 'heads', 'symbols', 'hashes',
+        '_parents', '_indices', '_ends',
+    )
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.exprs = list()
+        self.heads = dict()
+        self.symbols = dict()
+        self.hashes = dict()
+        # The parent position and item index of every position, -1 for
+        # the top. _ends holds the position after the subtree of every
+        # position, so a query can skip a subtree.
+        self._parents = array('q')
+        self._indices = array('q')
+        self._ends = array('q')
+        self._build()
+
+    def _build(self):
+        engine = Container.apply2path
+        exprs = self.exprs
+        parents = self._parents
+        indices = self._indices
+        # Hash the top first, Container hashes are memoized, so the
+        # hashes of the sub-expressions below are already computed.
+        hash(self.expr)
+        stack = [(self.expr, -1, -1)]
+        while stack:
+            node, parent, ndx = stack.pop()
+            pos = len(exprs)
+            exprs.append(node)
+            parents.append(parent)
+            indices.append(ndx)
+            self.hashes.setdefault(hash(node), list()).append(pos)
+            if isinstance(node, Symbol):
+                self.symbols.setdefault(node, list()).append(pos)
+            elif isinstance(node, Container):
+                self.heads.setdefault(node.name, list()).append(pos)
+                if type(node).apply2path is engine:
+                    for item_ndx in range(len(node.items) - 1, -1, -1):
+                        if not _closed_to_path(node, item_ndx):
+                            stack.append((node.items[item_ndx], pos, item_ndx))
+
+        # The items of a position come after it, the subtree ends are
+        # found in one pass in reverse.
+        ends = self._ends
+        ends.extend(range(1, len(exprs) + 1))
+        for pos in range(len(exprs) - 1, 0, -1):
+            parent = parents[pos]
+            if ends[pos] > ends[parent]:
+                ends[parent] = ends[pos]
+
+    def __len__(self):
+        return len(self.exprs)
+
+    def path(self, pos):
+        """Return the path of position pos."""
+        path = list()
+        while pos > 0:
+            path.append(self._indices[pos])
+            pos = self._parents[pos]
+        path.reverse()
+        return tuple(path)
+
+    def paths(self, positions):
+        """Return the list of the paths of positions."""
+        return [self.path(pos) for pos in positions]
+
+    def head_paths(self, name):
+        """Return the paths of the Containers named name."""
+        return self.paths(self.heads.get(name, ()))
+
+    def symbol_paths(self, symbol):
+        """Return the paths of the Symbol instance symbol."""
+        return self.paths(self.symbols.get(symbol, ()))
+
+    def find(self, sub):
+        """Return the paths of the sub-expressions equal to sub."""
+        return self.paths([
+            pos for pos in self.hashes.get(hash(sub), ())
+            if self.exprs[pos] == sub
+        ])
+
+    def match_paths(self, rule):
+        """Return the paths of the sub-expressions where the predicate
+        of rule is satisfied.
+
+        rule is usually a NaturalRule or HalfNaturalRule instance. The
+        pattern of rule is used to skip the sub-expressions that cannot
+        match it: a match must hold every Container name of the pattern
+        and every Symbol of the pattern that is not a variable. A pattern
+        that is a Container only looks at the positions of its name.
+        Rules without a pattern are tried at every position.
+        """
+        pattern = getattr(rule, 'pattern', None)
+        needs = _needs(pattern, getattr(rule, 'vardict', ()))
+        out = list()
+        if isinstance(pattern, Container):
+            for pos in self.heads.get(pattern.name, ()):
+                sub = self.exprs[pos]
+                if _may_hold(sub, needs) and rule.tpredicate(sub):
+                    out.append(pos)
+            return self.paths(out)
+
+        ends = self._ends
+        pos = 0
+        while pos < len(self.exprs):
+            sub = self.exprs[pos]
+            if not _may_hold(sub, needs):
+                pos = ends[pos]
+                continue
+            if rule.tpredicate(sub):
+                out.append(pos)
+            pos += 1
+        return self.paths(out)
+
+    def apply2paths(self, paths, rule):
+        """Apply rule at paths of the indexed expression, in one
+        traversal. The output is the new expression.
+        """
+        return self.expr.apply2paths(paths, rule)
+
+    def apply2matches(self, rule):
+        """Apply rule at every path of match_paths(rule), in one
+        traversal. The output is the new expression.
+        """
+        return self.expr.apply2paths(self.match_paths(rule), rule)
+
+
+def _needs(pattern, vardict):
+    """Return the (heads, symbols) that an expression must hold to match
+    pattern, or None when they are not known.
+    """
+    if pattern is None:
+        return None
+    stats = exprstats(pattern)
+    if stats is None:
+        return None
+    symbols = frozenset([
+        symbol for symbol in stats.symbols if symbol not in vardict
+    ])
+    return stats.heads, symbols
+
+
+def _may_hold(expr, needs):
+    """Can expr, or one of its sub-expressions, match a pattern with
+    needs?
+    """
+    if needs is None:
+        return True
+    stats = exprstats(expr)
+    return (
+        stats is None
+        or needs[0] <= stats.heads and needs[1] <= stats.symbols
+    )
@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict, deque, namedtuple
+
+from truealgebra.core.budget import current_budget, exhausted, exhaustions
+from truealgebra.core.err import ta_logger
+from truealgebra.core.marks import generation, is_marked, mark, new_token
 
 from IPython import embed
 
@@ -15,6 +20,8 @@ class TrueThing:
         The input expression is the sole argument the rule's __call__ method.
 
     """
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
     selected_truething = False
@@ -30,21 +37,121 @@ class TrueThingJO(TrueThing):
         The class attribute is always False.
         Used as a reference by JustOne instances.
     """
+    __slots__ = ('selected_truething', 'ndx')
+
     def __init__(self, expr, selected_truething=False, ndx=None):
         self.expr = expr
         self.selected_truething = selected_truething
         self.ndx = ndx
 
 
+class _NoRewrite:
+    """The class of no_rewrite."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'no_rewrite'
+
+
+# The output of a rewrite method when the rule does not apply. tbody can
+# return any object, None included, so None can not say it.
+no_rewrite = _NoRewrite()
+
+
 class RuleBase(ABC):
+    """Base class of the rules.
+
+    A rule is applied by __call__, which hands the input expression to
+    tpredicate and, when its output is true, that output to tbody.
+
+    The rewrite method does the same work in one step, without the
+    TrueThing handed from tpredicate to tbody. It returns the output of
+    tbody, or no_rewrite when tpredicate is false. __call__ and the
+    strategies use rewrite when no Budget is active, so a rewrite method
+    must give the output of tbody(tpredicate(expr)). To keep it so, when
+    a subclass overrides tpredicate or tbody but not rewrite, the
+    rewrite inherited from the class that defined it is replaced by the
+    one of RuleBase, which calls tpredicate and tbody, see
+    __init_subclass__.
+    """
     bottomup = False
     path = ()
+    # Several paths, the rule is applied at all of them in one traversal.
+    paths = ()
+    # When dag is True, during a bottomup pass the rule is applied only
+    # once to each distinct sub-expression and the output is shared by
+    # all of its occurrences. It requires a pure rule.
+    dag = False
+    # A pure rule has the same output for equal inputs and equal
+    # settings, during a pass and from one call to the next, and no side
+    # effects. Only rules that set pure to True are shared by dag,
+    # memoized by MemoRule, marked and fused. A pure rule can read the
+    # settings, such as commonsettings.evalnum: MemoRule outputs and marks
+    # are tied to the generation of the settings, see the marks module,
+    # and dag and fusion only share outputs within one pass.
+    pure = False
+    # A rule that only changes Containers whose name is in heads and
+    # Symbols in symbols can declare both. Then bottomup skips the
+    # sub-expressions that hold none of them. None means undeclared.
+    heads = None
+    symbols = None
+    # A Signature of the expressions that tpredicate can be true for,
+    # used by JustOne to only try the rules that can apply to a node.
+    # None means any expression.
+    signature = None
+    # A rule with marks set True marks the expressions that are a
+    # fixpoint of the rule and returns them as is later, see the marks
+    # module. It requires a pure rule. An idempotent rule, whose output
+    # is always a fixpoint of the rule, marks its outputs as well.
+    marks = False
+    idempotent = False
+    _token = None
+    _generation = None
+    # True when the class has its own rewrite method, see __init_subclass__.
+    _rewrites = False
+
+    def __init_subclass__(cls, **kwargs):
+        """A rewrite method is kept only when the class that defines it
+        also defines the tpredicate and tbody methods of cls. A subclass
+        that overrides one of them uses them instead, through the rewrite
+        method of RuleBase.
+        """
+        super().__init_subclass__(**kwargs)
+        for owner in cls.__mro__:
+            if 'rewrite' in owner.__dict__:
+                break
+        if (
+            cls.tpredicate is not owner.tpredicate
+            or cls.tbody is not owner.tbody
+        ):
+            cls.rewrite = RuleBase.rewrite
+        cls._rewrites = cls.rewrite is not RuleBase.rewrite
 
     def __init__(self, *args, **kwargs):
         if "bottomup" in kwargs:
             self.bottomup = kwargs["bottomup"]
         if "path" in kwargs:
             self.path = tuple(kwargs["path"])
+        if "paths" in kwargs:
+            self.paths = tuple([tuple(path) for path in kwargs["paths"]])
+        if "dag" in kwargs:
+            self.dag = kwargs["dag"]
+        if "marks" in kwargs:
+            self.marks = kwargs["marks"]
+        if "idempotent" in kwargs:
+            self.idempotent = kwargs["idempotent"]
+
+    @property
+    def token(self):
+        """The token of the normal-form marks made by the rule."""
+        if self._generation != generation.current:
+            self._token = new_token()
+            self._generation = generation.current
+        return self._token
+
+    def renew_token(self):
+        """Forget the marks made by the rule."""
+        self._generation = None
 
     @abstractmethod
     def tpredicate(self, expr):
@@ -54,6 +161,15 @@ class RuleBase(ABC):
     def tbody(self, truething):
         pass
 
+    def rewrite(self, expr):
+        """Return the output of the rule for expr alone, no_rewrite when
+        its tpredicate method is false.
+        """
+        truething = self.tpredicate(expr)
+        if truething:
+            return self.tbody(truething)
+        return no_rewrite
+
     def __call__(self, expr, _pathinhibit=False, _buinhibit=False):
         """Primary means of executing a rule.
 
@@ -66,14 +182,120 @@ class RuleBase(ABC):
         if self.path and not _pathinhibit:
             return expr.apply2path(self.path, self)
 
+        if self.paths and not _pathinhibit:
+            return expr.apply2paths(self.paths, self)
+
         if self.bottomup and not _buinhibit:
             return expr.bottomup(self)
 
-        tpredicate_out = self.tpredicate(expr)
-        if tpredicate_out:
-            return self.tbody(tpredicate_out)
+        # The marks of a bottomup rule are made by the bottomup pass.
+        token = None
+        if self.marks and not self.bottomup and self.pure:
+            token = self.token
+            if is_marked(expr, token):
+                return expr
+            count = exhaustions()
+
+        budget = current_budget()
+        if budget is None and self._rewrites:
+            out = self.rewrite(expr)
+            if out is no_rewrite:
+                out = expr
         else:
-            return expr
+            if budget is not None and budget.visit():
+                return expr
+            tpredicate_out = self.tpredicate(expr)
+            if tpredicate_out:
+                if budget is not None and budget.fire():
+                    return expr
+                out = self.tbody(tpredicate_out)
+            else:
+                out = expr
+        if token is not None and (out is expr or self.idempotent) and (
+            not exhausted() and exhaustions() == count
+        ):
+            mark(out, token)
+        return out
+
+
+def keys_declaration(keys):
+    """Return the (heads, symbols) declaration of a rule that only changes
+    expressions equal to one of keys.
+
+    The names of Container keys go into heads, the other keys into
+    symbols. A rule with keys other than Container and Symbol instances
+    is not pruned by bottomup.
+    """
+    heads = set()
+    symbols = set()
+    for key in keys:
+        if hasattr(key, 'items'):
+            heads.add(key.name)
+        else:
+            symbols.add(key)
+    return frozenset(heads), frozenset(symbols)
+
+
+def _union_declarations(declarations):
+    """Union of the heads or symbols of several rules, None when one of
+    them is undeclared.
+    """
+    out = set()
+    for declared in declarations:
+        if declared is None:
+            return None
+        out.update(declared)
+    return frozenset(out)
+
+
+class Signature:
+    """The expressions a rule can apply to.
+
+    An expression is admitted when its class is a subclass of one of
+    types, its name is in names and its number of items is in arities.
+    None admits any class, name or number of items. Expressions without
+    a name or items have the name and number None.
+
+    Attributes
+    ----------
+    types : tuple or None
+        Classes.
+    names : frozenset or None
+        Names of Containers or Symbols.
+    arities : frozenset or None
+        Numbers of items.
+    """
+    __slots__ = ('types', 'names', 'arities')
+
+    def __init__(self, types=None, names=None, arities=None):
+        self.types = None if types is None else tuple(types)
+        self.names = None if names is None else frozenset(names)
+        self.arities = None if arities is None else frozenset(arities)
+
+    def __repr__(self):
+        return 'Signature(types={}, names={}, arities={})'.format(
+            self.types, self.names, self.arities
+        )
+
+    def admits(self, key):
+        """Does the signature admit the expressions with key, the output
+        of dispatch_key?
+        """
+        cls, name, arity = key
+        return (
+            (self.types is None or issubclass(cls, self.types))
+            and (self.names is None or name in self.names)
+            and (self.arities is None or arity in self.arities)
+        )
+
+
+def dispatch_key(expr):
+    """Return the (class, name, number of items) of expr."""
+    try:
+        arity = len(expr.items)
+    except AttributeError:
+        arity = None
+    return (type(expr), getattr(expr, 'name', None), arity)
 
 
 class Rule(RuleBase):
@@ -86,6 +308,11 @@ class Rule(RuleBase):
     def tbody(self, truething):
         return self.body(truething.expr)
 
+    def rewrite(self, expr):
+        if self.predicate(expr):
+            return self.body(expr)
+        return no_rewrite
+
     def predicate(self, expr):
         return False
 
@@ -93,12 +320,16 @@ class Rule(RuleBase):
         return expr
 
 
+# donothing_rule changes nothing, it is pure.
 donothing_rule = Rule()
+donothing_rule.pure = True
 
 
 class Substitute(Rule):
     """substitute expressions from a dictionary.
     """
+    pure = True
+
     def __init__(self, *args, **kwargs):
         """ Define substitute dictionary as attribute
 
@@ -123,15 +354,55 @@ class Substitute(Rule):
         """
         return self.subdict[expr]
 
+    @property
+    def heads(self):
+        return keys_declaration(self.subdict)[0]
+
+    @property
+    def symbols(self):
+        return keys_declaration(self.subdict)[1]
+
 class SubstituteBU(Substitute):
     bottomup = True
 
 
+class _Substitution(SubstituteBU):
+    """SubstituteBU whose declaration is computed once, when it is
+    created, rather than at every bottomup pass.
+    """
+    # Plain attributes in place of the properties of Substitute.
+    heads = frozenset()
+    symbols = frozenset()
+
+    def __init__(self, subdict):
+        super().__init__(subdict=subdict)
+        self.heads, self.symbols = keys_declaration(subdict)
+
+
+def substitute(expr, subdict):
+    """Return expr with the keys of subdict replaced by their values, as
+    SubstituteBU(subdict=subdict)(expr) does.
+    """
+    return _Substitution(subdict)(expr)
+
+
 class Rules(RuleBase):
     def __init__(self, *rules, **kwargs):
         self.rule_list = list(rules)
         super().__init__(*rules, **kwargs)
 
+    @property
+    def pure(self):
+        return all(rule.pure for rule in self.rule_list)
+
+    @property
+    def heads(self):
+        return _union_declarations([rule.heads for rule in self.rule_list])
+
+    @property
+    def symbols(self):
+        return _union_declarations([rule.symbols for rule in self.rule_list])
+
     def tpredicate(self, expr):
         return TrueThing(expr)
 
@@ -141,23 +412,238 @@ class Rules(RuleBase):
             expr = rule(expr)
         return expr
 
+    def rewrite(self, expr):
+        for rule in self.rule_list:
+            expr = rule(expr)
+        return expr
+
 
 class RulesBU(Rules):
     bottomup = True
 
 
+FixpointReport = namedtuple('FixpointReport', ['passes', 'fired', 'status'])
+FixpointReport.__doc__ = """Report of the last call of a Fixpoint instance.
+
+passes : int
+    The number of passes made.
+fired : tuple
+    For every pass, the tuple of the rules that changed the expression.
+status : str
+    'normal' when the last pass did not change the expression, 'cycle'
+    when it gave an expression seen before, 'limit' when maxpasses
+    passes were made, 'budget' when the active Budget was exhausted.
+"""
+
+
+class Fixpoint(Rules):
+    """Apply a list of rules in passes until the expression stops
+    changing.
+
+    A pass applies every rule in order, like Rules. A rule has changed
+    the expression when its output is not its input, the traversals keep
+    unchanged expressions, so no comparison is needed. When a pass
+    rebuilt the expression, the digest of the output is compared with the
+    digests of the recent states: the digest of the previous state means
+    a normal form, an older one means the rules cycle, for instance a
+    rule that flips an equation and back. Both stop the passes.
+
+    Attributes
+    ----------
+    maxpasses : int
+        The largest number of passes.
+    memory : int
+        The number of recent states whose digests are remembered to
+        detect cycles.
+    report : FixpointReport
+        Report of the last call, None before the first call.
+    """
+    maxpasses = 100
+    memory = 8
+    report = None
+
+    def __init__(self, *rules, **kwargs):
+        if "maxpasses" in kwargs:
+            self.maxpasses = kwargs["maxpasses"]
+        if "memory" in kwargs:
+            self.memory = kwargs["memory"]
+        super().__init__(*rules, **kwargs)
+
+    def tbody(self, truething):
+        expr = truething.expr
+        recent = deque([_digest(expr)], maxlen=self.memory + 1)
+        fired = list()
+        status = 'limit'
+        count = exhaustions()
+        while len(fired) < self.maxpasses:
+            before = expr
+            changed = list()
+            for rule in self.rule_list:
+                out = rule(expr)
+                if out is not expr:
+                    changed.append(rule)
+                expr = out
+            fired.append(tuple(changed))
+            if exhausted() or exhaustions() != count:
+                status = 'budget'
+                break
+            if not changed:
+                status = 'normal'
+                break
+            digest = _digest(expr)
+            if digest is None:
+                # No digest, fall back on equality with the last state.
+                if expr == before:
+                    status = 'normal'
+                    break
+                continue
+            if digest == recent[-1]:
+                status = 'normal'
+                break
+            if digest in recent:
+                status = 'cycle'
+                break
+            recent.append(digest)
+        self.report = FixpointReport(len(fired), tuple(fired), status)
+        if status == 'normal' and self.marks and self.pure and (
+            not self.bottomup
+        ):
+            mark(expr, self.token)
+        if status == 'cycle':
+            ta_logger.log(
+                'Fixpoint rules cycle, stopped after {} passes'.format(
+                    len(fired)
+                )
+            )
+        elif status == 'limit':
+            ta_logger.log(
+                'Fixpoint stopped after maxpasses {} passes'.format(
+                    self.maxpasses
+                )
+            )
+        return expr
+
+
+class FixpointBU(Fixpoint):
+    bottomup = True
+
+
+def _digest(expr):
+    """Digest of expr, None when it has none or it cannot be computed.
+    Cycle detection then falls back on equality, it never makes a valid
+    input fail.
+    """
+    try:
+        return expr.digest()
+    except (AttributeError, TypeError, RecursionError):
+        return None
+
+
+class _Edits:
+    """Counts the assignments to the rule_list of JustOne instances."""
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+_justone_edits = _Edits()
+
+# Stands for the names and numbers of items that no signature mentions in
+# the keys of a dispatch table.
+_other = object()
+
+
 class JustOne(RuleBase):
     """Apply at most, just one rule in a list of rules.
 
+    The first call compiles the rules into a dispatch table. Nested
+    JustOne instances are flattened into one list and, for every
+    (class, name, number of items) of the expressions met, the table
+    keeps the rules whose signature admits them, in list order. tpredicate
+    only tries these rules, the first one that is true wins, as without
+    the table. The names and numbers of items that no signature mentions
+    share one key, so the table stays small.
+
+    Assigning rule_list discards the tables of all JustOne instances, the
+    ones that hold self included. The signatures must not be changed
+    after the first call, or recompile must be called.
+
     Attributes
     ----------
-    rulelist : list
-        a list of rules which are the *args arguments of self.__init__.
+    rule_list : tuple
+        The rules which are the *args arguments of self.__init__.
     """
     def __init__(self, *rules, **kwargs):
-        self.rule_list = list(rules)
+        self._rule_list = tuple(rules)
+        self._dispatch = None
         super().__init__(*rules, **kwargs)
 
+    @property
+    def rule_list(self):
+        return self._rule_list
+
+    @rule_list.setter
+    def rule_list(self, rules):
+        self._rule_list = tuple(rules)
+        _justone_edits.count += 1
+
+    def recompile(self):
+        """Discard the dispatch table, it is compiled again on the next
+        call.
+        """
+        self._dispatch = None
+
+    def _compile(self):
+        """Return the dispatch table, as (edit count, leaves, their
+        signatures, names, numbers of items, table). names and numbers of
+        items are the ones the signatures mention.
+        """
+        leaves = self._leaves()
+        signatures = [rule.signature for rule, route in leaves]
+        names = set()
+        arities = set()
+        for signature in signatures:
+            if signature is not None:
+                names.update(signature.names or ())
+                arities.update(signature.arities or ())
+        return (
+            _justone_edits.count, leaves, signatures, frozenset(names),
+            frozenset(arities), dict()
+        )
+
+    def _leaves(self):
+        """Return the list of (rule, route) pairs of the flattened rules.
+        route is the tuple of the indices that lead to rule through the
+        nested JustOne instances.
+        """
+        leaves = list()
+        # A frame is (rule list, route of the list, next index).
+        stack = [(self.rule_list, (), 0)]
+        while stack:
+            rule_list, route, ndx = stack.pop()
+            if ndx == len(rule_list):
+                continue
+            stack.append((rule_list, route, ndx + 1))
+            rule = rule_list[ndx]
+            if type(rule).tpredicate is JustOne.tpredicate:
+                stack.append((rule.rule_list, route + (ndx,), 0))
+            else:
+                leaves.append((rule, route + (ndx,)))
+        return leaves
+
+    @property
+    def pure(self):
+        return all(rule.pure for rule in self.rule_list)
+
+    @property
+    def heads(self):
+        return _union_declarations([rule.heads for rule in self.rule_list])
+
+    @property
+    def symbols(self):
+        return _union_declarations([rule.symbols for rule in self.rule_list])
+
     def tpredicate(self, expr):
         """ Select a rule that gets applied to the input expression.
 
@@ -182,15 +668,56 @@ class JustOne(RuleBase):
         False : bool
             Indicates there is no selected rule in self.rules.
         """
-        for ndx, rule in enumerate(self.rule_list):
+        for rule, route in self._candidates(expr):
             truething = rule.tpredicate(expr)
             if truething:
-                return TrueThingJO(expr, selected_truething=truething, ndx=ndx)
+                for ndx in reversed(route):
+                    truething = TrueThingJO(
+                        expr, selected_truething=truething, ndx=ndx
+                    )
+                return truething
         return False
 
     def tbody(self, truething):
         return self.eval_selected(self, truething)
 
+    def rewrite(self, expr):
+        # The output of the selected rule, without the nested TrueThingJO
+        # instances.
+        for rule, route in self._candidates(expr):
+            out = rule.rewrite(expr)
+            if out is not no_rewrite:
+                return out
+        return no_rewrite
+
+    def _candidates(self, expr):
+        """Return the (rule, route) pairs of the rules that can apply to
+        expr, from the dispatch table.
+        """
+        dispatch = self._dispatch
+        if dispatch is None or dispatch[0] != _justone_edits.count:
+            dispatch = self._dispatch = self._compile()
+        table = dispatch[5]
+        # A name or number of items that no signature mentions is admitted
+        # by the same signatures as any other one.
+        name = getattr(expr, 'name', None)
+        if name not in dispatch[3]:
+            name = _other
+        items = getattr(expr, 'items', None)
+        arity = None if items is None else len(items)
+        if arity not in dispatch[4]:
+            arity = _other
+        key = (type(expr), name, arity)
+        try:
+            return table[key]
+        except KeyError:
+            leaves, signatures = dispatch[1], dispatch[2]
+            candidates = table[key] = tuple([
+                leaf for leaf, signature in zip(leaves, signatures)
+                if signature is None or signature.admits(key)
+            ])
+            return candidates
+
     def eval_selected(self, rule, truething):
         """recursive method finds and evelauates selected rule.
 
@@ -239,6 +766,10 @@ class RecursiveParent(Rule):
 
         super().__init__(*rule_classes, **kwargs)
 
+    @property
+    def pure(self):
+        return all(child.pure for child in self.childrules)
+
     def apply_childrules(self, expr):
         for child in self.childrules:
             if child.predicate(expr):
@@ -259,3 +790,171 @@ class RecursiveParentBU(RecursiveParent):
     bottomup = True
 
 
+MemoInfo = namedtuple(
+    'MemoInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize']
+)
+
+
+class MemoCache:
+    """Least recently used table of rule outputs.
+
+    A MemoCache instance can be shared by several MemoRule instances, the
+    keys hold the rule, so the entries of different rules do not mix.
+
+    Attributes
+    ----------
+    maxsize : int or None
+        The largest number of entries. When the table is full, the least
+        recently used entry is evicted. None means no bound.
+    table : OrderedDict
+        The entries, the most recently used last.
+    hits : int
+        Number of outputs found in the table.
+    misses : int
+        Number of outputs not found in the table.
+    evictions : int
+        Number of entries evicted.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def lookup(self, key, default=None):
+        try:
+            value = self.table[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.table.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def store(self, key, value):
+        self.table[key] = value
+        self.table.move_to_end(key)
+        while self.maxsize is not None and len(self.table) > self.maxsize:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self):
+        """Return the statistics as a MemoInfo named tuple."""
+        return MemoInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self)
+        )
+
+
+# Marks an entry whose output is its input.
+_unchanged = object()
+
+
+class MemoRule(RuleBase):
+    """Apply rule and memoize its outputs.
+
+    The output of rule for an expression is kept in an LRU table, keyed on
+    rule, the generation of the settings and the digest of the
+    expression. When rule is applied again to an equal expression, with
+    numbers of the same types, the output is looked up instead of
+    computed::
+
+        fast_simplify = MemoRule(simplify, maxsize=10000)
+
+    The whole call of rule is memoized, including its bottomup or path
+    traversal. A MemoRule instance with bottomup=True memoizes the output
+    of rule at every sub-expression instead.
+
+    Only a pure rule is memoized, any other rule is applied every time.
+    An expression without a digest is not memoized either. The outputs
+    memoized before a setting was assigned, or before forget_marks was
+    called, are not used, see the marks module.
+
+    Parameters
+    ----------
+    rule : RuleBase
+        The memoized rule.
+    cache : MemoCache, optional
+        The table, to share it with other MemoRule instances.
+    maxsize : int or None, optional
+        maxsize of a new table, when cache is not given.
+    """
+    maxsize = 1024
+
+    def __init__(self, rule, *args, **kwargs):
+        self.rule = rule
+        if "maxsize" in kwargs:
+            self.maxsize = kwargs["maxsize"]
+        if "cache" in kwargs:
+            self.cache = kwargs["cache"]
+        else:
+            self.cache = MemoCache(self.maxsize)
+        if not rule.pure:
+            ta_logger.log(
+                'MemoRule rule is not pure, its outputs are not memoized'
+            )
+        super().__init__(*args, **kwargs)
+
+    @property
+    def pure(self):
+        return self.rule.pure
+
+    @property
+    def heads(self):
+        return self.rule.heads
+
+    @property
+    def symbols(self):
+        return self.rule.symbols
+
+    def info(self):
+        """Return the statistics of the table as a MemoInfo named tuple."""
+        return self.cache.info()
+
+    def tpredicate(self, expr):
+        return TrueThing(expr)
+
+    def tbody(self, truething):
+        return self.rule(truething.expr)
+
+    def __call__(self, expr, _pathinhibit=False, _buinhibit=False):
+        if self.path and not _pathinhibit:
+            return expr.apply2path(self.path, self)
+
+        if self.paths and not _pathinhibit:
+            return expr.apply2paths(self.paths, self)
+
+        if self.bottomup and not _buinhibit:
+            return expr.bottomup(self)
+
+        rule = self.rule
+        if not rule.pure:
+            return rule(expr, _pathinhibit=_pathinhibit, _buinhibit=_buinhibit)
+        try:
+            key = (
+                rule, generation.current, expr.digest(),
+                _pathinhibit, _buinhibit
+            )
+        except (TypeError, RecursionError):
+            return rule(expr, _pathinhibit=_pathinhibit, _buinhibit=_buinhibit)
+        out = self.cache.lookup(key)
+        if out is None:
+            count = exhaustions()
+            out = rule(expr, _pathinhibit=_pathinhibit, _buinhibit=_buinhibit)
+            # An output made while a budget was exhausted, the active one
+            # or one exited during the call, is partial.
+            if not exhausted() and exhaustions() == count:
+                self.cache.store(key, _unchanged if out is expr else out)
+        elif out is _unchanged:
+            out = expr
+        return out
@@ -276,3 +276,21 @@ def set_parse(func):
 
 def set_unparse(func):
     settings.unparse = func
+
+
+def set_vector_min(size):
+    """ Store the items of Containers with at least size items in an
+        ItemVector. None stores all items in tuples.
+
+        size : int or None
+            Smallest number of items stored in an ItemVector.
+    """
+    if size is not None and (
+        not isinstance(size, int) or isinstance(size, bool) or size < 1
+    ):
+        ta_logger.log(
+            'set_vector_min error\n    size {} must be None or a '
+            'positive int'.format(size)
+        )
+        return
+    settings.vector_min = size
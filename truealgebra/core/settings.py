@@ -55,6 +55,7 @@ bp : namedtuple
 """
 from collections import namedtuple, defaultdict
 from truealgebra.core.err import ta_logger
+from truealgebra.core.marks import forget_marks
 
 
 # a bp object stores two binding powers
@@ -142,6 +143,11 @@ class SettingsSingleton():
     parse : None
         Points to Parse instance that will be used throughout a
         truealgebra session.
+    vector_min : None or int
+        When an int, the items of a Container with at least vector_min
+        items are stored in an ItemVector instead of a tuple, so that
+        replacing or appending one item does not copy all of them.
+        None, the default, always stores a tuple.
 
     """
     _instance = None
@@ -152,6 +158,11 @@ class SettingsSingleton():
             cls._instance.reset()
         return cls._instance
 
+    def __setattr__(self, name, value):
+        # The normal-form marks depend on the settings.
+        forget_marks()
+        object.__setattr__(self, name, value)
+
     def reset(self):
         self.default_bp = bp(250, 250)
         self.custom_bp = dict()
@@ -167,6 +178,7 @@ class SettingsSingleton():
         self.unparse = nounparse
         self.float_class = float
         self.integer_class = int
+        self.vector_min = None
 
 
 settings = SettingsSingleton()
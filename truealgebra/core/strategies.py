@@ -0,0 +1,490 @@
+""" strategies module
+
+Rewrite strategies say where and how often a rule is applied. Besides the
+bottomup and path flags of a rule, a strategy can apply a rule from the
+top down, at the first place where it applies, or until a normal form is
+reached::
+
+    once_topdown(rule)      # at the leftmost outermost place only
+    innermost(rule)         # until the rule applies nowhere
+    sequence(rule0, try_(rule1))
+
+A strategy succeeds or fails. A rule that is not a strategy succeeds when
+its tpredicate method is true, and its output is the output of its tbody
+method. Its bottomup, path and paths attributes are ignored, the strategy
+decides where the rule is applied. A strategy is itself a rule, a
+strategy that fails leaves the expression as it is.
+
+Every application of a rule is charged to the active Budget. Once it is
+exhausted, rules fail and repeat, innermost and outermost stop applying
+them.
+
+Strategies stop as soon as the outcome is known: sequence stops at the
+first rule that fails, once_topdown and once_bottomup at the first place
+where the rule succeeds, topdown at the first failure. A sub-expression
+that is not changed is kept, not rebuilt. The items of atoms and of
+containers with their own bottomup method, such as Restricted instances,
+are not entered, neither are items closed to bottomup, such as item 0 of
+an Assign instance. There is no recursion, expressions can be deep.
+
+A rule that declares heads and symbols is not tried in the
+sub-expressions that hold none of them, by once_topdown, once_bottomup,
+innermost and outermost.
+"""
+
+from operator import is_
+
+from truealgebra.core.budget import current_budget, exhausted
+from truealgebra.core.expressions import Container, _pruning, _prunes
+from truealgebra.core.itemvector import ItemVector
+from truealgebra.core.rules import RuleBase, TrueThing, no_rewrite
+from truealgebra.core.err import ta_logger
+
+from IPython import embed
+
+
+def attempt(rule, expr):
+    """Apply rule to expr alone, return the output or None when rule
+    fails.
+
+    The application is charged to the active Budget, as a rule call is.
+    A rule fails once the budget is exhausted.
+    """
+    budget = current_budget()
+    if isinstance(rule, Strategy):
+        return rule.attempt(expr)
+    if budget is None:
+        out = rule.rewrite(expr)
+        return None if out is no_rewrite else out
+    if budget.visit():
+        return None
+    truething = rule.tpredicate(expr)
+    if not truething or budget.fire():
+        return None
+    return rule.tbody(truething)
+
+
+def _children(expr):
+    """Return the indices of the items of expr that strategies enter."""
+    if type(expr).bottomup is not Container.bottomup:
+        return range(0)
+    return range(expr._closed_items, len(expr.items))
+
+
+def _replace(node, ndx, item):
+    """Return node with item ndx replaced by item."""
+    if item is node.items[ndx]:
+        return node
+    if type(node.items) is ItemVector:
+        return node._rebuild(node.items.set(ndx, item))
+    return node._rebuild(node.items[:ndx] + (item,) + node.items[ndx + 1:])
+
+
+def _replace_up(frames, item):
+    """Return the top expression with item put in place of the item being
+    done by the last frame. A frame is a list whose entries 0 and 2 are a
+    container and the index of its item being done.
+    """
+    for frame in reversed(frames):
+        item = _replace(frame[0], frame[2], item)
+    return item
+
+
+class Strategy(RuleBase):
+    """Base class of the strategies.
+
+    Subclasses define the attempt method, which returns the output or
+    None when the strategy fails.
+
+    Attributes
+    ----------
+    rule_list : list
+        A list of rules which are the *args arguments of self.__init__.
+    """
+    def __init__(self, *rules, **kwargs):
+        self.rule_list = list(rules)
+        super().__init__(*rules, **kwargs)
+
+    @property
+    def pure(self):
+        return all(rule.pure for rule in self.rule_list)
+
+    def attempt(self, expr):
+        return None
+
+    def rewrite(self, expr):
+        out = self.attempt(expr)
+        return no_rewrite if out is None else out
+
+    def tpredicate(self, expr):
+        out = self.attempt(expr)
+        if out is None:
+            return False
+        # The TrueThing carries the output.
+        return TrueThing(out)
+
+    def tbody(self, truething):
+        return truething.expr
+
+
+class Sequence(Strategy):
+    """Apply the rules one after the other, fail when one of them
+    fails.
+    """
+    def attempt(self, expr):
+        for rule in self.rule_list:
+            expr = attempt(rule, expr)
+            if expr is None:
+                return None
+        return expr
+
+
+class Choice(Strategy):
+    """Apply the first rule that succeeds, fail when none does."""
+    def attempt(self, expr):
+        for rule in self.rule_list:
+            out = attempt(rule, expr)
+            if out is not None:
+                return out
+        return None
+
+
+class Try(Strategy):
+    """Apply a rule, keep the expression when the rule fails. Try never
+    fails.
+    """
+    def attempt(self, expr):
+        out = attempt(self.rule_list[0], expr)
+        return expr if out is None else out
+
+
+class Repeat(Strategy):
+    """Apply a rule again and again, until it fails or does not change
+    the expression. Repeat never fails.
+
+    Attributes
+    ----------
+    maxrepeat : int
+        The largest number of applications, reaching it is logged.
+    """
+    maxrepeat = 1000
+
+    def __init__(self, *rules, **kwargs):
+        if "maxrepeat" in kwargs:
+            self.maxrepeat = kwargs["maxrepeat"]
+        super().__init__(*rules, **kwargs)
+
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        for _ in range(self.maxrepeat):
+            if exhausted():
+                return expr
+            out = attempt(rule, expr)
+            if out is None or out is expr:
+                return expr
+            expr = out
+        ta_logger.log('Repeat reached maxrepeat {}'.format(self.maxrepeat))
+        return expr
+
+
+class AllChildren(Strategy):
+    """Apply a rule to every item of an expression, fail when the rule
+    fails for one of them. An expression without items succeeds.
+    """
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        children = _children(expr)
+        if not children:
+            return expr
+        newitems = list(expr.items[:children.start])
+        for ndx in children:
+            out = attempt(rule, expr.items[ndx])
+            if out is None:
+                return None
+            newitems.append(out)
+        if all(map(is_, newitems, expr.items)):
+            return expr
+        return expr._rebuild(tuple(newitems))
+
+
+class TopDown(Strategy):
+    """Apply a rule to an expression and then to the items of the
+    output, from the top down. Fail at the first place where the rule
+    fails, use TopDown(Try(rule)) to apply a rule wherever it applies.
+    """
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        out = attempt(rule, expr)
+        if out is None:
+            return None
+        # A frame is (container, iterator over its indices, new items).
+        stack = list()
+        while True:
+            children = _children(out)
+            if children:
+                stack.append(
+                    (out, iter(children), list(out.items[:children.start]))
+                )
+            elif stack:
+                stack[-1][2].append(out)
+            else:
+                return out
+            # Find the next item, the containers without items left are
+            # done.
+            while True:
+                node, ndxs, newitems = stack[-1]
+                ndx = next(ndxs, None)
+                if ndx is not None:
+                    break
+                stack.pop()
+                done = node
+                if not all(map(is_, newitems, node.items)):
+                    done = node._rebuild(tuple(newitems))
+                if not stack:
+                    return done
+                stack[-1][2].append(done)
+            out = attempt(rule, node.items[ndx])
+            if out is None:
+                return None
+
+
+class OnceTopDown(Strategy):
+    """Apply a rule at the first place where it succeeds, from the top
+    down and from left to right, fail when it succeeds nowhere.
+    """
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        prune = _pruning(rule)
+        # A frame is [container, iterator over its indices, index of the
+        # item being done].
+        frames = list()
+        node = expr
+        while True:
+            if prune is None or not _prunes(*prune, node):
+                out = attempt(rule, node)
+                if out is not None:
+                    return _replace_up(frames, out)
+                children = _children(node)
+                if children:
+                    frames.append([node, iter(children), None])
+            while frames:
+                frame = frames[-1]
+                frame[2] = next(frame[1], None)
+                if frame[2] is not None:
+                    node = frame[0].items[frame[2]]
+                    break
+                frames.pop()
+            else:
+                return None
+
+
+class OnceBottomUp(Strategy):
+    """Apply a rule at the first place where it succeeds, from the
+    bottom up and from left to right, fail when it succeeds nowhere.
+    """
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        prune = _pruning(rule)
+        if prune is not None and _prunes(*prune, expr):
+            return None
+        # A frame is [container, iterator over its indices, index of the
+        # item being done].
+        frames = [[expr, iter(_children(expr)), None]]
+        while frames:
+            frame = frames[-1]
+            frame[2] = next(frame[1], None)
+            if frame[2] is None:
+                # All of the items failed, try the container.
+                frames.pop()
+                out = attempt(rule, frame[0])
+                if out is not None:
+                    return _replace_up(frames, out)
+                continue
+            node = frame[0].items[frame[2]]
+            if prune is not None and _prunes(*prune, node):
+                continue
+            if _children(node):
+                frames.append([node, iter(_children(node)), None])
+                continue
+            out = attempt(rule, node)
+            if out is not None:
+                return _replace_up(frames, out)
+        return None
+
+
+class _Normalize(Strategy):
+    """Apply a rule until it applies nowhere. Never fails.
+
+    The sub-expressions found in normal form are remembered by id, an
+    output of the rule that holds them is not walked into them again.
+
+    Attributes
+    ----------
+    maxsteps : int
+        The largest number of times the rule changes a sub-expression,
+        reaching it is logged and the rule is not applied anymore.
+    """
+    maxsteps = 100000
+    # The rule is tried on a container before its items as well.
+    outermost = False
+
+    def __init__(self, *rules, **kwargs):
+        if "maxsteps" in kwargs:
+            self.maxsteps = kwargs["maxsteps"]
+        super().__init__(*rules, **kwargs)
+
+    def attempt(self, expr):
+        rule = self.rule_list[0]
+        prune = _pruning(rule)
+        outermost = self.outermost
+        steps = [0, False]
+
+        def step(node):
+            """Return the output of rule when it changes node, else
+            None.
+            """
+            if steps[0] == self.maxsteps:
+                steps[1] = True
+                return None
+            if exhausted():
+                return None
+            out = attempt(rule, node)
+            if out is None or out is node:
+                return None
+            steps[0] += 1
+            return out
+
+        # id -> sub-expression in normal form
+        normal = dict()
+        top = list()
+        # A frame is (container, iterator over its open items, new items,
+        # list the output goes to).
+        stack = list()
+        todo = (expr, top)
+        while True:
+            if todo is not None:
+                node, into = todo
+                todo = None
+                if id(node) in normal or (
+                    prune is not None and _prunes(*prune, node)
+                ):
+                    into.append(node)
+                    continue
+                children = _children(node)
+                if outermost or not children:
+                    out = step(node)
+                    if out is not None:
+                        todo = (out, into)
+                        continue
+                if children:
+                    stack.append((
+                        node,
+                        iter(node.items[children.start:]),
+                        list(node.items[:children.start]),
+                        into,
+                    ))
+                else:
+                    normal[id(node)] = node
+                    into.append(node)
+                continue
+            if not stack:
+                break
+            node, items, newitems, into = stack[-1]
+            for item in items:
+                todo = (item, newitems)
+                break
+            else:
+                stack.pop()
+                new = node
+                out = None
+                if not all(map(is_, newitems, node.items)):
+                    new = node._rebuild(tuple(newitems))
+                    out = step(new)
+                elif not outermost:
+                    out = step(new)
+                if out is not None:
+                    todo = (out, into)
+                else:
+                    normal[id(new)] = new
+                    into.append(new)
+        if steps[1]:
+            ta_logger.log('{} reached maxsteps {}'.format(
+                type(self).__name__, self.maxsteps
+            ))
+        return top[0]
+
+
+class Innermost(_Normalize):
+    """Apply a rule until it applies nowhere, at the leftmost innermost
+    place first: the items of a container are in normal form before the
+    rule is tried on the container. Never fails.
+    """
+    outermost = False
+
+
+class Outermost(_Normalize):
+    """Apply a rule until it applies nowhere, from the top down: the
+    rule is applied to a container until it fails before its items are
+    done, and tried again when its items changed. Never fails.
+    """
+    outermost = True
+
+
+def sequence(*rules, **kwargs):
+    """Return the strategy that applies rules one after the other."""
+    return Sequence(*rules, **kwargs)
+
+
+def choice(*rules, **kwargs):
+    """Return the strategy that applies the first of rules that
+    succeeds.
+    """
+    return Choice(*rules, **kwargs)
+
+
+def try_(rule, **kwargs):
+    """Return the strategy that applies rule or keeps the expression."""
+    return Try(rule, **kwargs)
+
+
+def repeat(rule, **kwargs):
+    """Return the strategy that applies rule until it fails."""
+    return Repeat(rule, **kwargs)
+
+
+def all_children(rule, **kwargs):
+    """Return the strategy that applies rule to every item."""
+    return AllChildren(rule, **kwargs)
+
+
+def topdown(rule, **kwargs):
+    """Return the strategy that applies rule from the top down."""
+    return TopDown(rule, **kwargs)
+
+
+def once_topdown(rule, **kwargs):
+    """Return the strategy that applies rule at the leftmost outermost
+    place where it succeeds.
+    """
+    return OnceTopDown(rule, **kwargs)
+
+
+def once_bottomup(rule, **kwargs):
+    """Return the strategy that applies rule at the leftmost innermost
+    place where it succeeds.
+    """
+    return OnceBottomUp(rule, **kwargs)
+
+
+def innermost(rule, **kwargs):
+    """Return the strategy that applies rule until it applies nowhere,
+    innermost first.
+    """
+    return Innermost(rule, **kwargs)
+
+
+def outermost(rule, **kwargs):
+    """Return the strategy that applies rule until it applies nowhere,
+    outermost first.
+    """
+    return Outermost(rule, **kwargs)
@@ -0,0 +1,223 @@
+from truealgebra.core.budget import (
+    Budget, BudgetExhausted, current_budget, exhausted
+)
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, CommAssoc, true
+)
+from truealgebra.core.naturalrules import NaturalRule
+from truealgebra.core.rules import Rule, MemoRule, Fixpoint
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.common.commonsettings import commonsettings
+from truealgebra.common.setup_func import common_setup_func
+from truealgebra.common.simplify import simplify
+from truealgebra.std.setup_func import std_setup_func
+from threading import Thread
+import pytest
+
+
+@pytest.fixture
+def settings():
+    settings = SettingsSingleton()
+    settings.reset()
+    commonsettings.reset()
+    std_setup_func()
+    common_setup_func()
+
+    yield settings
+
+    settings.reset()
+    commonsettings.reset()
+
+
+class XToY(Rule):
+    pure = True
+
+    def predicate(self, expr):
+        return expr == Symbol('x')
+
+    def body(self, expr):
+        return Symbol('y')
+
+
+class Grow(Rule):
+    """ u -> w(u), never ends. """
+    def predicate(self, expr):
+        return True
+
+    def body(self, expr):
+        return Container('w', (expr,))
+
+
+sx = Symbol('x')
+sy = Symbol('y')
+n1 = Number(1)
+expr = Container('f', tuple([sx] * 100))
+
+
+def test_no_budget():
+    assert current_budget() is None
+    assert not exhausted()
+    assert XToY(bottomup=True)(expr) == Container('f', tuple([sy] * 100))
+
+
+def test_budget_visits():
+    with Budget(visits=10) as budget:
+        out = XToY(bottomup=True)(expr)
+
+    assert current_budget() is None
+    assert budget.exhausted == 'visits'
+    # The first ten items are done, the rest is left alone.
+    assert out == Container('f', tuple([sy] * 10 + [sx] * 90))
+    assert budget.info().visits == 11
+
+
+def test_budget_firings():
+    with Budget(firings=5) as budget:
+        out = XToY(bottomup=True)(expr)
+
+    assert budget.exhausted == 'firings'
+    assert out.items.count(sy) == 5
+    assert budget.info().firings == 6
+
+
+def test_budget_not_exhausted():
+    with Budget(visits=1000, firings=1000, seconds=60) as budget:
+        out = XToY(bottomup=True)(expr)
+
+    assert budget.exhausted is None
+    assert out == Container('f', tuple([sy] * 100))
+    assert budget.info()[:3] == (101, 100, 0)
+
+
+def test_budget_seconds():
+    with Budget(seconds=0.0) as budget:
+        out = XToY(bottomup=True)(expr)
+
+    assert budget.exhausted == 'seconds'
+    assert sx in out.items
+
+
+def test_budget_strict():
+    with pytest.raises(BudgetExhausted):
+        with Budget(visits=10, strict=True):
+            XToY(bottomup=True)(expr)
+
+    assert current_budget() is None
+
+
+def test_budget_nested():
+    with Budget(visits=50) as outer:
+        with Budget(firings=1000) as inner:
+            out = XToY(bottomup=True)(expr)
+        assert current_budget() is outer
+
+    assert inner.exhausted is None
+    assert outer.exhausted == 'visits'
+    assert out.items.count(sy) == 50
+
+
+def test_budget_thread():
+    seen = list()
+
+    def run():
+        seen.append(current_budget())
+        seen.append(XToY(bottomup=True)(expr))
+
+    with Budget(visits=10) as budget:
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+
+    assert seen == [None, Container('f', tuple([sy] * 100))]
+    assert budget.info().visits == 0
+
+
+def test_budget_matches():
+    su, sv, sw, sz = Symbol('u'), Symbol('v'), Symbol('w'), Symbol('z')
+    vardict = {su: true, sv: true, sw: true, sz: true}
+    pattern = CommAssoc('+', (
+        Container('f', (su,)),
+        Container('f', (sv,)),
+        Container('f', (sw,)),
+        Container('g', (sz,)),
+    ))
+    target = CommAssoc('+', tuple(
+        [Container('f', (Number(k),)) for k in range(8)]
+        + [Container('h', (n1,))]
+    ))
+    rule = NaturalRule(pattern=pattern, vardict=vardict, outcome=n1)
+
+    with Budget(matches=100) as budget:
+        out = rule(target)
+
+    assert out is target
+    assert budget.exhausted == 'matches'
+    assert budget.info().matches == 101
+
+
+def test_budget_memo_rule():
+    rule = MemoRule(XToY(bottomup=True))
+    with Budget(visits=10):
+        partial = rule(expr)
+
+    assert partial != rule(expr)
+    assert rule(expr) == Container('f', tuple([sy] * 100))
+
+
+def test_budget_fixpoint():
+    rule = Fixpoint(Grow())
+    with Budget(firings=20) as budget:
+        out = rule(sx)
+
+    assert budget.exhausted == 'firings'
+    assert rule.report.status == 'budget'
+    assert out is not sx
+
+
+def test_budget_simplify(settings):
+    ex = settings.parse(' + '.join(['x*{}'.format(k) for k in range(50)]))
+
+    with Budget(visits=100000) as budget:
+        assert simplify(ex) == simplify(ex)
+    assert budget.exhausted is None
+
+    with Budget(visits=200) as budget:
+        out = simplify(ex)
+    assert budget.exhausted == 'visits'
+    assert isinstance(out, Container)
+
+
+class InnerBudget(Rule):
+    """ Applies XToY bottomup under its own tight budget. """
+    def predicate(self, expr):
+        return True
+
+    def body(self, expr):
+        with Budget(visits=10):
+            return XToY(bottomup=True)(expr)
+
+
+def test_budget_memo_rule_inner_budget():
+    rule = MemoRule(InnerBudget())
+    partial = rule(expr)
+
+    assert partial.items.count(sy) == 10
+    assert rule.info().currsize == 0
+
+
+def test_budget_fixpoint_inner_budget():
+    rule = Fixpoint(InnerBudget())
+    rule(expr)
+
+    assert rule.report.status == 'budget'
+    assert rule.report.passes == 1
+
+
+def test_budget_memo_rule_deep():
+    deep = sx
+    for _ in range(5000):
+        deep = Container('f', (deep,))
+    rule = MemoRule(XToY(bottomup=True))
+
+    assert rule(deep) == rule(deep)
+    assert rule.info().hits == 1
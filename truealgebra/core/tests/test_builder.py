@@ -0,0 +1,126 @@
+from truealgebra.core.builder import (
+    Builder, to_expr, node, symbols, function, assign, restrict,
+    bulk_sum, bulk_product
+)
+from truealgebra.core.expressions import (
+    Number, Symbol, Container, CommAssoc, Assign, Restricted, null
+)
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.core.err import ta_logger, TrueAlgebraError
+from truealgebra.common.commonsettings import commonsettings
+from truealgebra.common.setup_func import common_setup_func
+from truealgebra.std.setup_func import std_setup_func
+from fractions import Fraction
+import pytest
+
+
+@pytest.fixture
+def settings():
+    settings = SettingsSingleton()
+    settings.reset()
+    commonsettings.reset()
+    std_setup_func()
+    common_setup_func()
+
+    yield settings
+
+    settings.reset()
+    commonsettings.reset()
+
+
+@pytest.fixture
+def make_exception():
+    ta_logger.set_make_exception()
+    yield
+    ta_logger.clear_make_exception()
+
+
+x, y, z = symbols('x y z')
+f = function('f')
+
+
+@pytest.mark.parametrize(
+    'build, string',
+    [
+        (lambda: x + y + z, 'x + y + z'),
+        (lambda: x - y, 'x - y'),
+        (lambda: x - y + 3, 'x - y + 3'),
+        (lambda: -x, '-x'),
+        (lambda: -Builder(2), '-2'),
+        (lambda: x * (y * z), 'x*y*z'),
+        (lambda: (x * y) * z, '(x*y)*z'),
+        (lambda: x / y / z, 'x/y/z'),
+        (lambda: Builder(2) / 3, '2/3'),
+        (lambda: x**Builder(2)**3, 'x**2**3'),
+        (lambda: 2 * x + y * 1.5, '2*x + y*1.5'),
+        (lambda: f(x, 2) + y**2 / 3, 'f(x, 2) + y**2 / 3'),
+        (lambda: assign(x, y + 1), 'x := y + 1'),
+        (lambda: restrict(3, 'm'), '3`m'),
+        (lambda: Builder('j') * x, 'j*x'),
+        (lambda: function('plus')(x, y), 'plus(x, y)'),
+    ]
+)
+def test_builder_matches_parse(settings, build, string):
+    out = build().expr
+    correct = settings.parse(string)
+
+    assert out == correct
+    assert type(out) is type(correct)
+
+
+def test_builder_classes(settings):
+    assert type((x + y).expr) is CommAssoc
+    assert type(assign(x, y).expr) is Assign
+    assert type(restrict(x, 'm').expr) is Restricted
+    assert (Builder(2) / 4).expr == Number(Fraction(1, 2))
+
+
+def test_builder_no_settings():
+    SettingsSingleton().reset()
+
+    assert (x + 1).expr == Container('+', (Symbol('x'), Number(1)))
+    assert type((x + 1).expr) is Container
+
+
+@pytest.mark.parametrize(
+    'obj, correct',
+    [
+        (3, Number(3)),
+        (2.5, Number(2.5)),
+        (Fraction(1, 3), Number(Fraction(1, 3))),
+        ('a', Symbol('a')),
+        (Symbol('a'), Symbol('a')),
+        (Builder('a'), Symbol('a')),
+        (object(), None),
+    ]
+)
+def test_to_expr(obj, correct):
+    assert to_expr(obj) == correct
+
+
+@pytest.mark.parametrize('func, name', [(bulk_sum, '+'), (bulk_product, '*')])
+def test_bulk(settings, func, name):
+    out = func(range(4))
+
+    assert type(out) is CommAssoc
+    assert out.name == name
+    assert out.items == tuple([Number(k) for k in range(4)])
+    assert type(out.items[0].value) is int
+
+
+def test_bulk_numpy(settings):
+    np = pytest.importorskip('numpy')
+    out = bulk_sum(np.arange(3, dtype=np.int64))
+
+    assert out == CommAssoc('+', (Number(0), Number(1), Number(2)))
+    assert type(out.items[0].value) is int
+
+
+def test_node_error(make_exception):
+    with pytest.raises(TrueAlgebraError):
+        node('f', (object(),))
+
+
+def test_builder_operator_error():
+    with pytest.raises(TypeError):
+        x + object()
@@ -533,3 +533,43 @@ def test_find_matches(pattern, vardict, target, correct):
     output = cam.find_matches()
 
     assert output == correct
+
+
+@pytest.mark.parametrize(
+    'target_list, plain_expr_list, correct, remaining',
+    [
+        ([num.i0, sym.a, ex.f3, ex.g1], [num.i0, sym.a, ex.g1], True, [ex.f3]),
+        ([num.i0, ex.f3, ex.g1], [num.i0, sym.a, ex.g1], False, None),
+        ([num.i0, sym.a], [sym.a, ex.g1], False, None),
+        ([num.i1, num.i1, sym.a], [num.i1], True, [num.i1, sym.a]),
+    ]
+)
+def test_merge_plain_expr_list(
+    target_list, plain_expr_list, correct, remaining
+):
+    cam = EmptyCommAssocMatch()
+    cam.ordered = True
+    cam.target_list = target_list
+
+    out = cam.process_plain_expr_list(plain_expr_list)
+
+    assert out is correct
+    if correct:
+        assert cam.target_list == remaining
+
+
+def test_find_matches_normal_form():
+    pattern = CommAssoc('+', (num.i1, sym.x, ex.gy, ex.fx)).canonical()
+    fb = Container('f', (sym.b,))
+    target = CommAssoc('+', (fb, num.i1, sym.b, ex.gy)).canonical()
+    cam = CommAssocMatch(
+        pattern=pattern,
+        vardict={sym.x: true},
+        subdict=dict(),
+        pred_rule=pred_rule,
+        target=target,
+    )
+
+    assert cam.ordered
+    assert cam.find_matches()
+    assert cam.subdict == {sym.x: sym.b}
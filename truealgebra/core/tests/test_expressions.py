@@ -1,7 +1,7 @@
 import pytest
 
 from truealgebra.core.expressions import (
-    ExprBase, NullSingleton, null, Symbol, Container, CommAssoc,
+    ExprBase, NullSingleton, null, Symbol, Container, CommAssoc, Atom,
     Assign, Restricted, Number, any__, true, false
 )
 from truealgebra.core.rules import Rule, donothing_rule
@@ -526,3 +526,849 @@ def test_commassoc__eq__():
     assert ca == ca3
 
 
+
+
+# =============
+# Test interning
+# =============
+from truealgebra.core.expressions import (
+    intern_table, InternTable, current_intern_table
+)
+from threading import Thread
+
+
+@pytest.fixture
+def interning():
+    intern_table.clear()
+    intern_table.enable()
+    yield intern_table
+    intern_table.disable()
+    intern_table.clear()
+
+
+def test_interning_off_by_default():
+    assert intern_table.active is False
+    assert Symbol('x') is not Symbol('x')
+
+
+def test_interning_toggle():
+    table = InternTable()
+    table.enable()
+    try:
+        assert current_intern_table() is table
+        assert intern_table.active is False
+        assert Symbol('x') is Symbol('x')
+        with intern_table.suspended():
+            assert current_intern_table() is None
+            assert Symbol('x') is not Symbol('x')
+        assert Symbol('x') is Symbol('x')
+    finally:
+        table.disable()
+
+    assert current_intern_table() is None
+    assert Symbol('x') is not Symbol('x')
+
+
+def test_interning_thread(interning):
+    seen = list()
+
+    def run():
+        seen.append(current_intern_table())
+        seen.append(Symbol('x') is Symbol('x'))
+        intern_table.enable()
+
+    thread = Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert seen == [None, False]
+    with intern_table.suspended():
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+        assert Symbol('x') is not Symbol('x')
+    assert Symbol('x') is Symbol('x')
+
+
+def test_intern_symbol_number(interning):
+    assert Symbol('x') is Symbol('x')
+    assert Number(2) is Number(2)
+    assert Number(2) is not Number(2.0)
+    assert Number(0.0) is not Number(-0.0)
+    assert Symbol('x') is not Symbol('y')
+
+
+def test_intern_container(interning):
+    ex0 = Container('f', (Symbol('x'), Number(2)))
+    ex1 = Container('f', (Symbol('x'), Number(2)))
+    ca0 = CommAssoc('+', (ex0, Symbol('y')))
+    ca1 = CommAssoc('+', (ex1, Symbol('y')))
+
+    assert ex0 is ex1
+    assert ca0 is ca1
+    assert Restricted('f', ex0.items) is not ex0
+    assert Assign(':=', (Symbol('a'), ex0)) is Assign(':=', (Symbol('a'), ex1))
+
+
+def test_intern_stats(interning):
+    sx = Symbol('x')
+    sx2 = Symbol('x')
+    stats = interning.stats()
+
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 1
+    assert stats['active'] is True
+
+
+def test_intern_weak():
+    table = InternTable()
+    table.lookup(Symbol('x'))
+
+    assert len(table.table) == 0
+
+
+def test_intern_deep():
+    table = InternTable()
+    sx = Symbol('x')
+    ex0 = Container('f', (sx, Container('g', (sx,))))
+    ex1 = Container('f', (Symbol('x'), Container('g', (Symbol('x'),))))
+
+    out0 = table.intern(ex0)
+    out1 = table.intern(ex1)
+
+    assert out0 is ex0
+    assert out1 is ex0
+    assert out1[1][0] is sx
+
+
+def test_intern_bottomup(interning):
+    expr = Container('f', (Symbol('a'), Symbol('b')))
+    out = expr.bottomup(arule)
+
+    assert out is Symbol('x')
+
+
+# ===================
+# Test cached hashing
+# ===================
+def test_container_hash_cached():
+    expr = Container('f', (Symbol('a'), CommAssoc('+', (Symbol('b'),))))
+    value = hash(expr)
+
+    assert expr._hash == value
+    assert expr[1]._hash == hash(expr[1])
+    assert hash(expr) == value
+
+
+def test_container_hash_cleared_by_parse_methods():
+    token = Container('f')
+    hash(token)
+    token._append_item(Symbol('a'))
+
+    assert hash(token) == hash(Container('f', (Symbol('a'),)))
+
+
+class EqCounter(Symbol):
+    count = 0
+
+    def __eq__(self, other):
+        EqCounter.count += 1
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return super().__hash__()
+
+
+def test_container_eq_short_circuit():
+    item = EqCounter('a')
+    expr0 = Container('f', (item, Symbol('b')))
+    expr1 = Container('f', (EqCounter('a'), Symbol('c')))
+    EqCounter.count = 0
+
+    assert expr0 == expr0
+    assert expr0 != expr1
+    assert EqCounter.count == 0
+
+
+# ===================
+# Test __slots__ layout
+# ===================
+import copy
+import pickle
+
+
+@pytest.mark.parametrize(
+    'expr',
+    [
+        Symbol('a'),
+        Number(2.5),
+        Container('f', (Symbol('a'),)),
+        CommAssoc('+', (Symbol('a'), Number(1))),
+        Assign(':=', (Symbol('a'), Number(1))),
+        Restricted('`', (Number(1), Symbol('m'))),
+    ]
+)
+def test_no_instance_dict(expr):
+    hash(expr)
+
+    assert not hasattr(expr, '__dict__')
+    assert pickle.loads(pickle.dumps(expr)) == expr
+    assert copy.deepcopy(expr) == expr
+    assert type(copy.deepcopy(expr)) is type(expr)
+
+
+def test_memo_created_lazily():
+    expr = CommAssoc('+', (Symbol('a'), Number(1)))
+    value = hash(expr)
+
+    assert expr._hash == value
+    assert not hasattr(expr, '_memo')
+    assert not hasattr(expr, '_digest')
+    digest = expr.digest()
+    expr.multiset()
+    assert expr._memo._digest is digest
+    assert not hasattr(expr, '_canonical')
+    assert not hasattr(pickle.loads(pickle.dumps(expr)), '_memo')
+    expr._clear_hash()
+    assert not hasattr(expr, '_memo')
+    assert expr.digest() == digest
+
+
+def test_pickle_null():
+    assert pickle.loads(pickle.dumps(null)) is null
+
+
+def test_binding_powers_not_stored_in_expression():
+    from truealgebra.core.expressions import (
+        _binding_powers, release_binding_powers
+    )
+    token = Container('!', (), 2000, 0)
+
+    assert (token.lbp, token.rbp) == (2000, 0)
+    assert id(token) in _binding_powers
+
+    release_binding_powers([token])
+
+    assert (token.lbp, token.rbp) == (0, 0)
+    assert id(token) not in _binding_powers
+
+
+def test_binding_powers_released_on_collection():
+    from truealgebra.core.expressions import _binding_powers
+    token = Container('!', (), 2000, 0)
+    key = id(token)
+    del token
+
+    assert key not in _binding_powers
+
+
+class Collide(Symbol):
+    """Symbols that all have the same hash."""
+    __slots__ = ()
+
+    def __hash__(self):
+        return 7
+
+
+def test_commassoc_multiset():
+    ca = CommAssoc('+', (Symbol('a'), Symbol('b'), Symbol('a')))
+
+    assert ca.multiset() == {Symbol('a'): 2, Symbol('b'): 1}
+    assert ca.multiset() is ca.multiset()
+
+
+def test_commassoc_eq_hash_collisions():
+    ca0 = CommAssoc('+', (Collide('a'), Collide('b'), Collide('a')))
+    ca1 = CommAssoc('+', (Collide('b'), Collide('a'), Collide('a')))
+    ca2 = CommAssoc('+', (Collide('b'), Collide('b'), Collide('a')))
+
+    assert ca0 == ca1
+    assert ca0 != ca2
+
+
+def test_commassoc_eq_multiplicity():
+    ca0 = CommAssoc('+', (Symbol('a'), Symbol('a'), Symbol('b')))
+    ca1 = CommAssoc('+', (Symbol('a'), Symbol('b'), Symbol('b')))
+
+    assert ca0 != ca1
+    assert ca0.inner_eq(list(ca0.items), list(reversed(ca0.items)))
+    assert not ca0.inner_eq(list(ca0.items), list(ca1.items))
+
+
+# ===========
+# Test digest
+# ===========
+def test_digest_equal_expressions():
+    ex0 = Container('f', (Symbol('a'), CommAssoc('+', (Number(1), Symbol('b')))))
+    ex1 = Container('f', (Symbol('a'), CommAssoc('+', (Symbol('b'), Number(1)))))
+
+    assert ex0.digest() == ex1.digest()
+    assert ex0.digest() is ex0.digest()
+    assert len(ex0.digest()) == 20
+    assert ex0.hexdigest() == ex0.digest().hex()
+
+
+@pytest.mark.parametrize(
+    'ex0, ex1',
+    [
+        (Symbol('a'), Symbol('b')),
+        (Number(1), Number(1.0)),
+        (Number(1), Symbol('1')),
+        (Container('f', (Symbol('a'), Symbol('b'))),
+            Container('f', (Symbol('b'), Symbol('a')))),
+        (Container('f', (Symbol('a'),)), CommAssoc('f', (Symbol('a'),))),
+        (Container('f', (Symbol('a'),)), Restricted('f', (Symbol('a'),))),
+        (Container('f', (Symbol('ab'),)),
+            Container('fa', (Symbol('b'),))),
+        (CommAssoc('+', (Symbol('a'), Symbol('a'), Symbol('b'))),
+            CommAssoc('+', (Symbol('a'), Symbol('b'), Symbol('b')))),
+    ]
+)
+def test_digest_different_expressions(ex0, ex1):
+    assert ex0.digest() != ex1.digest()
+
+
+def test_digest_stable_across_processes():
+    import subprocess
+    import sys
+    code = (
+        "from truealgebra.core.expressions import "
+        "Container, CommAssoc, Symbol, Number;"
+        "print(Container('f', (CommAssoc('+', (Symbol('x'), Number(2))),"
+        " Number(0.5))).hexdigest())"
+    )
+    outputs = set()
+    for seed in ('1', '2'):
+        env = {'PYTHONHASHSEED': seed, 'PYTHONPATH': ':'.join(sys.path)}
+        outputs.add(subprocess.check_output(
+            [sys.executable, '-c', code], env=env
+        ))
+
+    assert len(outputs) == 1
+
+
+def test_digest_not_defined():
+    class NoDigest(Atom):
+        def __eq__(self, other):
+            return self is other
+
+        def __hash__(self):
+            return id(self)
+
+    with pytest.raises(TypeError):
+        NoDigest().digest()
+
+
+# ========================
+# Deep expression handling
+# ========================
+class SymbolToX(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Symbol)
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+def nested_powers(depth, base):
+    expr = base
+    for ndx in range(depth):
+        expr = Container('**', (expr, Number(ndx)))
+    return expr
+
+
+DEPTH = 3000
+
+
+def test_deep_bottomup():
+    out = nested_powers(DEPTH, Symbol('a')).bottomup(SymbolToX())
+
+    assert out == nested_powers(DEPTH, Symbol('x'))
+
+
+def test_deep_apply2path():
+    out = nested_powers(DEPTH, Symbol('a')).apply2path(
+        (0,) * DEPTH, SymbolToX()
+    )
+
+    assert out == nested_powers(DEPTH, Symbol('x'))
+
+
+def test_deep_eq_hash_repr():
+    ex0 = nested_powers(DEPTH, Symbol('a'))
+    ex1 = nested_powers(DEPTH, Symbol('a'))
+    ex2 = nested_powers(DEPTH, Symbol('b'))
+
+    assert ex0 == ex1
+    assert hash(ex0) == hash(ex1)
+    assert ex0 != ex2
+    assert repr(ex0).startswith('**(' * DEPTH + 'a, 0), 1)')
+
+
+def test_deep_digest():
+    ex0 = nested_powers(DEPTH, Symbol('a'))
+    ex1 = CommAssoc('+', (nested_powers(DEPTH, Symbol('a')), Symbol('b')))
+
+    assert ex0.digest() == nested_powers(DEPTH, Symbol('a')).digest()
+    assert ex0.digest() != nested_powers(DEPTH, Symbol('b')).digest()
+    assert ex1.digest() == CommAssoc(
+        '+', (Symbol('b'), nested_powers(DEPTH, Symbol('a')))
+    ).digest()
+    assert ex0.digest() == Container(
+        '**', (nested_powers(DEPTH - 1, Symbol('a')), Number(DEPTH - 1))
+    ).digest()
+
+
+def test_deep_intern(interning):
+    ex0 = nested_powers(DEPTH, Symbol('a'))
+    ex1 = InternTable().intern(nested_powers(DEPTH, Symbol('a')))
+
+    assert ex0 is nested_powers(DEPTH, Symbol('a'))
+    assert interning.intern(ex1) is ex0
+
+
+def test_deep_match():
+    pattern = nested_powers(DEPTH, Symbol('v'))
+    subdict = dict()
+    out = pattern.match(
+        {Symbol('v'): true},
+        subdict,
+        donothing_rule,
+        nested_powers(DEPTH, Symbol('a')),
+    )
+
+    assert out is True
+    assert subdict == {Symbol('v'): Symbol('a')}
+
+
+def test_deep_does_contain_variable():
+    pattern = CommAssoc('+', (nested_powers(DEPTH, Symbol('v')),))
+    subdict = dict()
+    out = pattern.match(
+        {Symbol('v'): true},
+        subdict,
+        donothing_rule,
+        CommAssoc('+', (nested_powers(DEPTH, Symbol('a')),)),
+    )
+
+    assert out is True
+    assert subdict == {Symbol('v'): Symbol('a')}
+
+
+@pytest.mark.parametrize(
+    'path, correct',
+    [
+        ((1, 0), Container('f', (Symbol('a'), Container('g', (Symbol('x'),))))),
+        ((-1, 0), Container('f', (Symbol('a'), Container('g', (Symbol('x'),))))),
+        ((2, 0), null),
+        ((1, 'q'), Container('f', (Symbol('a'), null))),
+        ((1, 0, 0), Container('f', (Symbol('a'), Container('g', (null,))))),
+    ]
+)
+def test_apply2path_errors(path, correct):
+    expr = Container('f', (Symbol('a'), Container('g', (Symbol('b'),))))
+    out = expr.apply2path(path, SymbolToX())
+
+    assert out == correct
+
+
+def test_apply2path_assign_closed():
+    expr = Container('f', (Assign(':=', (Symbol('a'), Symbol('b'))),))
+
+    assert expr.apply2path((0, 0), SymbolToX()) == Container('f', (null,))
+    assert expr.apply2path((0, -2), SymbolToX()) == Container('f', (null,))
+    assert (
+        expr.apply2path((0, 1), SymbolToX())
+        == Container('f', (Assign(':=', (Symbol('a'), Symbol('x'))),))
+    )
+
+
+# ===========================
+# Identity preserving rebuild
+# ===========================
+@pytest.mark.parametrize(
+    'expr',
+    [
+        Symbol('a'),
+        Container('f', (Symbol('a'), Container('g', (Number(1),)))),
+        Assign(':=', (Symbol('x'), Container('g', (Symbol('b'),)))),
+        Restricted('f', (Symbol('x'),)),
+        CommAssoc('+', (Symbol('a'), Symbol('b'))),
+    ]
+)
+def test_bottomup_unchanged_is_identical(expr):
+    assert expr.bottomup(donothing_rule) is expr
+
+
+def test_bottomup_shares_unchanged_items():
+    unchanged = Container('g', (Number(1), Number(2)))
+    expr = Container('f', (unchanged, Symbol('a')))
+    out = expr.bottomup(SymbolToX())
+
+    assert out == Container('f', (unchanged, Symbol('x')))
+    assert out is not expr
+    assert out[0] is unchanged
+
+
+def test_bottomup_assign_closed_item_kept():
+    expr = Assign(':=', (Symbol('a'), Number(1)))
+
+    assert expr.bottomup(SymbolToX()) is expr
+
+
+def test_apply2path_unchanged_is_identical():
+    expr = Container('f', (Number(1), Container('g', (Number(2),))))
+
+    assert expr.apply2path((1, 0), SymbolToX()) is expr
+
+
+# =====================
+# Shared sub-expressions
+# =====================
+class CountSymbolToX(SymbolToX):
+    pure = True
+
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def predicate(self, expr):
+        self.count += 1
+        return super().predicate(expr)
+
+
+def dag_expr():
+    shared = Container('+', (Container('**', (Symbol('a'), Number(2))), Number(1)))
+    equal = Container('+', (Container('**', (Symbol('a'), Number(2))), Number(1)))
+    return Container('f', (shared, shared, equal, Number(1.0), Symbol('b')))
+
+
+def test_dag_bottomup_applies_once():
+    plain = CountSymbolToX(bottomup=True)
+    dag = CountSymbolToX(bottomup=True, dag=True)
+    expr = dag_expr()
+    out = dag(expr)
+
+    assert out == plain(expr)
+    assert plain.count == 18
+    assert dag.count == 8
+    assert out[0] is out[1]
+    assert out[0] is out[2]
+
+
+def test_dag_bottomup_unchanged_is_identical():
+    rule = CountSymbolToX(bottomup=True, dag=True)
+    expr = Container('f', (Number(1), Container('g', (Number(1),)), Number(1)))
+    out = rule(expr)
+
+    assert out is expr
+    assert rule.count == 3
+
+
+def test_dag_bottomup_int_float():
+    class IntToZero(Rule):
+        def predicate(self, expr):
+            return isinstance(expr, Number) and isinstance(expr.value, int)
+
+        def body(self, expr):
+            return Number(0)
+
+    rule = IntToZero(bottomup=True, dag=True)
+    out = rule(Container('f', (Number(1), Number(1.0))))
+
+    assert type(out[0].value) is int
+    assert type(out[1].value) is float
+
+
+def test_dag_bottomup_not_pure():
+    rule = CountSymbolToX(bottomup=True, dag=True)
+    rule.pure = False
+    rule(dag_expr())
+
+    assert rule.count == 18
+
+
+# ===============================
+# Test exprstats and rule pruning
+# ===============================
+from truealgebra.core.expressions import exprstats, ExprStats, MultiExprs
+
+
+class CountRule(Rule):
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def predicate(self, expr):
+        self.count += 1
+        return isinstance(expr, Container) and expr.name == 'g'
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+class DeclaredCountRule(CountRule):
+    heads = frozenset(['g'])
+    symbols = frozenset()
+
+
+def stats_expr():
+    return Container('f', (
+        Container('h', (Symbol('a'), Number(1))),
+        Container('g', (Symbol('b'),)),
+        Symbol('a'),
+    ))
+
+
+@pytest.mark.parametrize(
+    'expr, correct',
+    [
+        (Symbol('a'), ExprStats(frozenset([Symbol('a')]), frozenset(), 1, 1)),
+        (Number(1), ExprStats(frozenset(), frozenset(), 1, 1)),
+        (
+            stats_expr(),
+            ExprStats(
+                frozenset([Symbol('a'), Symbol('b')]),
+                frozenset(['f', 'g', 'h']),
+                7,
+                3,
+            ),
+        ),
+        (
+            MultiExprs((Symbol('a'), Container('f', ()))),
+            ExprStats(frozenset([Symbol('a')]), frozenset(['f']), 3, 2),
+        ),
+    ]
+)
+def test_exprstats(expr, correct):
+    assert exprstats(expr) == correct
+
+
+def test_exprstats_memoized():
+    expr = stats_expr()
+    stats = exprstats(expr)
+
+    assert exprstats(expr) is stats
+    assert exprstats(expr[0]) is expr[0]._stats
+
+
+def test_exprstats_unknown_class():
+    class Opaque(ExprBase):
+        def __eq__(self, other):
+            return self is other
+
+        def __hash__(self):
+            return id(self)
+
+        def bottomup(self, rule):
+            return rule(self, _pathinhibit=True, _buinhibit=True)
+
+        def apply2path(self, path, rule, _buinhibit=False):
+            return self
+
+        def match(self, vardict, subdict, pred_rule, expr):
+            return False
+
+    assert exprstats(Container('f', (Opaque(),))) is None
+
+
+def test_bottomup_prunes():
+    plain = CountRule(bottomup=True)
+    declared = DeclaredCountRule(bottomup=True)
+    expr = stats_expr()
+    out = declared(expr)
+
+    assert out == plain(expr)
+    assert out[0] is expr[0]
+    assert plain.count == 7
+    # only f, g and the Symbol b inside g are not pruned
+    assert declared.count == 2
+
+
+def test_bottomup_prunes_whole_expr():
+    rule = DeclaredCountRule(bottomup=True)
+    expr = Container('f', (Symbol('a'),))
+
+    assert rule(expr) is expr
+    assert rule.count == 0
+
+
+def test_bottomup_prunes_dag():
+    rule = DeclaredCountRule(bottomup=True, dag=True)
+    expr = stats_expr()
+
+    assert rule(expr) == CountRule(bottomup=True)(expr)
+    assert rule.count == 2
+
+
+def test_bottomup_no_prune_non_symbol():
+    class NumberDeclared(CountRule):
+        heads = frozenset(['g'])
+        symbols = frozenset([Number(1)])
+
+    rule = NumberDeclared(bottomup=True)
+    rule(stats_expr())
+
+    assert rule.count == 7
+
+
+# =======================
+# Test canonical ordering
+# =======================
+from truealgebra.core.expressions import compare, order_key, sort_commassoc
+
+
+@pytest.mark.parametrize(
+    'expr0, expr1, correct',
+    [
+        (Number(1), Number(2), -1),
+        (Number(2.5), Number(2), 1),
+        (Number(1), Number(1.0), 0),
+        (Number(1 + 1j), Number(1), 1),
+        (Number(100), Symbol('a'), -1),
+        (Symbol('a'), Symbol('b'), -1),
+        (Symbol('z'), Container('a', ()), -1),
+        (Container('f', (Symbol('a'),)), Container('g', ()), -1),
+        (Container('f', (Symbol('b'),)), Container('f', (Symbol('a'),)), 1),
+        (Container('f', ()), Container('f', (Symbol('a'),)), -1),
+        (Container('f', (Symbol('a'),)), Restricted('f', (Symbol('a'),)), -1),
+        (
+            CommAssoc('+', (Symbol('b'), Number(1))),
+            CommAssoc('+', (Number(1), Symbol('b'))),
+            0,
+        ),
+        (
+            CommAssoc('+', (Symbol('b'), Number(1))),
+            CommAssoc('+', (Symbol('a'), Symbol('b'))),
+            -1,
+        ),
+    ]
+)
+def test_compare(expr0, expr1, correct):
+    assert compare(expr0, expr1) == correct
+    assert compare(expr1, expr0) == -correct
+
+
+def test_order_key_sorts():
+    exprs = [
+        Container('g', ()), Symbol('b'), Number(3), Container('f', ()),
+        Symbol('a'), Number(-1.5),
+    ]
+
+    assert sorted(exprs, key=order_key) == [
+        Number(-1.5), Number(3), Symbol('a'), Symbol('b'),
+        Container('f', ()), Container('g', ()),
+    ]
+
+
+def test_compare_deep():
+    expr0 = Symbol('a')
+    expr1 = Symbol('b')
+    for _ in range(5000):
+        expr0 = CommAssoc('+', (Number(1), expr0))
+        expr1 = CommAssoc('+', (expr1, Number(1)))
+
+    assert compare(expr0, expr1) == -1
+    assert compare(expr0, expr0.canonical()) == 0
+
+
+def test_commassoc_canonical():
+    ca = CommAssoc('+', (Symbol('b'), Container('f', ()), Number(2)))
+    out = ca.canonical()
+
+    assert out == ca
+    assert out.items == (Number(2), Symbol('b'), Container('f', ()))
+    assert out.is_canonical()
+    assert not ca.is_canonical()
+    assert out.canonical() is out
+
+
+def test_sort_commassoc():
+    plus = CommAssoc('+', (Symbol('b'), Symbol('a')))
+    expr = Container('f', (CommAssoc('*', (plus, Symbol('y'))), Symbol('c')))
+    out = sort_commassoc(expr)
+
+    assert out == expr
+    assert out[0].items[0] == Symbol('y')
+    assert out[0].items[1].items == (Symbol('a'), Symbol('b'))
+    assert out[1] is expr[1]
+    assert sort_commassoc(out) is out
+
+
+def test_commassoc_eq_normal_form():
+    ca0 = CommAssoc('+', (Symbol('b'), Symbol('a'), Number(1))).canonical()
+    ca1 = CommAssoc('+', (Number(1), Symbol('b'), Symbol('a'))).canonical()
+    ca2 = CommAssoc('+', (Number(1), Symbol('b'), Symbol('c'))).canonical()
+
+    assert ca0 == ca1
+    assert ca0 != ca2
+
+
+# ================
+# Test NumberArray
+# ================
+from truealgebra.core.expressions import NumberArray, number
+
+
+@pytest.fixture
+def np():
+    return pytest.importorskip('numpy')
+
+
+def test_number_factory(np):
+    assert type(number(np.arange(3))) is NumberArray
+    assert type(number(2)) is Number
+    assert type(number(np.float64(2.0))) is Number
+
+
+def test_numberarray_read_only(np):
+    array = np.arange(3)
+    na = NumberArray(array)
+
+    assert array.flags.writeable
+    assert not na.value.flags.writeable
+    assert na.value.base is array
+
+
+@pytest.mark.parametrize(
+    'make0, make1, correct',
+    [
+        (lambda np: np.arange(3), lambda np: np.arange(3.0), True),
+        (lambda np: np.arange(3), lambda np: np.arange(1, 4), False),
+        (lambda np: np.arange(4), lambda np: np.arange(4).reshape(2, 2), False),
+    ]
+)
+def test_numberarray_eq(np, make0, make1, correct):
+    na0 = NumberArray(make0(np))
+    na1 = NumberArray(make1(np))
+
+    assert (na0 == na1) is correct
+    if correct:
+        assert hash(na0) == hash(na1)
+    assert na0 != Number(0)
+
+
+def test_numberarray_repr(np):
+    assert repr(NumberArray(np.arange(3))) == 'NumberArray([0, 1, 2])'
+    assert repr(NumberArray(np.arange(10))) == (
+        'NumberArray([0, 1, 2, ..., 7, 8, 9])'
+    )
+    assert NumberArray(np.arange(4).reshape(2, 2)).summary() == (
+        '[0, 1, 2, 3] shape (2, 2)'
+    )
+
+
+def test_numberarray_digest_order(np):
+    na0 = NumberArray(np.arange(3))
+    na1 = NumberArray(np.arange(1, 4))
+
+    assert na0.digest() == NumberArray(np.arange(3)).digest()
+    assert na0.digest() != na1.digest()
+    assert compare(na0, na1) == -1
+    assert compare(Number(10**9), na0) == -1
+    assert compare(na0, NumberArray(np.arange(3.0))) == 0
+
+
+def test_numberarray_not_interned(np, interning):
+    assert NumberArray(np.arange(3)) is not NumberArray(np.arange(3))
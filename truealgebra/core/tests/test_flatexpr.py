@@ -0,0 +1,195 @@
+from truealgebra.core.flatexpr import FlatExpr, ATOM, NODE, isnode
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, CommAssoc, Assign, Restricted, null
+)
+from truealgebra.core.rules import Rule
+import pytest
+
+
+class SymbolXRule(Rule):
+    """ Convert all symbols to the symbol x. """
+    def predicate(self, expr):
+        return isinstance(expr, Symbol)
+    def body(self, expr):
+        return Symbol('x')
+
+
+class CountRule(Rule):
+    """ Count the expressions the rule is applied to. """
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+    def predicate(self, expr):
+        self.count += 1
+        return False
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+sx = Symbol('x')
+n1 = Number(1)
+r1 = Number(1.0)
+
+fab = Container('f', (sa, sb))
+g_fab = Container('g', (fab, n1, fab))
+ca = CommAssoc('+', (sa, n1, fab))
+ca_rev = CommAssoc('+', (fab, n1, sa))
+assign = Assign(':=', (sa, Container('f', (sb,))))
+restricted = Restricted('`', (sa, sb))
+
+
+def deep_expr(depth):
+    expr = sa
+    for _ in range(depth):
+        expr = Container('f', (expr, sb))
+    return expr
+
+
+@pytest.mark.parametrize(
+    'expr',
+    [
+        sa,
+        n1,
+        null,
+        Container('f', ()),
+        fab,
+        g_fab,
+        ca,
+        assign,
+        restricted,
+        Container('h', (n1, r1, Number(0.0), Number(-0.0))),
+    ]
+)
+def test_flatexpr_roundtrip(expr):
+    flat = FlatExpr.from_expr(expr)
+    out = flat.to_expr()
+
+    assert out == expr
+    assert type(out) is type(expr)
+    assert hash(flat) == hash(expr)
+
+
+def test_flatexpr_roundtrip_number_types():
+    out = FlatExpr.from_expr(Container('f', (n1, r1))).to_expr()
+
+    assert type(out[0].value) is int
+    assert type(out[1].value) is float
+
+
+def test_flatexpr_encoding():
+    flat = FlatExpr.from_expr(g_fab)
+
+    assert list(flat.kinds) == [ATOM, ATOM, NODE, ATOM, ATOM, ATOM, NODE, NODE]
+    assert list(flat.arities) == [0, 0, 2, 0, 0, 0, 2, 3]
+    assert list(flat.sizes) == [1, 1, 3, 1, 1, 1, 3, 8]
+    assert flat.heads == [(Container, 'f'), (Container, 'g')]
+    assert flat.atoms == [sa, sb, n1]
+    assert flat.children(7) == [2, 3, 6]
+    assert list(flat.parents()) == [2, 2, 7, 7, 6, 6, 7, -1]
+
+
+def test_isnode():
+    class OwnInit(Container):
+        def __init__(self, items):
+            super().__init__('own', items)
+
+    assert isnode(fab)
+    assert isnode(ca)
+    assert not isnode(sa)
+    assert not isnode(OwnInit((sa,)))
+
+
+@pytest.mark.parametrize(
+    'expr0, expr1, correct',
+    [
+        (g_fab, Container('g', (fab, n1, fab)), True),
+        (g_fab, Container('g', (fab, n1, sa)), False),
+        (ca, ca_rev, True),
+        (fab, Container('f', (sa, sx)), False),
+    ]
+)
+def test_flatexpr_eq(expr0, expr1, correct):
+    flat0 = FlatExpr.from_expr(expr0)
+    flat1 = FlatExpr.from_expr(expr1)
+
+    assert (flat0 == flat1) is correct
+    assert (hash(flat0) == hash(flat1)) is correct
+
+
+@pytest.mark.parametrize(
+    'expr',
+    [fab, g_fab, ca, assign, restricted, Container('h', (restricted, sb))]
+)
+def test_flatexpr_bottomup(expr):
+    rule = SymbolXRule()
+    out = FlatExpr.from_expr(expr).bottomup(rule)
+
+    assert isinstance(out, FlatExpr)
+    assert out.to_expr() == expr.bottomup(rule)
+
+
+def test_flatexpr_bottomup_count():
+    tree_rule = CountRule()
+    flat_rule = CountRule()
+    expr = Container('h', (assign, restricted, g_fab))
+    expr.bottomup(tree_rule)
+    FlatExpr.from_expr(expr).bottomup_expr(flat_rule)
+
+    assert flat_rule.count == tree_rule.count
+
+
+class AToB(Rule):
+    def predicate(self, expr):
+        return expr == sa
+
+    def body(self, expr):
+        return sb
+
+
+def test_flatexpr_bottomup_reuses_nodes():
+    expr = Container('h', (Container('f', (sb, n1)), Container('g', (sa,))))
+    flat = FlatExpr.from_expr(expr)
+    out = flat.bottomup_expr(AToB())
+
+    assert out == Container(
+        'h', (Container('f', (sb, n1)), Container('g', (sb,)))
+    )
+    assert out[0] is expr[0]
+    assert flat.to_expr() is expr
+    assert flat.bottomup(CountRule()) is flat
+
+
+def test_flatexpr_bottomup_source_gone():
+    flat = FlatExpr.from_expr(Container('g', (sa, Container('f', (sb,)))))
+
+    assert flat.source() is None
+    assert flat.bottomup_expr(AToB()) == Container(
+        'g', (sb, Container('f', (sb,)))
+    )
+
+
+def test_flatexpr_bottomup_distinct_atoms():
+    flat = FlatExpr.from_expr(
+        Container('f', (sa, sb, Container('g', (sa, sb, sa))))
+    )
+    rule = CountRule()
+    flat.bottomup_expr(rule)
+    pure_rule = CountRule()
+    pure_rule.pure = True
+    flat.bottomup_expr(pure_rule)
+
+    assert flat.source() is None
+    assert rule.count == 7
+    # a and b once each, g and f
+    assert pure_rule.count == 4
+
+
+def test_flatexpr_deep():
+    expr = deep_expr(20000)
+    flat = FlatExpr.from_expr(expr)
+    out = flat.bottomup(SymbolXRule())
+
+    assert len(flat) == 40001
+    assert hash(flat) == hash(FlatExpr.from_expr(deep_expr(20000)))
+    assert flat == FlatExpr.from_expr(deep_expr(20000))
+    assert out.atoms == [sx]
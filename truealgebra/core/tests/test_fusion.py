@@ -0,0 +1,218 @@
+from truealgebra.core.fusion import Fused, compile_stages
+from truealgebra.core.budget import Budget
+from truealgebra.core.expressions import Symbol, Number, Container, Assign
+from truealgebra.core.rules import Rule, Rules, MemoRule
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.common.commonsettings import commonsettings
+from truealgebra.common.setup_func import common_setup_func
+from truealgebra.common.simplify import simplify, simplify0
+from truealgebra.std.setup_func import std_setup_func
+import pytest
+
+
+@pytest.fixture
+def settings():
+    settings = SettingsSingleton()
+    settings.reset()
+    commonsettings.reset()
+    std_setup_func()
+    common_setup_func()
+
+    yield settings
+
+    settings.reset()
+    commonsettings.reset()
+
+
+class CountRule(Rule):
+    """ Rule that counts the expressions it is applied to. """
+    pure = True
+
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def tpredicate(self, expr):
+        self.count += 1
+        return super().tpredicate(expr)
+
+
+class AToH(CountRule):
+    """ a -> h(b) """
+    def predicate(self, expr):
+        return expr == Symbol('a')
+
+    def body(self, expr):
+        return Container('h', (Symbol('b'),))
+
+
+class HToK(CountRule):
+    """ h(u) -> k(u, u), needs the items of h done. """
+    def predicate(self, expr):
+        return isinstance(expr, Container) and expr.name == 'h'
+
+    def body(self, expr):
+        return Container('k', (expr[0], expr[0]))
+
+
+class BToC(CountRule):
+    def predicate(self, expr):
+        return expr == Symbol('b')
+
+    def body(self, expr):
+        return Symbol('c')
+
+
+class Impure(BToC):
+    pure = False
+
+
+class Absorb(CountRule):
+    """ n(...) -> L(...), with the items of L items taken in. """
+    def predicate(self, expr):
+        return isinstance(expr, Container) and expr.name == 'n'
+
+    def body(self, expr):
+        items = list()
+        for item in expr.items:
+            if isinstance(item, Container) and item.name == 'L':
+                items.extend(item.items)
+            else:
+                items.append(item)
+        return Container('L', items)
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+sx = Symbol('x')
+n1 = Number(1)
+
+expr = Container('f', (
+    Container('g', (sa, sx)),
+    Container('h', (sa,)),
+    Assign(':=', (sa, Container('h', (sb,)))),
+    n1,
+))
+
+
+@pytest.mark.parametrize(
+    'strn',
+    [
+        'x + y*x - 3/4*x**2',
+        'sin(x*2*x)/(a + b + a)',
+        '-(x - y)*(2 + 3)',
+        'f(x**2*x, 2*3 + 4)',
+        '(a*b)**3/a**2',
+        '1 + 2',
+        'x',
+    ]
+)
+def test_fused_simplify(settings, strn):
+    ex = settings.parse(strn)
+
+    assert Fused(simplify)(ex) == simplify(ex)
+    assert Fused(simplify0)(ex) == simplify0(ex)
+
+
+def test_fused_stages():
+    a2h = AToH(bottomup=True)
+    h2k = HToK(bottomup=True)
+    b2c = BToC(bottomup=True)
+    impure = Impure(bottomup=True)
+    memo = MemoRule(b2c)
+    once = BToC()
+
+    stages = compile_stages([Rules(a2h, h2k), b2c, impure, memo, a2h, once])
+
+    assert stages == [(a2h, h2k, b2c), (impure,), (memo,), (a2h,), (once,)]
+
+
+def test_fused_stages_rules_with_flags():
+    inner = Rules(AToH(), bottomup=True)
+
+    assert compile_stages([inner]) == [(inner,)]
+
+
+def test_fused_output():
+    rules = [AToH(bottomup=True), HToK(bottomup=True), BToC(bottomup=True)]
+    out = expr
+    for rule in rules:
+        out = rule(out)
+
+    assert Fused(*rules)(expr) == out
+
+
+def test_fused_no_extra_rule_calls():
+    separate = [AToH(bottomup=True), HToK(bottomup=True)]
+    fused = [AToH(bottomup=True), HToK(bottomup=True)]
+    out = expr
+    for rule in separate:
+        out = rule(out)
+
+    assert Fused(*fused)(expr) == out
+    # An object met twice, such as the Symbol a, is looked up the second
+    # time.
+    for fused_rule, rule in zip(fused, separate):
+        assert 0 < fused_rule.count <= rule.count
+
+
+def test_fused_skips_absorbed_outputs():
+    # The L containers inside are taken apart by the next Absorb, BToC
+    # is not applied to them.
+    ex = Container('n', (Container('n', (Container('n', (sb, sb)), sb)), sb))
+    separate = [Absorb(bottomup=True), BToC(bottomup=True)]
+    fused = [Absorb(bottomup=True), BToC(bottomup=True)]
+    out = ex
+    for rule in separate:
+        out = rule(out)
+
+    assert Fused(*fused)(ex) == out
+    assert out == Container('L', (Symbol('c'),) * 4)
+    assert fused[1].count == separate[1].count
+
+
+def test_fused_keeps_unchanged():
+    rules = Fused(BToC(bottomup=True), HToK(bottomup=True))
+    ex = Container('f', (Container('g', (sa, sx)), n1))
+
+    assert rules(ex) is ex
+
+
+def test_fused_budget():
+    rules = [AToH(bottomup=True), HToK(bottomup=True), BToC(bottomup=True)]
+    out = expr
+    for rule in rules:
+        out = rule(out)
+
+    for rule in rules:
+        rule.count = 0
+    with Budget(visits=1000) as budget:
+        assert Fused(*rules)(expr) == out
+    # Every rule application is charged, and the Fused call itself.
+    assert budget.info().visits == sum([rule.count for rule in rules]) + 1
+
+    with Budget(visits=3) as budget:
+        Fused(*rules)(expr)
+    assert budget.exhausted == 'visits'
+
+
+def test_fused_barrier():
+    rule = Fused(AToH(bottomup=True), Impure(bottomup=True))
+
+    assert len(rule.stages) == 2
+    assert rule.pure is False
+    assert rule(Container('f', (sa,))) == Container(
+        'f', (Container('h', (Symbol('c'),)),)
+    )
+
+
+def test_fused_deep():
+    deep = sa
+    for _ in range(3000):
+        deep = Container('f', (deep, n1))
+    rules = [AToH(bottomup=True), HToK(bottomup=True)]
+    out = Fused(*rules)(deep)
+
+    for _ in range(3000):
+        out = out[0]
+    assert out == Container('k', (sb, sb))
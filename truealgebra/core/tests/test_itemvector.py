@@ -0,0 +1,146 @@
+from truealgebra.core.itemvector import ItemVector
+from truealgebra.core.expressions import Symbol, Number, Container, CommAssoc
+from truealgebra.core.rules import Rule
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.core.parse import Parse
+import pickle
+import pytest
+
+
+@pytest.fixture
+def settings():
+    settings = SettingsSingleton()
+    settings.reset()
+    yield settings
+    settings.reset()
+
+
+class NumberToX(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Number)
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+# Sizes around the edges of the tail and of the tree levels.
+sizes = [0, 1, 31, 32, 33, 64, 65, 1024, 1056, 1057, 33 * 1024, 33 * 1024 + 33]
+
+
+@pytest.mark.parametrize('size', sizes)
+def test_itemvector_init(size):
+    vector = ItemVector(range(size))
+
+    assert len(vector) == size
+    assert list(vector) == list(range(size))
+    assert vector == tuple(range(size))
+    assert tuple(range(size)) == vector
+
+
+@pytest.mark.parametrize('size', sizes)
+def test_itemvector_append(size):
+    vector = ItemVector()
+    for ndx in range(size):
+        vector = vector.append(ndx)
+
+    assert vector == ItemVector(range(size))
+    assert [vector[ndx] for ndx in range(size)] == list(range(size))
+    assert vector.append('a') == tuple(range(size)) + ('a',)
+
+
+@pytest.mark.parametrize('size', sizes[1:])
+def test_itemvector_set(size):
+    vector = ItemVector(range(size))
+    for ndx in (0, size // 2, size - 1, -1, -size):
+        new = vector.set(ndx, 'a')
+
+        assert new[ndx] == 'a'
+        assert vector[ndx] != 'a'
+        assert len(new) == size
+        assert sum([item == 'a' for item in new]) == 1
+
+
+def test_itemvector_getitem():
+    vector = ItemVector(range(100))
+
+    assert vector[-1] == 99
+    assert vector[2:5] == (2, 3, 4)
+    assert vector[::-30] == (99, 69, 39, 9)
+    assert vector.index(40) == 40
+    assert 70 in vector and 100 not in vector
+    assert list(reversed(vector)) == list(range(99, -1, -1))
+    with pytest.raises(IndexError):
+        vector[100]
+    with pytest.raises(IndexError):
+        vector[-101]
+    with pytest.raises(TypeError):
+        vector['a']
+
+
+def test_itemvector_add():
+    vector = ItemVector((1, 2))
+
+    assert vector + (3,) == (1, 2, 3)
+    assert isinstance(vector + (3,), ItemVector)
+    assert (0,) + vector == (0, 1, 2)
+    assert isinstance((0,) + vector, ItemVector)
+    assert vector + vector == (1, 2, 1, 2)
+    with pytest.raises(TypeError):
+        vector + [3]
+
+
+def test_itemvector_hash_pickle():
+    vector = ItemVector(range(50))
+
+    assert hash(vector) == hash(tuple(range(50)))
+    assert pickle.loads(pickle.dumps(vector)) == vector
+
+
+def test_container_keeps_itemvector(settings):
+    items = ItemVector([Number(k) for k in range(100)])
+    expr = Container('f', items)
+    ca = CommAssoc('+', items)
+
+    assert expr.items is items
+    assert expr == Container('f', tuple(items))
+    assert hash(expr) == hash(Container('f', tuple(items)))
+    assert ca == CommAssoc('+', tuple(reversed(items)))
+    assert expr[-1] == Number(99)
+
+
+def test_vector_min(settings):
+    settings.vector_min = 3
+
+    assert type(Container('f', (Symbol('a'), Symbol('b'))).items) is tuple
+    assert type(Container('f', [Symbol('a')] * 3).items) is ItemVector
+
+
+def test_itemvector_apply2path(settings):
+    settings.vector_min = 1
+    expr = Container('f', [Number(k) for k in range(2000)])
+    out = expr.apply2path((1500,), NumberToX())
+
+    assert type(out.items) is ItemVector
+    assert out[1500] == Symbol('x')
+    assert out[1499] is expr[1499]
+    assert out == Container(
+        'f', expr.items[:1500] + (Symbol('x'),) + expr.items[1501:]
+    )
+
+
+def test_itemvector_bottomup(settings):
+    settings.vector_min = 1
+    expr = Container('f', [Number(k) for k in range(2000)])
+    out = expr.bottomup(NumberToX())
+
+    assert type(out.items) is ItemVector
+    assert out == Container('f', (Symbol('x'),) * 2000)
+
+
+def test_itemvector_parse(settings):
+    settings.vector_min = 10
+    settings.parse = Parse()
+    expr = settings.parse('f(' + ', '.join(['a'] * 50) + ')')
+
+    assert type(expr.items) is ItemVector
+    assert expr == Container('f', (Symbol('a'),) * 50)
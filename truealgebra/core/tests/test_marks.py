@@ -0,0 +1,224 @@
+from truealgebra.core.marks import (
+    mark, is_marked, new_token, forget_marks, _MAXMARKS
+)
+from truealgebra.core.budget import Budget
+from truealgebra.core.expressions import Symbol, Number, Container
+from truealgebra.core.rules import Rule, Fixpoint, donothing_rule
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.common.commonsettings import commonsettings
+from truealgebra.common.setup_func import common_setup_func
+from truealgebra.common.simplify import simplify
+from truealgebra.std.setup_func import std_setup_func
+from truealgebra.std.evalnum import evalnumbu
+import pytest
+
+
+@pytest.fixture
+def settings():
+    settings = SettingsSingleton()
+    settings.reset()
+    commonsettings.reset()
+    std_setup_func()
+    common_setup_func()
+
+    yield settings
+
+    settings.reset()
+    commonsettings.reset()
+
+
+class CountRule(Rule):
+    """ Rule that counts the expressions it is tried on. """
+    pure = True
+
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def tpredicate(self, expr):
+        self.count += 1
+        return super().tpredicate(expr)
+
+
+class AToB(CountRule):
+    def predicate(self, expr):
+        return expr == Symbol('a')
+
+    def body(self, expr):
+        return Symbol('b')
+
+
+class Wrap(CountRule):
+    """ g(u) -> h(u), the output is a fixpoint. """
+    def predicate(self, expr):
+        return isinstance(expr, Container) and expr.name == 'g'
+
+    def body(self, expr):
+        return Container('h', expr.items)
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+sx = Symbol('x')
+n1 = Number(1)
+
+
+def make_expr():
+    return Container('f', (
+        Container('g', (sx, n1)),
+        Container('k', (sa, sx)),
+    ))
+
+
+def test_mark():
+    token = new_token()
+    ex = Container('f', (sx,))
+
+    assert not is_marked(ex, token)
+    mark(ex, token)
+    assert is_marked(ex, token)
+    assert not is_marked(ex, new_token())
+    mark(sx, token)
+    assert not is_marked(sx, token)
+
+
+def test_mark_maxmarks():
+    ex = Container('f', (sx,))
+    tokens = [new_token() for _ in range(_MAXMARKS + 1)]
+    for token in tokens:
+        mark(ex, token)
+
+    assert not is_marked(ex, tokens[0])
+    assert all(is_marked(ex, token) for token in tokens[1:])
+
+
+def test_bottomup_marks_unchanged():
+    rule = AToB(bottomup=True, marks=True)
+    ex = make_expr()
+    out = rule(ex)
+
+    assert is_marked(out[0], rule.token)
+    assert not is_marked(out[1], rule.token)
+    assert not is_marked(out, rule.token)
+
+    rule.count = 0
+    edited = Container('f', (out[0], out[1], sa))
+    assert rule(edited) == Container('f', (out[0], out[1], sb))
+    # f(...), k(b, x), b, x and b are tried, g(x, 1) is skipped.
+    assert rule.count == 5
+
+
+def test_bottomup_marked_expression():
+    rule = AToB(bottomup=True, marks=True)
+    out = rule(make_expr())
+    out = rule(out)
+    rule.count = 0
+
+    assert rule(out) is out
+    assert rule.count == 0
+
+
+def test_idempotent_marks_outputs():
+    rule = Wrap(bottomup=True, marks=True, idempotent=True)
+    out = rule(make_expr())
+
+    assert is_marked(out[0], rule.token)
+    assert is_marked(out, rule.token)
+    rule.count = 0
+    assert rule(out) is out
+    assert rule.count == 0
+
+
+def test_rule_marks():
+    rule = AToB(marks=True)
+    ex = make_expr()
+
+    assert rule(ex) is ex
+    assert rule.count == 1
+    assert rule(ex) is ex
+    assert rule.count == 1
+
+
+def test_no_marks():
+    rule = AToB(bottomup=True)
+    out = rule(make_expr())
+
+    assert not getattr(out[0], '_marks', ())
+
+
+def test_impure_rule_no_marks():
+    rule = AToB(bottomup=True, marks=True)
+    rule.pure = False
+    out = rule(make_expr())
+
+    assert not is_marked(out[0], rule.token)
+
+
+def test_renew_token():
+    rule = AToB(bottomup=True, marks=True)
+    out = rule(make_expr())
+    token = rule.token
+    rule.renew_token()
+
+    assert rule.token != token
+    assert not is_marked(out[0], rule.token)
+
+
+def test_forget_marks():
+    rule = AToB(marks=True)
+    ex = make_expr()
+    rule(ex)
+    token = rule.token
+    forget_marks()
+
+    assert rule.token != token
+    assert not is_marked(ex, rule.token)
+
+
+def test_budget_no_marks():
+    rule = AToB(bottomup=True, marks=True)
+    with Budget(visits=1):
+        out = rule(make_expr())
+
+    assert not is_marked(out[0], rule.token)
+
+
+def test_fixpoint_marks():
+    rule = Fixpoint(AToB(bottomup=True), marks=True)
+    out = rule(make_expr())
+
+    assert is_marked(out, rule.token)
+    assert rule(out) is out
+
+
+def test_simplify_marks(settings):
+    ex = settings.parse('x*2 + 3*x + f(y, y*y)')
+    out = simplify(ex)
+
+    assert is_marked(out, simplify.token)
+    assert simplify(out) is out
+
+
+def test_evalnumbu_marks(settings):
+    ex = settings.parse('f(2*3, x + 1 + 2) + g(4/2)')
+    out = evalnumbu(ex)
+    edited = Container('h', (out, settings.parse('1 + 2')))
+
+    assert evalnumbu(edited) == settings.parse('h(f(6, x + 3) + g(2), 3)')
+    assert evalnumbu(out) is out
+
+
+def test_settings_assignment_forgets_marks(settings):
+    ex = settings.parse('2 + 3 + x + x')
+    out = simplify(ex)
+    token = simplify.token
+
+    commonsettings.evalnum = donothing_rule
+    assert simplify.token != token
+    assert simplify(out) is not out
+
+    std_setup_func()
+    token = simplify.token
+    assert simplify(ex) == out
+    std_setup_func()
+    assert simplify.token != token
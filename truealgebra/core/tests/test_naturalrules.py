@@ -11,8 +11,10 @@ from truealgebra.core.parse import Parse
 from truealgebra.core.settings import SettingsSingleton
 from truealgebra.core import setsettings
 from truealgebra.core.naturalrules import(
-    TrueThingNR, TrueThingHNR, NaturalRuleBase, NaturalRule, HalfNaturalRule
+    TrueThingNR, TrueThingHNR, NaturalRuleBase, NaturalRule, HalfNaturalRule,
+    pattern_signature
 )
+from truealgebra.core.rules import dispatch_key, JustOne, no_rewrite
 import types
 import pytest
 
@@ -467,3 +469,112 @@ def test_hnr_tbody_error(settings, halfnaturalrule1, capsys):
     output = capsys.readouterr()
 
     assert 'HalfNaturalRule body method requires three arguments' in output.out
+
+
+# ======================
+# Test pattern signature
+# ======================
+@pytest.mark.parametrize(
+    'pattern, admitted, rejected',
+    [
+        (Co('f', (Sy('x'),)), Co('f', (Sy('y'),)), Co('f', ())),
+        (Co('f', (Sy('x'),)), Co('f', (Sy('y'),)), Co('g', (Sy('x'),))),
+        (CA('*', (Sy('x'),)), CA('*', (Sy('y'), Sy('z'))), Co('*', ())),
+        (Sy('a'), Sy('a'), Sy('b')),
+        (Nu(1), Nu(2), Sy('x')),
+    ]
+)
+def test_pattern_signature(pattern, admitted, rejected):
+    signature = pattern_signature(pattern, {Sy('x'): true})
+
+    assert signature.admits(dispatch_key(admitted))
+    assert not signature.admits(dispatch_key(rejected))
+
+
+def test_pattern_signature_variable():
+    assert pattern_signature(Sy('x'), {Sy('x'): true}) is None
+
+
+def test_naturalrule_signature():
+    class Calls(NaturalRule):
+        calls = 0
+
+        def tpredicate(self, expr):
+            Calls.calls += 1
+            return super().tpredicate(expr)
+
+    rule = NaturalRule(
+        pattern=Co('f', (Sy('x'),)), vardict={Sy('x'): true}, outcome=Nu(0)
+    )
+    rule1 = Calls(pattern=Co('g', ()), outcome=Nu(1))
+
+    assert rule.signature.names == frozenset(['f'])
+    assert rule1.signature is None
+    # rule1 overrides tpredicate, it has no signature and is always tried.
+    assert JustOne(rule, rule1)(Co('f', (Sy('y'),))) == Nu(0)
+    assert JustOne(rule, rule1)(Co('h', ())) == Co('h', ())
+    assert Calls.calls == 1
+
+
+
+# ============
+# Test rewrite
+# ============
+def test_naturalrule_rewrite(settings):
+    rule = NaturalRule(
+        predicate_rule=predrule,
+        pattern=' f(n, x) ',
+        vardict=' forall(suchthat(n, isint(n)), x) ',
+        outcome=' g(x, n) ',
+    )
+    expr = settings.parse(' f(2, a) ')
+
+    assert rule.rewrite(expr) == settings.parse(' g(a, 2) ')
+    assert rule.rewrite(expr) == rule.tbody(rule.tpredicate(expr))
+    assert rule.rewrite(settings.parse(' f(2.0, a) ')) is no_rewrite
+    assert rule(settings.parse(' f(2.0, a) ')) == settings.parse(' f(2.0, a) ')
+
+
+def test_naturalrule_subdicts_not_shared(settings):
+    rule = NaturalRule(
+        pattern=' f(x, y) ', vardict=' forall(x, y) ', outcome=' g(x) '
+    )
+    truething0 = rule.tpredicate(settings.parse(' f(a, b) '))
+    assert not rule.tpredicate(settings.parse(' f(a) '))
+    truething1 = rule.tpredicate(settings.parse(' f(c, d) '))
+
+    assert truething0.subdict == {Sy('x'): Sy('a'), Sy('y'): Sy('b')}
+    assert truething1.subdict == {Sy('x'): Sy('c'), Sy('y'): Sy('d')}
+    assert rule.tbody(truething0) == settings.parse(' g(a) ')
+
+
+def test_naturalrule_rewrite_reentrant(settings):
+    # The outcome_rule applies the rule again, while the outer call is
+    # under way.
+    rule = NaturalRule(
+        pattern=' f(x) ', vardict=' forall(x) ', outcome=' x ', bottomup=True
+    )
+    rule.outcome_rule = rule
+
+    assert rule(settings.parse(' f(f(f(a))) ')) == Sy('a')
+
+
+def test_naturalrule_subclass_tbody(settings):
+    class Outcome(NaturalRule):
+        def tbody(self, truething):
+            return Nu(len(truething.subdict))
+
+    rule = Outcome(pattern=' f(x, y) ', vardict=' forall(x, y) ')
+
+    assert rule(settings.parse(' f(a, b) ')) == Nu(2)
+
+
+def test_hnr_rewrite(settings, halfnaturalrule0, halfnaturalrule1, capsys):
+    expr0 = settings.parse(' y ++ (3.0 ** 2) ')
+
+    assert halfnaturalrule0.rewrite(expr0) == Co('++', (Sy('y'), Nu(9.0)))
+    assert halfnaturalrule0.rewrite(
+        settings.parse(' y ++ (4 ** a) ')
+    ) is no_rewrite
+    assert halfnaturalrule1.rewrite(expr0) is null
+    assert 'requires three arguments' in capsys.readouterr().out
@@ -1,3 +1,5 @@
+import pytest
+
 from truealgebra.core.parse import Parse
 
 
@@ -19,3 +21,22 @@ def test_next_char(conftest_settings):
     assert b == 'b'
     assert c == 'c'
     assert end == 'end'
+
+
+def test_parse_error_releases_tokens(conftest_settings):
+    from truealgebra.core.expressions import _binding_powers
+
+    parse = Parse()
+    seen = list()
+
+    def three_parse(left, mid, delims):
+        seen.extend(parse.tokens)
+        raise RuntimeError('parse failed')
+
+    parse.three_parse = three_parse
+    with pytest.raises(RuntimeError):
+        parse('a + b')
+
+    assert seen
+    assert parse.tokens == []
+    assert not any(id(token) in _binding_powers for token in seen)
@@ -1,5 +1,8 @@
-from truealgebra.core.expressions import Symbol, Number, Container, null
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, Assign, Restricted, null, path_trie
+)
 from truealgebra.core.rules import Rule
+import pytest
 
 
 class PathRule(Rule):
@@ -94,3 +97,118 @@ def test_path():
     assert type_err_rule(expr2) == expr6
     assert index_err_rule(expr2) == expr6
     assert long_err_rule(expr2) == expr8
+
+
+# ==========
+# Test paths
+# ==========
+class WrapRule(Rule):
+    """ Wrap any expression in X(...). """
+    def predicate(self, expr):
+        return True
+    def body(self, expr):
+        return Container('X', (expr,))
+
+
+class CountRebuild(Container):
+    """ Count the calls of _rebuild. """
+    count = 0
+    def _rebuild(self, items):
+        CountRebuild.count += 1
+        return super()._rebuild(items)
+
+
+def wrap(expr):
+    return Container('X', (expr,))
+
+
+gab = Container('g', (sym_a, Symbol('b')))
+paths_expr = Container('f', (
+    gab,
+    Symbol('c'),
+    Assign(':=', (sym_a, num_5)),
+    Restricted('`', (sym_a, num_5)),
+))
+
+
+def test_path_trie():
+    assert path_trie([(0, 1), (0,), (0, 1), (2,)]) == {
+        0: {1: {None: True}, None: True},
+        2: {None: True},
+    }
+
+
+@pytest.mark.parametrize(
+    'paths',
+    [
+        [(0, 0), (0, 1), (1,), (2, 1)],
+        [(0, 1), (2, 1), (0, 0), (1,)],
+        [(0, 0), (0, -1), (-3,), (2, 1), (0, 1)],
+    ]
+)
+def test_apply2paths_same_as_apply2path(paths):
+    rule = WrapRule()
+    out = paths_expr
+    for path in set([(0, 0), (0, 1), (1,), (2, 1)]):
+        out = out.apply2path(path, rule)
+
+    assert paths_expr.apply2paths(paths, rule) == out
+    assert WrapRule(paths=paths)(paths_expr) == out
+
+
+def test_apply2paths_nested_targets():
+    out = paths_expr.apply2paths([(), (0,), (0, 0)], WrapRule())
+
+    assert out == wrap(paths_expr.apply2path((0,), WrapRule()).apply2path(
+        (0, 0, 0), WrapRule()
+    ))
+    assert out[0][0][0][0] == wrap(sym_a)
+
+
+def test_apply2paths_rebuild_once():
+    CountRebuild.count = 0
+    expr = CountRebuild('f', tuple([Number(k) for k in range(500)]))
+    out = Number7Rule(paths=[(k,) for k in range(500)])(expr)
+
+    assert out == CountRebuild('f', (num_7,) * 500)
+    assert CountRebuild.count == 1
+
+
+def test_apply2paths_unchanged():
+    assert paths_expr.apply2paths([(0, 0), (1,)], Number7Rule()) is paths_expr
+
+
+@pytest.mark.parametrize(
+    'paths, correct',
+    [
+        ([(2, 0), (0,)], Container('f', (
+            wrap(gab), Symbol('c'), null, paths_expr[3]
+        ))),
+        ([(3, 0), (0,)], Container('f', (
+            wrap(gab), Symbol('c'), paths_expr[2], null
+        ))),
+        ([(1, 0), (0,)], Container('f', (
+            wrap(gab), null, paths_expr[2], paths_expr[3]
+        ))),
+        ([(7,), (0,)], null),
+        ([('one',)], null),
+    ]
+)
+def test_apply2paths_errors(paths, correct, capsys):
+    out = paths_expr.apply2paths(paths, WrapRule())
+    capsys.readouterr()
+
+    assert out == correct
+
+
+def test_apply2paths_deep():
+    expr = sym_a
+    for _ in range(3000):
+        expr = Container('f', (expr, num_5))
+    paths = [(0,) * depth + (1,) for depth in range(3000)]
+    out = Number7Rule(paths=paths)(expr)
+
+    correct = sym_a
+    for _ in range(3000):
+        correct = Container('f', (correct, num_7))
+    assert out == correct
@@ -0,0 +1,147 @@
+from truealgebra.core.positions import PositionIndex
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, Assign, Restricted, true
+)
+from truealgebra.core.naturalrules import NaturalRule
+from truealgebra.core.rules import Rule
+import pytest
+
+
+class CountNR(NaturalRule):
+    """ NaturalRule that counts the calls of tpredicate. """
+    count = 0
+
+    def tpredicate(self, expr):
+        CountNR.count += 1
+        return super().tpredicate(expr)
+
+
+class IsNumber(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Number)
+
+    def body(self, expr):
+        return Number(7)
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+su = Symbol('u')
+sx = Symbol('x')
+n1 = Number(1)
+
+dx = Container('D', (sx,))
+sinx = Container('sin', (sx,))
+expr = Container('f', (
+    Container('+', (dx, Container('D', (sa,)))),
+    Container('g', (sinx, n1)),
+    Assign(':=', (sx, sinx)),
+    Restricted('`', (sx, sb)),
+))
+
+
+@pytest.fixture
+def index():
+    return PositionIndex(expr)
+
+
+def test_positions_preorder(index):
+    assert len(index) == 14
+    assert index.exprs[0] is expr
+    assert index.paths(range(4)) == [(), (0,), (0, 0), (0, 0, 0)]
+
+
+@pytest.mark.parametrize(
+    'name, correct',
+    [
+        ('D', [(0, 0), (0, 1)]),
+        ('sin', [(1, 0), (2, 1)]),
+        (':=', [(2,)]),
+        ('`', [(3,)]),
+        ('h', []),
+    ]
+)
+def test_head_paths(index, name, correct):
+    assert index.head_paths(name) == correct
+
+
+def test_symbol_paths(index):
+    # item 0 of Assign and the items of Restricted are not indexed
+    assert index.symbol_paths(sx) == [(0, 0, 0), (1, 0, 0), (2, 1, 0)]
+    assert index.symbol_paths(sb) == []
+
+
+def test_find(index):
+    assert index.find(sinx) == [(1, 0), (2, 1)]
+    assert index.find(n1) == [(1, 1)]
+    assert index.find(Number(2)) == []
+
+
+def test_paths_reach_exprs(index):
+    for pos, sub in enumerate(index.exprs):
+        node = expr
+        for ndx in index.path(pos):
+            node = node[ndx]
+        assert node is sub
+
+
+def test_match_paths():
+    rule = CountNR(
+        pattern=Container('D', (su,)),
+        vardict={su: true},
+        outcome=Number(0),
+    )
+    index = PositionIndex(expr)
+    CountNR.count = 0
+
+    assert index.match_paths(rule) == [(0, 0), (0, 1)]
+    assert CountNR.count == 2
+    assert index.apply2matches(rule) == Container('f', (
+        Container('+', (Number(0), Number(0))),
+        expr[1],
+        expr[2],
+        expr[3],
+    ))
+
+
+def test_match_paths_skips_without_symbol():
+    # D(a) does not hold x, the predicate is not tried there.
+    rule = CountNR(pattern=dx, outcome=sa)
+    index = PositionIndex(expr)
+    CountNR.count = 0
+
+    assert index.match_paths(rule) == [(0, 0)]
+    assert CountNR.count == 1
+
+
+def test_match_paths_variable_pattern(index):
+    rule = NaturalRule(pattern=su, vardict={su: true})
+
+    assert index.match_paths(rule) == index.paths(range(len(index)))
+
+
+def test_match_paths_symbol_pattern():
+    rule = CountNR(pattern=sx, outcome=sa)
+    index = PositionIndex(expr)
+    CountNR.count = 0
+
+    assert index.match_paths(rule) == index.symbol_paths(sx)
+    # D(a), a and 1 do not hold x and are skipped.
+    assert CountNR.count == len(index) - 3
+
+
+def test_match_paths_rule_without_pattern(index):
+    assert index.match_paths(IsNumber()) == [(1, 1)]
+    assert index.apply2paths([(1, 1)], IsNumber())[1][1] == Number(7)
+
+
+def test_positions_deep():
+    deep = sa
+    for _ in range(3000):
+        deep = Container('f', (deep, n1))
+    index = PositionIndex(deep)
+
+    assert len(index) == 6001
+    assert index.symbol_paths(sa) == [(0,) * 3000]
+    assert len(index.find(n1)) == 3000
+    assert index.head_paths('f')[-1] == (0,) * 2999
@@ -1,8 +1,11 @@
 from truealgebra.core.rules import (
     RuleBase, TrueThing, Rule, donothing_rule, Substitute, Rules, RulesBU,
-    JustOne, JustOneBU, RecursiveParent, RecursiveChild, TrueThingJO
+    JustOne, JustOneBU, RecursiveParent, RecursiveChild, TrueThingJO,
+    MemoRule, MemoCache, MemoInfo, Fixpoint, FixpointBU, FixpointReport,
+    Signature, dispatch_key, substitute, no_rewrite
 )
 from truealgebra.core.expressions import ExprBase
+from truealgebra.core.marks import forget_marks
 from truealgebra.core.abbrv import Co, Sy, Nu, isSy
 import pytest
 
@@ -428,3 +431,512 @@ def test_recursiveparent_body(parent):
 
 def test_recursiveparent_predicate(parent):
     assert parent.predicate(Sy('whatever')) == True
+
+
+# =========
+# Test pure
+# =========
+def test_pure():
+    class NotPure(Rule):
+        pure = False
+
+    assert Rule().pure is False
+    assert donothing_rule.pure is True
+    assert toz.pure is True
+    assert Rules(toz, ztow).pure is True
+    assert Rules(toz, NotPure()).pure is False
+    assert JustOne(toz, JustOne(NotPure())).pure is False
+    assert XToY(dag=True).dag is True
+    assert xtoy.dag is False
+
+
+# ==================================
+# Test heads and symbols declaration
+# ==================================
+def test_substitute_declaration():
+    rule = Substitute(subdict={Sy('x'): Nu(1), Co('f', (Sy('y'),)): Nu(2)})
+
+    assert rule.heads == frozenset(['f'])
+    assert rule.symbols == frozenset([Sy('x')])
+
+
+def test_rules_declaration():
+    subst = Substitute(subdict={Sy('x'): Nu(1)})
+    fsubst = Substitute(subdict={Co('f', ()): Nu(1)})
+
+    assert Rules(subst, fsubst).heads == frozenset(['f'])
+    assert JustOne(subst, fsubst).symbols == frozenset([Sy('x')])
+    assert Rules(subst, xtoy).heads is None
+    assert xtoy.symbols is None
+
+
+def test_substitute_bottomup_pruned():
+    expr = Co('g', (Co('h', (Sy('a'),)), Co('f', (Sy('x'),))))
+    out = Substitute(subdict={Sy('x'): Nu(1)}, bottomup=True)(expr)
+
+    assert out == Co('g', (Co('h', (Sy('a'),)), Co('f', (Nu(1),))))
+    assert out[0] is expr[0]
+
+
+# ==============
+# Test MemoRule
+# ==============
+class CountXToOne(Rule):
+    """ Replace x with 1, count the calls of body. """
+    pure = True
+
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def predicate(self, expr):
+        return expr == Sy('x')
+
+    def body(self, expr):
+        self.count += 1
+        return Nu(1)
+
+
+def fx():
+    return Co('f', (Sy('x'), Co('g', (Sy('x'), Sy('a')))))
+
+
+def test_memorule():
+    rule = CountXToOne(bottomup=True)
+    memo = MemoRule(rule)
+    out0 = memo(fx())
+    out1 = memo(fx())
+
+    assert out0 == Co('f', (Nu(1), Co('g', (Nu(1), Sy('a')))))
+    assert out1 is out0
+    assert rule.count == 2
+    assert memo.info() == MemoInfo(1, 1, 0, 1024, 1)
+
+
+def test_memorule_bottomup():
+    rule = CountXToOne()
+    memo = MemoRule(rule, bottomup=True)
+    out = memo(fx())
+
+    assert out == Co('f', (Nu(1), Co('g', (Nu(1), Sy('a')))))
+    assert rule.count == 1
+    assert memo.info().hits == 1
+
+
+def test_memorule_unchanged():
+    memo = MemoRule(CountXToOne(bottomup=True))
+    expr0 = Co('f', (Sy('a'),))
+    expr1 = Co('f', (Sy('a'),))
+
+    assert memo(expr0) is expr0
+    assert memo(expr1) is expr1
+    assert memo.info().hits == 1
+
+
+def test_memorule_number_types():
+    memo = MemoRule(Substitute(subdict={Nu(1): Sy('one')}))
+
+    assert memo(Nu(1)) == Sy('one')
+    assert memo(Nu(1.0)) == Sy('one')
+    assert memo.info().hits == 0
+
+
+def test_memorule_lru():
+    memo = MemoRule(CountXToOne(), maxsize=2)
+    memo(Sy('a'))
+    memo(Sy('b'))
+    memo(Sy('a'))
+    memo(Sy('c'))
+
+    assert memo.info() == MemoInfo(1, 3, 1, 2, 2)
+    memo(Sy('a'))
+    memo(Sy('b'))
+    assert memo.info() == MemoInfo(2, 4, 2, 2, 2)
+
+
+def test_memorule_shared_cache():
+    cache = MemoCache(maxsize=None)
+    memo0 = MemoRule(CountXToOne(), cache=cache)
+    memo1 = MemoRule(Substitute(subdict={Sy('x'): Sy('y')}), cache=cache)
+
+    assert memo0(Sy('x')) == Nu(1)
+    assert memo1(Sy('x')) == Sy('y')
+    assert len(cache) == 2
+    cache.clear()
+    assert cache.info() == MemoInfo(0, 0, 0, None, 0)
+
+
+def test_memorule_generation():
+    rule = CountXToOne(bottomup=True)
+    memo = MemoRule(rule)
+    memo(fx())
+    forget_marks()
+    memo(fx())
+
+    assert rule.count == 4
+    assert memo.info().hits == 0
+
+
+def test_memorule_not_pure(capsys):
+    class NotPure(CountXToOne):
+        pure = False
+
+    rule = NotPure()
+    memo = MemoRule(rule)
+    output = capsys.readouterr()
+    memo(Sy('x'))
+    memo(Sy('x'))
+
+    assert 'not pure' in output.out
+    assert rule.count == 2
+    assert len(memo.cache) == 0
+    assert memo.pure is False
+
+
+# =============
+# Test Fixpoint
+# =============
+class CountDown(Rule):
+    """ f(n) -> f(n - 1) for n > 0 """
+    def predicate(self, expr):
+        return (
+            isinstance(expr, Co) and expr.name == 'f'
+            and isinstance(expr[0], Nu) and expr[0].value > 0
+        )
+
+    def body(self, expr):
+        return Co('f', (Nu(expr[0].value - 1),))
+
+
+class CountUp(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Co) and expr.name == 'f'
+
+    def body(self, expr):
+        return Co('f', (Nu(expr[0].value + 1),))
+
+
+class Flip(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Co) and expr.name == '='
+
+    def body(self, expr):
+        return Co('=', (expr[1], expr[0]))
+
+
+class Rebuild(Rule):
+    """ Return a new expression equal to the input. """
+    def predicate(self, expr):
+        return isinstance(expr, Co)
+
+    def body(self, expr):
+        return Co(expr.name, expr.items)
+
+
+def test_fixpoint_normal():
+    countdown = CountDown()
+    rule = Fixpoint(countdown, donothing_rule)
+
+    assert rule(Co('f', (Nu(3),))) == Co('f', (Nu(0),))
+    assert rule.report == FixpointReport(
+        4, ((countdown,),) * 3 + ((),), 'normal'
+    )
+
+
+def test_fixpoint_equal_rebuild():
+    rebuild = Rebuild()
+    rule = Fixpoint(rebuild)
+
+    assert rule(Co('f', (Sy('a'),))) == Co('f', (Sy('a'),))
+    assert rule.report == FixpointReport(1, ((rebuild,),), 'normal')
+
+
+def test_fixpoint_cycle(capsys):
+    rule = Fixpoint(Flip())
+    expr = Co('=', (Sy('a'), Sy('b')))
+    out = rule(expr)
+    output = capsys.readouterr()
+
+    assert out == expr
+    assert rule.report.passes == 2
+    assert rule.report.status == 'cycle'
+    assert 'Fixpoint rules cycle' in output.out
+
+
+def test_fixpoint_limit(capsys):
+    rule = Fixpoint(CountUp(), maxpasses=5)
+    out = rule(Co('f', (Nu(0),)))
+    output = capsys.readouterr()
+
+    assert out == Co('f', (Nu(5),))
+    assert rule.report.status == 'limit'
+    assert rule.report.passes == 5
+    assert 'maxpasses' in output.out
+
+
+def test_fixpoint_memory(capsys):
+    # A cycle longer than memory is only stopped by maxpasses.
+    class Rotate(Rule):
+        def predicate(self, expr):
+            return isinstance(expr, Nu)
+
+        def body(self, expr):
+            return Nu((expr.value + 1) % 4)
+
+    assert Fixpoint(Rotate(), memory=2, maxpasses=9)(Nu(0)) == Nu(1)
+    rule = Fixpoint(Rotate(), memory=3)
+
+    assert rule(Nu(0)) == Nu(0)
+    assert rule.report == FixpointReport(
+        4, ((rule.rule_list[0],),) * 4, 'cycle'
+    )
+    capsys.readouterr()
+
+
+def test_fixpointbu():
+    rule = FixpointBU(CountDown())
+    expr = Co('g', (Co('f', (Nu(2),)), Co('f', (Nu(1),))))
+
+    assert rule(expr) == Co('g', (Co('f', (Nu(0),)), Co('f', (Nu(0),))))
+
+
+def test_fixpoint_deep():
+    class Step(Rule):
+        """ a -> b -> c """
+        def predicate(self, expr):
+            return expr in (Sy('a'), Sy('b'))
+
+        def body(self, expr):
+            return Sy('b') if expr == Sy('a') else Sy('c')
+
+    def chain(base):
+        for ndx in range(5000):
+            base = Co('**', (base, Nu(ndx)))
+        return base
+
+    rule = Fixpoint(Step(bottomup=True))
+
+    assert rule(chain(Sy('a'))) == chain(Sy('c'))
+    assert rule.report.status == 'normal'
+    assert rule.report.passes == 3
+
+
+# =========================
+# Test JustOne dispatch
+# =========================
+class HeadRule(Rule):
+    """ Replace any name(...) with its name, count predicate calls. """
+    def __init__(self, name, arity=None, **kwargs):
+        self.name = name
+        self.calls = 0
+        arities = None if arity is None else (arity,)
+        self.signature = Signature(types=(Co,), names=(name,), arities=arities)
+        super().__init__(**kwargs)
+
+    def predicate(self, expr):
+        self.calls += 1
+        return isinstance(expr, Co) and expr.name == self.name
+
+    def body(self, expr):
+        return Sy(self.name)
+
+
+class AnyRule(Rule):
+    def __init__(self, **kwargs):
+        self.calls = 0
+        super().__init__(**kwargs)
+
+    def predicate(self, expr):
+        self.calls += 1
+        return isinstance(expr, Co) and len(expr) == 2
+
+    def body(self, expr):
+        return Sy('any')
+
+
+@pytest.mark.parametrize(
+    'signature, expr, correct',
+    [
+        (Signature(), Sy('x'), True),
+        (Signature(types=(Co,)), Co('f', ()), True),
+        (Signature(types=(Co,)), Sy('f'), False),
+        (Signature(names=('f',)), Sy('f'), True),
+        (Signature(names=('f',), arities=(1,)), Co('f', (Sy('x'),)), True),
+        (Signature(names=('f',), arities=(1,)), Co('f', ()), False),
+        (Signature(arities=(None,)), Nu(1), True),
+    ]
+)
+def test_signature_admits(signature, expr, correct):
+    assert signature.admits(dispatch_key(expr)) is correct
+
+
+def test_justone_dispatch():
+    f = HeadRule('f')
+    g = HeadRule('g', arity=1)
+    rule = JustOne(f, JustOne(HeadRule('h'), g))
+
+    assert rule(Co('g', (Sy('x'),))) == Sy('g')
+    assert rule(Co('g', (Sy('x'), Sy('y')))) == Co('g', (Sy('x'), Sy('y')))
+    assert rule(Sy('f')) == Sy('f')
+    assert f.calls == 0
+    assert g.calls == 1
+
+
+def test_justone_dispatch_order():
+    any0 = AnyRule()
+    f = HeadRule('f')
+    rule = JustOneBU(f, any0)
+    expr = Co('k', (Co('f', (Sy('x'), Sy('y'))), Co('g', (Sy('x'), Sy('y')))))
+
+    assert rule(expr) == Sy('any')
+    assert rule(Co('f', (Sy('x'), Sy('y')))) == Sy('f')
+    assert JustOne(any0, f)(Co('f', (Sy('x'), Sy('y')))) == Sy('any')
+
+
+def test_justone_dispatch_nested_truething():
+    h = HeadRule('h')
+    rule = JustOne(HeadRule('f'), JustOne(HeadRule('g'), JustOne(h)))
+    out = rule.tpredicate(Co('h', ()))
+
+    assert out.ndx == 1
+    assert out.selected_truething.ndx == 1
+    assert out.selected_truething.selected_truething.ndx == 0
+    assert rule.tbody(out) == Sy('h')
+
+
+def test_justone_recompile():
+    rule = JustOne(HeadRule('f'))
+    assert rule(Co('g', ())) == Co('g', ())
+    head = HeadRule('g')
+    head.signature = Signature(names=('h',))
+    rule.rule_list = rule.rule_list + (head,)
+    assert rule(Co('g', ())) == Co('g', ())
+    head.signature = None
+    assert rule(Co('g', ())) == Co('g', ())
+    rule.recompile()
+    assert rule(Co('g', ())) == Sy('g')
+
+
+def test_justone_rule_list_assigned():
+    inner = JustOne(HeadRule('f'))
+    rule = JustOne(HeadRule('k'), inner)
+    assert rule(Co('g', ())) == Co('g', ())
+    inner.rule_list = [HeadRule('g')]
+
+    assert isinstance(inner.rule_list, tuple)
+    assert rule(Co('g', ())) == Sy('g')
+    assert rule(Co('f', ())) == Co('f', ())
+
+
+def test_justone_dispatch_bounded():
+    rule = JustOne(HeadRule('f', 1), HeadRule('g'))
+    for ndx in range(100):
+        assert rule(Sy('s{}'.format(ndx))) == Sy('s{}'.format(ndx))
+        assert rule(Co('h{}'.format(ndx), (Sy('x'),) * ndx)) is not None
+    assert rule(Co('f', (Sy('x'),))) == Sy('f')
+    assert rule(Co('f', ())) == Co('f', ())
+    assert rule(Co('g', (Sy('x'),) * 5)) == Sy('g')
+
+    assert len(rule._dispatch[-1]) <= 8
+
+
+
+# ============
+# Test rewrite
+# ============
+class TPredRule(HeadRule):
+    """ Overrides tpredicate, its TrueThing carries the output. """
+    def tpredicate(self, expr):
+        if self.predicate(expr):
+            return TrueThing(Sy('t' + self.name))
+        return False
+
+    def tbody(self, truething):
+        return truething.expr
+
+
+class TBodyRule(HeadRule):
+    """ Overrides tbody only. """
+    def tbody(self, truething):
+        return Sy('b' + self.name)
+
+
+class TPredOnlyRule(HeadRule):
+    """ Overrides tpredicate only, also true for name2(...). """
+    def tpredicate(self, expr):
+        if isinstance(expr, Co) and expr.name == self.name + '2':
+            return TrueThing(expr)
+        return super().tpredicate(expr)
+
+
+class NoneRule(HeadRule):
+    """ Overrides tbody only, its output is None. """
+    def tbody(self, truething):
+        return None
+
+
+def test_rewrite_flags():
+    assert Rule._rewrites
+    assert Rules._rewrites
+    assert JustOne._rewrites
+    assert not TPredRule._rewrites
+    assert not TBodyRule._rewrites
+    assert not TPredOnlyRule._rewrites
+    assert not NoneRule._rewrites
+    assert not Fixpoint._rewrites
+    assert not MemoRule._rewrites
+    assert TBodyRule.rewrite is RuleBase.rewrite
+
+
+@pytest.mark.parametrize(
+    'rule, correct',
+    [
+        (HeadRule('f'), Sy('f')),
+        (TPredRule('f'), Sy('tf')),
+        (TBodyRule('f'), Sy('bf')),
+        (TPredOnlyRule('f'), Sy('f')),
+        (JustOne(HeadRule('g'), JustOne(TBodyRule('f'))), Sy('bf')),
+        (Rules(HeadRule('f'), TBodyRule('f')), Sy('f')),
+    ],
+)
+def test_rewrite(rule, correct):
+    expr = Co('f', (Sy('x'),))
+
+    assert rule.rewrite(expr) == correct
+    assert rule(expr) == correct
+    assert rule.rewrite(Co('k', ())) in (no_rewrite, Co('k', ()))
+
+
+def test_rewrite_no_match():
+    assert HeadRule('f').rewrite(Co('g', ())) is no_rewrite
+    assert JustOne(HeadRule('f')).rewrite(Co('g', ())) is no_rewrite
+
+
+def test_rewrite_subclass_tpredicate():
+    rule = TPredOnlyRule('f')
+    expr = Co('f2', (Sy('x'),))
+
+    # Rule.rewrite would ignore the tpredicate of the subclass.
+    assert rule.rewrite(expr) == Sy('f')
+    assert rule(expr) == Sy('f')
+
+
+def test_rewrite_none_output():
+    rule = NoneRule('f')
+    expr = Co('f', (Sy('x'),))
+
+    assert rule.rewrite(expr) is None
+    assert rule(expr) is None
+    assert JustOne(rule)(expr) is None
+    assert rule(Co('g', ())) == Co('g', ())
+
+
+def test_substitute():
+    expr = Co('f', (Sy('x'), Co('g', (Sy('y'), Sy('x')))))
+    subdict = {Sy('x'): Nu(1), Co('g', (Sy('y'), Nu(1))): Sy('z')}
+
+    assert substitute(expr, subdict) == Co('f', (Nu(1), Sy('z')))
+    assert substitute(expr, subdict) == Substitute(
+        subdict=subdict, bottomup=True
+    )(expr)
+    assert substitute(expr, dict()) is expr
@@ -386,3 +386,19 @@ def test_set_unparse(settings, afunc):
     setsettings.set_unparse(afunc)
 
     assert settings.unparse == afunc
+
+
+@pytest.mark.parametrize('size', [1, 1000, None])
+def test_set_vector_min(settings, size):
+    setsettings.set_vector_min(size)
+
+    assert settings.vector_min == size
+
+
+@pytest.mark.parametrize('size', [0, -5, 2.0, 'a', True])
+def test_set_vector_min_error(settings, size, capsys):
+    setsettings.set_vector_min(size)
+    output = capsys.readouterr()
+
+    assert 'set_vector_min error' in output.out
+    assert settings.vector_min is None
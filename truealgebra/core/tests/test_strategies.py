@@ -0,0 +1,334 @@
+from truealgebra.core.strategies import (
+    attempt, sequence, choice, try_, repeat, all_children, topdown,
+    once_topdown, once_bottomup, innermost, outermost, Strategy
+)
+from truealgebra.core.expressions import Symbol, Number, Container, Assign
+from truealgebra.core.budget import Budget
+from truealgebra.core.rules import Rule
+import pytest
+
+
+class CountRule(Rule):
+    """ Rule that counts the expressions it is tried on. """
+    def __init__(self, *args, **kwargs):
+        self.count = 0
+        super().__init__(*args, **kwargs)
+
+    def tpredicate(self, expr):
+        self.count += 1
+        return super().tpredicate(expr)
+
+
+class AToB(CountRule):
+    def predicate(self, expr):
+        return expr == Symbol('a')
+
+    def body(self, expr):
+        return Symbol('b')
+
+
+class BToC(CountRule):
+    def predicate(self, expr):
+        return expr == Symbol('b')
+
+    def body(self, expr):
+        return Symbol('c')
+
+
+class FOfG(CountRule):
+    """ f(g(u)) -> h """
+    def predicate(self, expr):
+        return (
+            isinstance(expr, Container) and expr.name == 'f'
+            and isinstance(expr[0], Container) and expr[0].name == 'g'
+        )
+
+    def body(self, expr):
+        return Symbol('h')
+
+
+class GToK(CountRule):
+    """ g(u) -> k """
+    def predicate(self, expr):
+        return isinstance(expr, Container) and expr.name == 'g'
+
+    def body(self, expr):
+        return Symbol('k')
+
+
+class Unwrap(CountRule):
+    """ w(u) -> u """
+    def predicate(self, expr):
+        return isinstance(expr, Container) and expr.name == 'w'
+
+    def body(self, expr):
+        return expr[0]
+
+
+class Grow(Rule):
+    """ a -> w(a) never ends. """
+    def predicate(self, expr):
+        return expr == Symbol('a')
+
+    def body(self, expr):
+        return Container('w', (expr,))
+
+
+class Wrap(Rule):
+    """ u -> w(u) never ends. """
+    def predicate(self, expr):
+        return True
+
+    def body(self, expr):
+        return Container('w', (expr,))
+
+
+class Any(Rule):
+    def predicate(self, expr):
+        return True
+
+    def body(self, expr):
+        return expr
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+sc = Symbol('c')
+sx = Symbol('x')
+n1 = Number(1)
+
+expr = Container('f', (
+    Container('g', (sa, sx)),
+    Container('h', (n1, sa)),
+    sx,
+))
+
+
+def test_attempt():
+    assert attempt(AToB(), sa) == sb
+    assert attempt(AToB(), sx) is None
+    assert attempt(sequence(AToB(), BToC()), sa) == sc
+    assert attempt(sequence(AToB(), BToC()), sb) is None
+
+
+def test_strategy_is_rule():
+    rule = sequence(AToB(), BToC())
+
+    assert isinstance(rule, Strategy)
+    assert rule(sa) == sc
+    assert rule(sx) is sx
+    assert rule(Container('f', (sa,)), _buinhibit=False) == Container(
+        'f', (sa,)
+    )
+    assert sequence(AToB(), BToC(), bottomup=True)(
+        Container('f', (sa,))
+    ) == Container('f', (sc,))
+
+
+def test_sequence_short_circuit():
+    b2c = BToC()
+    rule = sequence(AToB(), AToB(), b2c)
+
+    assert attempt(rule, sa) is None
+    assert b2c.count == 0
+
+
+@pytest.mark.parametrize(
+    'ex, correct',
+    [
+        (sa, sb),
+        (sb, sc),
+        (sx, None),
+    ]
+)
+def test_choice(ex, correct):
+    assert attempt(choice(AToB(), BToC()), ex) == correct
+
+
+def test_try_and_sequence():
+    rule = sequence(try_(AToB()), BToC())
+
+    assert attempt(rule, sa) == sc
+    assert attempt(rule, sb) == sc
+    assert attempt(try_(AToB()), sx) is sx
+
+
+def test_repeat():
+    rule = Unwrap()
+    ex = Container('w', (Container('w', (Container('w', (sx,)),)),))
+
+    assert attempt(repeat(rule), ex) is sx
+    assert rule.count == 4
+    assert attempt(repeat(AToB()), sx) is sx
+
+
+def test_repeat_maxrepeat(capsys):
+    out = attempt(repeat(Wrap(), maxrepeat=3), sa)
+    output = capsys.readouterr().out
+
+    assert out == Container('w', (Container('w', (Container('w', (sa,)),)),))
+    assert 'maxrepeat 3' in output
+
+
+def test_repeat_stops_without_change():
+    assert attempt(repeat(Any()), sa) is sa
+
+
+def test_all_children():
+    ex = Container('f', (sa, sa))
+
+    assert attempt(all_children(AToB()), ex) == Container('f', (sb, sb))
+    assert attempt(all_children(AToB()), Container('f', (sa, sx))) is None
+    assert attempt(all_children(try_(AToB())), expr[0]) == Container(
+        'g', (sb, sx)
+    )
+    assert attempt(all_children(AToB()), sx) is sx
+
+
+def test_all_children_closed_item():
+    ex = Assign(':=', (sa, sa))
+
+    assert attempt(all_children(AToB()), ex) == Assign(':=', (sa, sb))
+
+
+def test_topdown():
+    out = attempt(topdown(try_(AToB())), expr)
+
+    assert out == Container('f', (
+        Container('g', (sb, sx)),
+        Container('h', (n1, sb)),
+        sx,
+    ))
+    assert out[2] is sx
+    assert attempt(topdown(AToB()), expr) is None
+
+
+def test_topdown_applies_to_output():
+    # The rule is applied to the items of its output.
+    rule = topdown(try_(choice(GToK(), AToB())))
+    ex = Container('f', (Container('g', (sa,)), sa))
+
+    assert attempt(rule, ex) == Container('f', (Symbol('k'), sb))
+
+
+def test_topdown_keeps_unchanged():
+    assert attempt(topdown(try_(BToC())), expr) is expr
+
+
+def test_once_topdown():
+    rule = AToB()
+    out = attempt(once_topdown(rule), expr)
+
+    assert out == Container('f', (Container('g', (sb, sx)), expr[1], sx))
+    assert out[1] is expr[1]
+    # f, g and a are tried.
+    assert rule.count == 3
+    assert attempt(once_topdown(AToB()), Container('f', (sx,))) is None
+
+
+def test_once_topdown_outermost_first():
+    ex = Container('f', (Container('g', (sx,)),))
+
+    assert attempt(once_topdown(choice(GToK(), FOfG())), ex) == Symbol('h')
+
+
+def test_once_bottomup():
+    ex = Container('f', (Container('g', (sx,)),))
+
+    assert attempt(once_bottomup(choice(GToK(), FOfG())), ex) == Container(
+        'f', (Symbol('k'),)
+    )
+    rule = AToB()
+    out = attempt(once_bottomup(rule), expr)
+    assert out == Container('f', (Container('g', (sb, sx)), expr[1], sx))
+    assert rule.count == 1
+    assert attempt(once_bottomup(AToB()), Container('f', (sx,))) is None
+
+
+def test_once_pruning():
+    rule = AToB()
+    rule.heads = frozenset()
+    rule.symbols = frozenset([sa])
+    ex = Container('f', (Container('g', (sx, n1)), Container('h', (sa,))))
+
+    assert attempt(once_topdown(rule), ex)[1] == Container('h', (sb,))
+    # g(x, 1) and its items are skipped.
+    assert rule.count == 3
+
+
+@pytest.mark.parametrize(
+    'strategy, correct',
+    [
+        (innermost, Container('f', (Symbol('k'),))),
+        (outermost, Symbol('h')),
+    ]
+)
+def test_normal_forms(strategy, correct):
+    ex = Container('f', (Container('g', (sx,)),))
+
+    assert attempt(strategy(choice(FOfG(), GToK())), ex) == correct
+
+
+def test_innermost():
+    rule = Unwrap()
+    ex = Container('f', (
+        Container('w', (Container('w', (sa,)),)),
+        Container('w', (sx,)),
+        sb,
+    ))
+
+    assert attempt(innermost(rule), ex) == Container('f', (sa, sx, sb))
+    assert attempt(innermost(rule), sb) is sb
+
+
+def test_normal_form_chain():
+    # a -> b -> c, the output of a rule is normalized again.
+    rule = choice(AToB(), BToC())
+
+    assert attempt(innermost(rule), expr) == attempt(outermost(rule), expr)
+    assert attempt(innermost(rule), expr)[1] == Container('h', (n1, sc))
+
+
+def test_innermost_maxsteps(capsys):
+    out = attempt(innermost(Grow(), maxsteps=5), Container('f', (sa,)))
+    output = capsys.readouterr().out
+
+    assert out[0][0][0][0][0][0] == sa
+    assert 'maxsteps 5' in output
+
+
+def test_strategies_deep():
+    deep = sa
+    for _ in range(3000):
+        deep = Container('f', (deep, n1))
+
+    for strategy in (once_topdown, once_bottomup, innermost, outermost):
+        out = attempt(strategy(AToB()), deep)
+        for _ in range(3000):
+            out = out[0]
+        assert out == sb
+    out = attempt(topdown(try_(AToB())), deep)
+    for _ in range(3000):
+        out = out[0]
+    assert out == sb
+
+
+@pytest.mark.parametrize(
+    'strategy',
+    [
+        lambda rule: innermost(rule, maxsteps=5000),
+        lambda rule: outermost(rule, maxsteps=5000),
+        lambda rule: repeat(rule, maxrepeat=5000),
+    ]
+)
+def test_strategies_budget(strategy):
+    with Budget(visits=10) as budget:
+        out = attempt(strategy(Wrap()), sa)
+
+    assert budget.exhausted == 'visits'
+    assert budget.info().visits <= 12
+    depth = 0
+    while out != sa:
+        out = out[0]
+        depth += 1
+    assert 0 < depth <= 10
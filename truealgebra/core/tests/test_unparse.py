@@ -356,3 +356,13 @@ def alist(settings):
 def test_alist(alist, settings):
     for item in alist:
         assert unparse(item[0]) == item[1]
+
+
+def test_deep_expression(settings):
+    expr = Sy('a')
+    for _ in range(3000):
+        expr = Co('-', (expr, Sy('b')))
+    str_out = unparse(expr)
+
+    assert str_out == 'a' + ' - b' * 3000
+    assert unparse._memo is None
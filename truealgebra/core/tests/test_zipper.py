@@ -0,0 +1,158 @@
+from truealgebra.core.zipper import Cursor
+from truealgebra.core.expressions import (
+    Symbol, Number, Container, Assign, Restricted
+)
+from truealgebra.core.rules import Rule
+from truealgebra.core.err import ta_logger, TrueAlgebraError
+import pytest
+
+
+class SymbolToX(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Symbol)
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+class NumberToX(Rule):
+    def predicate(self, expr):
+        return isinstance(expr, Number)
+
+    def body(self, expr):
+        return Symbol('x')
+
+
+sa = Symbol('a')
+sb = Symbol('b')
+sc = Symbol('c')
+sx = Symbol('x')
+n1 = Number(1)
+
+gab = Container('g', (sa, sb))
+expr = Container('f', (gab, sc, Container('h', (n1,))))
+
+
+@pytest.fixture
+def make_exception():
+    ta_logger.set_make_exception()
+    yield
+    ta_logger.clear_make_exception()
+
+
+def test_cursor_moves():
+    cursor = Cursor(expr)
+
+    assert cursor.focus is expr
+    assert cursor.down().focus is gab
+    assert cursor.down(1).focus is sb
+    assert cursor.path == (0, 1)
+    assert cursor.left().focus is sa
+    assert cursor.up().right().focus is sc
+    assert cursor.right().down(-1).focus is n1
+    assert cursor.path == (2, 0)
+    assert cursor.depth == 2
+    assert cursor.top().focus is expr
+
+
+def test_cursor_init_path():
+    assert Cursor(expr, (0, 1)).focus is sb
+
+
+def test_cursor_no_edit_keeps_expr():
+    cursor = Cursor(expr, (0, 1)).left().up().right()
+
+    assert cursor.root() is expr
+    assert cursor.top().focus is expr
+
+
+def test_cursor_replace_and_apply():
+    cursor = Cursor(expr).down(0).down(0).replace(sx).right()
+    cursor.apply(SymbolToX())
+    cursor.up().right().apply(SymbolToX())
+    out = cursor.root()
+
+    assert out == Container('f', (Container('g', (sx, sx)), sx, expr[2]))
+    assert out[2] is expr[2]
+    assert cursor.focus == sx
+    assert cursor.path == (1,)
+
+
+def test_cursor_edit_revisit():
+    cursor = Cursor(expr).down(0).down(1).replace(sx).up().up()
+    cursor.down(0).down(0).replace(sx)
+
+    assert cursor.root() == Container(
+        'f', (Container('g', (sx, sx)), sc, expr[2])
+    )
+
+
+def test_cursor_matches_apply2path():
+    rule = SymbolToX()
+    out = Cursor(expr).down(0).down(1).apply(rule).root()
+
+    assert out == expr.apply2path((0, 1), rule)
+
+
+def test_cursor_focus_of_edited_container():
+    cursor = Cursor(expr).down(0).down(0).replace(sx).up()
+
+    assert cursor.focus == Container('g', (sx, sb))
+
+
+def test_cursor_assign():
+    assign = Assign(':=', (sa, sb))
+    cursor = Cursor(assign).down(1).left()
+
+    assert cursor.focus is sb
+
+
+@pytest.mark.parametrize(
+    'ex, path',
+    [
+        (sa, (0,)),
+        (Restricted('f', (sa,)), (0,)),
+        (Assign(':=', (sa, sb)), (0,)),
+        (expr, (3,)),
+        (expr, (-4,)),
+        (expr, ('a',)),
+    ]
+)
+def test_cursor_down_error(ex, path, make_exception):
+    with pytest.raises(TrueAlgebraError):
+        Cursor(ex, path)
+
+
+@pytest.mark.parametrize(
+    'move',
+    [
+        lambda cursor: cursor.up(),
+        lambda cursor: cursor.right(),
+        lambda cursor: cursor.down(2).right(),
+        lambda cursor: cursor.down(0).left(),
+    ]
+)
+def test_cursor_move_error(move, make_exception):
+    with pytest.raises(TrueAlgebraError):
+        move(Cursor(expr))
+
+
+def test_cursor_error_does_not_move(capsys):
+    cursor = Cursor(expr).down(0)
+    cursor.down(5)
+    capsys.readouterr()
+
+    assert cursor.focus is gab
+
+
+def test_cursor_deep():
+    deep = sa
+    for _ in range(3000):
+        deep = Container('f', (deep, n1))
+    cursor = Cursor(deep, (0,) * 3000).replace(sx)
+    for _ in range(3000):
+        cursor.right().replace(sx).up()
+    out = cursor.root()
+
+    assert cursor.depth == 0
+    assert out == deep.bottomup(SymbolToX()).bottomup(NumberToX())
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from truealgebra.core.settings import settings
 from truealgebra.core.expressions import (
     Number, Symbol, Container, CommAssoc, NullSingleton, isCommAssoc,
-    MultiExprs,
+    MultiExprs, NumberArray,
 )
 from truealgebra.core.constants import isoperatorname, issymbolname
 
@@ -10,6 +10,10 @@ from IPython import embed
 
 
 class ReadableString:
+    # While an expression is converted, the strings of its sub-expressions
+    # keyed by id.
+    _memo = None
+
     def __init__(self, *handlers):
         self.chain = self.last_handler
         for cls in reversed(handlers):
@@ -23,7 +27,45 @@ class ReadableString:
         return repr(expr)
 
     def __call__(self, expr):
-        return self.chain(expr)
+        """Convert expr to a string.
+
+        The sub-expressions of expr are converted first, deepest first,
+        and their strings are memoized. When a handler converts an item
+        its string is looked up, so there is no recursion through the
+        handlers and no limit on the depth of expr.
+        """
+        memo = self._memo
+        if memo is not None:
+            try:
+                return memo[id(expr)]
+            except KeyError:
+                return self.chain(expr)
+
+        self._memo = memo = dict()
+        try:
+            for node in self.postorder(expr):
+                if id(node) not in memo:
+                    memo[id(node)] = self.chain(node)
+            return memo[id(expr)]
+        finally:
+            self._memo = None
+
+    @staticmethod
+    def postorder(expr):
+        """Return a list of expr and its sub-expressions, the items of a
+        Container or the exprs of a MultiExprs come before it.
+        """
+        out = list()
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            out.append(node)
+            if isinstance(node, Container):
+                stack.extend(node.items)
+            elif isinstance(node, MultiExprs):
+                stack.extend(node.exprs)
+        out.reverse()
+        return out
 
     def tlbp(self, expr):
         """Token Left Binding Power, which is
@@ -98,15 +140,7 @@ class ReadableString:
         The minimum non-zero left binding power in left side.
         This function recusively searches all expression layers.
         """
-        least = self.tlbp(expr)
-        if least > 0 and len(expr) > 0:
-            lower_layer_least = self.llbp(expr[0])
-            if lower_layer_least > 0 and lower_layer_least < least:
-                return lower_layer_least
-            else:
-                return least
-        else:
-            return 0
+        return self._least_bp(expr, self.tlbp, 0)
 
     def lrbp(self, expr):
         """ Least Right Binding Power
@@ -114,15 +148,23 @@ class ReadableString:
         The minimum non-zero left binding power in Right side.
         This function recusively searches all expression layers.
         """
-        least = self.trbp(expr)
-        if least > 0 and len(expr) > 0:
-            lower_layer_least = self.lrbp(expr[-1])
-            if lower_layer_least > 0 and lower_layer_least < least:
-                return lower_layer_least
-            else:
-                return least
-        else:
-            return 0
+        return self._least_bp(expr, self.trbp, -1)
+
+    def _least_bp(self, expr, token_bp, ndx):
+        """Walk down one side of expr, through item ndx of each layer,
+        used by llbp and lrbp.
+        """
+        layers = list()
+        least = token_bp(expr)
+        while least > 0 and len(expr) > 0:
+            layers.append(least)
+            expr = expr[ndx]
+            least = token_bp(expr)
+        least = 0
+        for layer_least in reversed(layers):
+            if not (least > 0 and least < layer_least):
+                least = layer_least
+        return least
 
     def need_parenthesis_on_left(self, lbp, leftarg):
         arg_lrbp = self.lrbp(leftarg)
@@ -198,7 +240,9 @@ class UnparseSymbol(ReadableHandlerBase):
 
 class UnparseNumber(ReadableHandlerBase):
     def handle_expr(self, expr):
-        if isinstance(expr, Number):
+        if isinstance(expr, NumberArray):
+            return expr.summary()
+        elif isinstance(expr, Number):
             return str(expr.value)
 
 
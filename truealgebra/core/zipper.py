@@ -0,0 +1,221 @@
+""" zipper module
+
+A Cursor instance is a zipper over a truealgebra expression. It has a
+focus, a sub-expression of the expression, and can move the focus down
+into an item, up to the parent container, and left or right to a sibling
+item. The focus can be replaced or have a rule applied to it.
+
+Unlike apply2path, an edit does not rebuild the ancestors of the focus.
+Every container above the focus keeps a list of its items, edits go into
+these lists, and containers are rebuilt only when the whole expression is
+asked for with the root method. A sequence of local edits costs the
+moves between them, not a rebuild of the path for each edit.
+
+Moves follow the same rules as paths. A cursor cannot move into an atom,
+a Restricted instance or an item closed to paths, such as item 0 of an
+Assign instance. A move that is not allowed is logged with ta_logger and
+the cursor does not move.
+"""
+
+from operator import is_
+
+from truealgebra.core.expressions import Container, _closed_to_path
+from truealgebra.core.err import ta_logger
+
+from IPython import embed
+
+
+class _Edited:
+    """A container whose items have been edited, not yet rebuilt."""
+    __slots__ = ('node', 'items')
+
+    def __init__(self, node, items):
+        self.node = node
+        self.items = items
+
+
+def _materialize(value):
+    """Rebuild an _Edited value, and the _Edited values inside it, into an
+    expression. A container whose items are all unchanged is kept.
+    """
+    if not isinstance(value, _Edited):
+        return value
+    # A frame is [container, copy of its items, index of the next item].
+    stack = [[value.node, list(value.items), 0]]
+    while True:
+        frame = stack[-1]
+        node, items, ndx = frame
+        while ndx < len(items) and not isinstance(items[ndx], _Edited):
+            ndx += 1
+        if ndx < len(items):
+            frame[2] = ndx
+            edited = items[ndx]
+            stack.append([edited.node, list(edited.items), 0])
+            continue
+        stack.pop()
+        if all(map(is_, items, node.items)):
+            result = node
+        else:
+            result = node._rebuild(tuple(items))
+        if not stack:
+            return result
+        parent = stack[-1]
+        parent[1][parent[2]] = result
+        parent[2] += 1
+
+
+class Cursor:
+    """Zipper over a truealgebra expression.
+
+    Parameters
+    ----------
+    expr : ExprBase
+        The expression, it is the initial focus.
+    path : sequence of int, optional
+        The cursor moves down along path.
+
+    The move methods return the cursor, so calls can be chained::
+
+        Cursor(expr).down(1).down(0).apply(rule).right().replace(x).root()
+    """
+    def __init__(self, expr, path=()):
+        # The frames of the containers above the focus, outermost first.
+        # A frame is [container, edited items or None, index of the item
+        # the cursor went down into].
+        self._stack = list()
+        self._node = expr
+        # Edited items of the focus, None when the focus is not edited.
+        self._items = None
+        for ndx in path:
+            self.down(ndx)
+
+    @property
+    def focus(self):
+        """The expression at the cursor."""
+        if self._items is not None:
+            self._node = _materialize(_Edited(self._node, self._items))
+            self._items = None
+        return self._node
+
+    @property
+    def path(self):
+        """The path from the top of the expression to the focus."""
+        return tuple([frame[2] for frame in self._stack])
+
+    @property
+    def depth(self):
+        return len(self._stack)
+
+    def _value(self):
+        if self._items is None:
+            return self._node
+        return _Edited(self._node, self._items)
+
+    def _enter(self, value):
+        if isinstance(value, _Edited):
+            self._node = value.node
+            self._items = value.items
+        else:
+            self._node = value
+            self._items = None
+
+    def _can_enter(self, node, ndx):
+        if (
+            not isinstance(node, Container)
+            or type(node).apply2path is not Container.apply2path
+        ):
+            ta_logger.log("cursor cannot enter this expression")
+            return False
+        if _closed_to_path(node, ndx):
+            ta_logger.log("Assign 0 item closed to path")
+            return False
+        return True
+
+    def down(self, ndx=0):
+        """Move the focus to item ndx of the focus."""
+        if not self._can_enter(self._node, ndx):
+            return self
+        items = self._node.items if self._items is None else self._items
+        try:
+            if ndx < 0:
+                ndx += len(items)
+            if ndx < 0:
+                raise IndexError
+            child = items[ndx]
+        except IndexError:
+            ta_logger.log("index error in path")
+            return self
+        except TypeError:
+            ta_logger.log("type error in path")
+            return self
+        self._stack.append([self._node, self._items, ndx])
+        self._enter(child)
+        return self
+
+    def up(self):
+        """Move the focus to the container of the focus."""
+        if not self._stack:
+            ta_logger.log("cursor is at the top of the expression")
+            return self
+        node, items, ndx = self._stack.pop()
+        value = self._value()
+        original = node.items[ndx] if items is None else items[ndx]
+        if value is not original:
+            if items is None:
+                items = list(node.items)
+            items[ndx] = value
+        self._node = node
+        self._items = items
+        return self
+
+    def _sibling(self, step):
+        if not self._stack:
+            ta_logger.log("cursor is at the top of the expression")
+            return self
+        node, items, ndx = self._stack[-1]
+        new_ndx = ndx + step
+        if not 0 <= new_ndx < len(node.items):
+            ta_logger.log("index error in path")
+            return self
+        if _closed_to_path(node, new_ndx):
+            ta_logger.log("Assign 0 item closed to path")
+            return self
+        self.up()
+        return self.down(new_ndx)
+
+    def left(self):
+        """Move the focus to the item on the left."""
+        return self._sibling(-1)
+
+    def right(self):
+        """Move the focus to the item on the right."""
+        return self._sibling(1)
+
+    def top(self):
+        """Move the focus to the top of the expression."""
+        while self._stack:
+            self.up()
+        return self
+
+    def replace(self, expr):
+        """Replace the focus with expr."""
+        self._node = expr
+        self._items = None
+        return self
+
+    def apply(self, rule):
+        """Replace the focus with the output of rule applied to it."""
+        return self.replace(rule(self.focus))
+
+    def root(self):
+        """Return the whole expression with all edits made. The cursor
+        does not move.
+        """
+        value = self._value()
+        for node, items, ndx in reversed(self._stack):
+            original = node.items[ndx] if items is None else items[ndx]
+            if value is not original:
+                items = list(node.items if items is None else items)
+                items[ndx] = value
+            value = node if items is None else _Edited(node, items)
+        return _materialize(value)
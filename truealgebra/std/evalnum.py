@@ -11,6 +11,12 @@ import math
 import cmath
 from fractions import Fraction
 
+try:
+    import numpy
+except ImportError:
+    # NumberArray instances need numpy, without it there are none.
+    numpy = None
+
 
 # =========================
 # Python Operator Functions
@@ -51,6 +57,8 @@ def add_function(n0, n1):
 # Clean Rules
 # ===========
 class CleanFraction(Rule):
+    pure = True
+
     def predicate(self, expr):
         return isNumber(expr) and isinstance(expr.value, Fraction)
 
@@ -62,6 +70,8 @@ class CleanFraction(Rule):
 
 
 class CleanComplex(Rule):
+    pure = True
+
     def predicate(self, expr):
         return isNumber(expr) and isinstance(expr.value, complex)
 
@@ -72,6 +82,11 @@ class CleanComplex(Rule):
             return expr
 
 
+def array_power(n0, n1):
+    # Integer arrays cannot have negative integer powers, use floats.
+    return numpy.emath.power(numpy.multiply(n0, 1.0), n1)
+
+
 cleanfraction = CleanFraction()
 cleancomplex = CleanComplex()
 
@@ -97,7 +112,25 @@ evalmathsingle = EvalMathDictSingle(
         'log10': cmath.log10,
         'sqrt': cmath.sqrt,
         '-': negative_function,
-    }
+    },
+    arraydict=dict() if numpy is None else {
+        'sin': numpy.sin,
+        'cos': numpy.cos,
+        'tan': numpy.tan,
+        'csc': lambda x: 1.0 / numpy.sin(x),
+        'sec': lambda x: 1.0 / numpy.cos(x),
+        'cot': lambda x: 1.0 / numpy.tan(x),
+        'asin': numpy.emath.arcsin,
+        'acos': numpy.emath.arccos,
+        'atan': numpy.arctan,
+        'acsc': lambda x: numpy.emath.arcsin(1.0 / x),
+        'asec': lambda x: numpy.emath.arccos(1.0 / x),
+        'acot': lambda x: numpy.arctan(1.0 / x),
+        'exp': numpy.exp,
+        'log': numpy.emath.log,
+        'log10': numpy.emath.log10,
+        'sqrt': numpy.emath.sqrt,
+    },
 )
 
 
@@ -106,7 +139,10 @@ evalmathdouble = EvalMathDictDouble(
         '**': power_function,
         '/': divide_function,
         '-': subtract_function
-    }
+    },
+    arraydict=dict() if numpy is None else {
+        '**': array_power,
+    },
 )
 
 num0 = Number(0)
@@ -120,7 +156,11 @@ evalnum = Rules(
     JustOne(multiply, add, evalmathsingle, evalmathdouble),
     JustOne(cleanfraction, cleancomplex)
 )
+# evalnumbu is idempotent, a bottomup pass skips the sub-expressions
+# that it has evaluated before.
 evalnumbu = RulesBU(
     JustOne(multiply, add, evalmathsingle, evalmathdouble),
-    JustOne(cleanfraction, cleancomplex)
+    JustOne(cleanfraction, cleancomplex),
+    marks=True,
+    idempotent=True,
 )
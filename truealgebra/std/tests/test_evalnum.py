@@ -0,0 +1,103 @@
+from truealgebra.core.settings import SettingsSingleton
+from truealgebra.common.commonsettings import commonsettings
+
+from truealgebra.std.setup_func import std_setup_func
+from truealgebra.common.setup_func import common_setup_func
+
+from truealgebra.core.abbrv import *   # import abbreviations
+from truealgebra.core.expressions import NumberArray
+from truealgebra.core.rules import Substitute
+from truealgebra.std.evalnum import evalnumbu
+
+import pytest
+
+from IPython import embed
+
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def settings(scope='module'):
+    settings = SettingsSingleton()
+    settings.reset()
+    commonsettings.reset()
+    std_setup_func()
+    common_setup_func()
+
+    yield settings
+        
+    settings.reset()
+    commonsettings.reset()
+
+
+xs = np.linspace(-1.0, 2.0, 7)
+
+
+@pytest.mark.parametrize(
+    'string, correct',
+    [
+        ('a*x**2 + b', 2 * xs**2 + 1),
+        ('x - b', xs - 1),
+        ('x/a', xs / 2),
+        ('-x', -xs),
+        ('exp(x) + cos(x)', np.exp(xs) + np.cos(xs)),
+        ('sqrt(x)', np.emath.sqrt(xs)),
+        ('log(x*x + 1)', np.log(xs * xs + 1)),
+    ]
+)
+def test_evalnum_numberarray(settings, string, correct):
+    sub = Substitute(
+        subdict={Sy('x'): NumberArray(xs), Sy('a'): Nu(2), Sy('b'): Nu(1)},
+        bottomup=True,
+    )
+    out = evalnumbu(sub(settings.parse(string)))
+
+    assert type(out) is NumberArray
+    assert np.allclose(out.value, correct)
+
+
+def test_evalnum_numberarray_int_power(settings):
+    sub = Substitute(
+        subdict={Sy('x'): NumberArray(np.array([2, 4]))}, bottomup=True
+    )
+    out = evalnumbu(sub(settings.parse('x**(-1)')))
+
+    assert np.allclose(out.value, [0.5, 0.25])
+
+
+def test_evalnum_numberarray_unparse(settings):
+    out = evalnumbu(CA('*', (Nu(2), NumberArray(np.arange(3)))))
+
+    assert str(out) == '[0, 2, 4]'
+
+
+def test_evalnum_numberarray_one_element(settings):
+    out0 = evalnumbu(CA('+', (NumberArray(np.array([0])), Nu(0))))
+    out1 = evalnumbu(CA('*', (NumberArray(np.array([1.0])), Sy('x'))))
+
+    assert type(out0) is NumberArray
+    assert out1 == CA('*', (NumberArray(np.array([1.0])), Sy('x')))
+
+
+@pytest.mark.filterwarnings('error')
+@pytest.mark.parametrize(
+    'string',
+    ['x/0', 'x/(a - 2)', 'x**(-1)', '(x - x)/0']
+)
+def test_evalnum_numberarray_divide_by_zero(settings, capsys, string):
+    sub = Substitute(
+        subdict={Sy('x'): NumberArray(np.array([0, 1])), Sy('a'): Nu(2)},
+        bottomup=True,
+    )
+    out = evalnumbu(sub(settings.parse(string)))
+
+    assert out == null
+    assert 'Numerical Evaluation Error' in capsys.readouterr().out
+
+
+def test_evalnum_divide_by_zero(settings, capsys):
+    out = evalnumbu(settings.parse('1.0/0'))
+
+    assert out == null
+    assert 'Division by zero' in capsys.readouterr().out